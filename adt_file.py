@@ -1,18 +1,53 @@
 from .file_formats.adt_chunks import *
-from .file_formats.wow_common_types import ChunkHeader
+from .file_formats.wow_common_types import ChunkHeader, StringBlock
 from .enums.adt_enums import *
-from io import BufferedReader
+from .io_utils.binary_reader import BinaryReader
+from .io_utils.address_index import AddressIndex
+from .adt_placement_index import PlacementIndex
+from io import BufferedReader, BytesIO
+from collections import namedtuple
+from contextlib import contextmanager
+
+import numpy
 
 __reload_order_index__ = 3
 
+# positions of the outer 9x9 and inner 8x8 vertices among the 145 of a chunk, rows of 9 and 8 alternate
+_OUTER_VERTICES = numpy.array([row * 17 + col for row in range(9) for col in range(9)])
+_INNER_VERTICES = numpy.array([row * 17 + 9 + col for row in range(8) for col in range(8)])
+
+# distance between outer vertices, a tile is 533.33 yards wide and holds 16 chunks of 8 cells
+_UNIT_SIZE = 1600 / 3 / 128
+
+# what ADTFile.optimize() removed: the number of texture layers, the texture, M2 and WMO filenames, the number of MCRF
+# references, and the bytes saved
+OptimizeReport = namedtuple('OptimizeReport', ('layers', 'textures', 'm2s', 'wmos', 'refs', 'bytes_saved'))
+
 
 class ADTFile:
 	# def __init__(self, version, filepath=None):
-	def __init__(self, filepath=None, highres=True):
+	def __init__(self, filepath=None, highres=True, lazy=False):
 
 		self.filepath = filepath
-		self._mobile_chunks = []
-		self._offsets = []
+		# map chunks only read their header, heights and normals, other sub-chunks are decoded on first access and
+		# chunks none were accessed in are written back as read
+		self.lazy = lazy
+		# addresses of chunks and offsets, moved by _size_changed
+		self._addresses = AddressIndex()
+
+		# set while edits are batched, or for new files, the layout is then recomputed from content (update_layout)
+		self._batch_depth = 0
+		self._layout_dirty = True
+
+		# doodads and WMOs by location and referencing chunks, built on first use (see update_placement_index)
+		self._doodad_index = None
+		self._wmo_index = None
+
+		# instances added without chunks, referenced from the chunks they overlap once the batch exits, as (index in
+		# MDDF, model radius) and indices in MODF, and the chunks whose MCRF doodad references are to be sorted
+		self._unassigned_doodads = []
+		self._unassigned_wmos = []
+		self._unsorted_chunks = set()
 
 		# TODO: read from WDT MPHD flags if available?
 		self.highres = highres
@@ -31,28 +66,22 @@ class ADTFile:
 		self.mfbo = MFBO(self)
 		self.mh2o = MH2O(self)
 		self.mtxf = MTXF(self)
-		self.mcnk = [[MCNK(self) for _ in range(16)] for _ in range(16)]
+
+		# MCVT heights and MCNR normals of all chunks, indexed like MCIN (row * 16 + col). The chunks hold views of
+		# their rows, so vectorized edits of these arrays are written back as is. Modify them in place.
+		self.heights = numpy.zeros((256, 145), dtype='<f4')
+		self.normals = numpy.zeros((256, 145, 3), dtype='i1')
+		self.mcnk = [[MCNK(self, row * 16 + col, lazy) for col in range(16)] for row in range(16)]
 
 		if self.filepath:
-			with open(self.filepath, 'rb') as f:
+			with BinaryReader.from_file(self.filepath) as f:
 				self.read(f)
 
 	def _register_mobile_chunk(self, chunk):
-		self._mobile_chunks.append(chunk)
+		return self._addresses.register()
 
-	def _update_mobile_chunks(self, distance, address_of_changed):
-		for chunk in self._mobile_chunks:
-			chunk.update_address(distance, address_of_changed)
-
-	def _register_offset(self, ofs):
-		self._offsets.append(ofs)
-
-	def _unregister_offset(self, ofs):
-		self._offsets.remove(ofs)
-
-	def _update_offsets(self, distance, address_of_changed):
-		for ofs in self._offsets:
-			ofs._update(distance, address_of_changed)
+	def _register_offset(self, absolute_adr, base_adr):
+		return self._addresses.register(absolute_adr), self._addresses.register(base_adr)
 
 	def _get_mmdx_data_start(self):
 		return self.mmdx.address + ChunkHeader.size
@@ -63,7 +92,7 @@ class ADTFile:
 	def add_texture_filename(self, filename, mtxf_flags=0):
 		try:
 			return self.mtex.filenames.index(filename)
-		except:	# Python, more like Fuckoff
+		except ValueError:
 			pass
 		
 		self.mtex.filenames._add(filename)
@@ -103,7 +132,7 @@ class ADTFile:
 	def _add_model_filename(self, filename, filename_chunk, offset_chunk):
 		try:
 			return filename_chunk.filenames.index(filename)
-		except:
+		except ValueError:
 			pass
 
 		ofs_in_fc = filename_chunk.filenames.size
@@ -158,70 +187,600 @@ class ADTFile:
 		self._remove_model_filename(index, self.mwmo, self.mwid)
 
 
-	def add_m2_instance(self, which_chunks, name_id, unique_id, position, rotation, scale, flags):
+	@staticmethod
+	def _get_doodad_bounds(doodad):
+		position = doodad.position
+		return position.x, position.z, position.x, position.z
+
+	@staticmethod
+	def _get_wmo_bounds(wmo):
+		(min_x, _, min_z), (max_x, _, max_z) = wmo.extents.min, wmo.extents.max
+		return min_x, min_z, max_x, max_z
+
+	def _build_placement_index(self, instances, get_bounds, refs_name):
+		index = PlacementIndex()
+		for instance in instances:
+			index.append(get_bounds(instance))
+
+		for i, chunk in enumerate(chunk for row in self.mcnk for chunk in row):
+			for ref in getattr(chunk.mcrf, refs_name):
+				if ref < len(index):
+					index.add_ref(ref, i)
+
+		return index
+
+	def _get_doodad_index(self):
+		self._assign_placements()
+		if self._doodad_index is None:
+			self._doodad_index = self._build_placement_index(self.mddf.doodad_instances, self._get_doodad_bounds,
+															 'doodad_refs')
+		return self._doodad_index
+
+	def _get_wmo_index(self):
+		self._assign_placements()
+		if self._wmo_index is None:
+			self._wmo_index = self._build_placement_index(self.modf.wmo_instances, self._get_wmo_bounds,
+														  'object_refs')
+		return self._wmo_index
+
+	def update_placement_index(self):
+		""" Drops the placement indices, to be rebuilt on next use. Edits through ADTFile methods keep them up to
+		date, call this after moving instances or editing MDDF, MODF or MCRF directly. """
+		self._doodad_index = None
+		self._wmo_index = None
+
+	@staticmethod
+	def get_covering_chunks(bounds, positions):
+		""" Chunks overlapped by placements, given their bounds as rows of (min x, min z, max x, max z) and their
+		positions as rows of (x, z), in placement coordinates as in MDDF and MODF. The chunks are those of the tile
+		each position lies in, bounds are clipped to it. Returns an array of (placement, row, col) rows, ordered by
+		placement. """
+		bounds = numpy.asarray(bounds, dtype='f8').reshape(-1, 4)
+		origins = numpy.floor(numpy.asarray(positions, dtype='f8').reshape(-1, 2) / TILE_SIZE) * TILE_SIZE
+
+		# first and last row and column overlapped
+		cols = numpy.clip(numpy.floor((bounds[:, 0::2] - origins[:, :1]) / CHUNK_SIZE), 0, 15)
+		rows = numpy.clip(numpy.floor((bounds[:, 1::2] - origins[:, 1:]) / CHUNK_SIZE), 0, 15)
+
+		grid = numpy.arange(16)
+		in_rows = (grid >= rows[:, :1]) & (grid <= rows[:, 1:])
+		in_cols = (grid >= cols[:, :1]) & (grid <= cols[:, 1:])
+
+		return numpy.argwhere(in_rows[:, :, None] & in_cols[:, None, :])
+
+	def _add_doodad_ref(self, index, row, col):
+		chunk = self.mcnk[row][col]
+		chunk.mcrf._add_doodad(index)
+		self._size_changed(MCRF.entry_size, chunk.mcrf.address)
+		chunk.n_doodad_refs += 1
+		self._unsorted_chunks.add(row * 16 + col)
+
+		if self._doodad_index is not None:
+			self._doodad_index.add_ref(index, row * 16 + col)
+
+	def _add_wmo_ref(self, index, row, col):
+		chunk = self.mcnk[row][col]
+		chunk.mcrf._add_object(index)
+		self._size_changed(MCRF.entry_size, chunk.mcrf.address)
+		chunk.n_map_obj_refs += 1
+
+		if self._wmo_index is not None:
+			self._wmo_index.add_ref(index, row * 16 + col)
+
+	def _assign_placements(self):
+		""" References the instances added without chunks from the chunks they overlap, all at once, then sorts the
+		MCRF doodad references of the chunks changed. """
+		if self._unassigned_doodads:
+			doodads = self.mddf.doodad_instances
+			indices = [index for index, _ in self._unassigned_doodads]
+			positions = numpy.array([doodads[index].position._get_values() for index in indices])[:, 0::2]
+			# scale is 1024 for the model's size
+			radii = numpy.array([radius * doodads[index].scale / 1024 for index, radius in self._unassigned_doodads])
+			self._unassigned_doodads = []
+
+			bounds = numpy.column_stack((positions - radii[:, None], positions + radii[:, None]))
+			for placement, row, col in self.get_covering_chunks(bounds, positions).tolist():
+				self._add_doodad_ref(indices[placement], row, col)
+
+		if self._unassigned_wmos:
+			wmos = self.modf.wmo_instances
+			indices = self._unassigned_wmos
+			self._unassigned_wmos = []
+
+			bounds = [self._get_wmo_bounds(wmos[index]) for index in indices]
+			positions = [(wmos[index].position.x, wmos[index].position.z) for index in indices]
+			for placement, row, col in self.get_covering_chunks(bounds, positions).tolist():
+				self._add_wmo_ref(indices[placement], row, col)
+
+		if self._unsorted_chunks:
+			# larger doodads first: model sizes are not known here, the scale stands for the size category
+			doodads = self.mddf.doodad_instances
+			n_doodads = len(doodads)
+
+			def size(ref):
+				return doodads[ref].scale if ref < n_doodads else 0
+
+			for i in self._unsorted_chunks:
+				self.mcnk[i // 16][i % 16].mcrf.doodad_refs.sort(key=size, reverse=True)
+
+			self._unsorted_chunks = set()
+
+	def add_m2_instance(self, which_chunks, name_id, unique_id, position, rotation, scale, flags, radius=0.0):
+		""" Adds a doodad referenced from which_chunks, a list of (row, col). With which_chunks None, the chunks are
+		those overlapped by the model, given its bounding radius at scale 1024. Within a batch, these chunks are
+		computed for all the doodads added once the batch exits. MCRF doodad references are sorted by size. """
 		self.mddf._add(name_id, unique_id, position, rotation, scale, flags)
 		distance = ADTDoodadDefinition.size
 		self._size_changed(distance, self.mddf.address)
 
-		for row, col in which_chunks:	# list of tuples [(row, col), (row, col), etc]
-			mddf_index = len(self.mddf.doodad_instances) - 1
-			self.mcnk[row][col].mcrf._add_doodad(mddf_index)
-			self._size_changed(MCRF.entry_size, self.mcnk[row][col].mcrf.address)
-			self.mcnk[row][col].n_doodad_refs += 1
-		# TODO: sort MCRF doodad_refs by size category		
+		mddf_index = len(self.mddf.doodad_instances) - 1
+		if self._doodad_index is not None:
+			self._doodad_index.append(self._get_doodad_bounds(self.mddf.doodad_instances[mddf_index]))
+
+		if which_chunks is None:
+			self._unassigned_doodads.append((mddf_index, radius))
+		else:
+			for row, col in which_chunks:	# list of tuples [(row, col), (row, col), etc]
+				self._add_doodad_ref(mddf_index, row, col)
+
+		if not self._batch_depth:
+			self._assign_placements()
 
 	def remove_m2_instance(self, index):
+		""" Removes a doodad and its references. The last doodad takes its index, so that only the chunks
+		referencing either are updated. """
 		if index > len(self.mddf.doodad_instances) - 1:
 			raise IndexError("Index not in doodad_instances: {}".format(index))
 
+		placements = self._get_doodad_index()
+		last = len(self.mddf.doodad_instances) - 1
+
+		for i in placements.get_chunks(index):
+			chunk = self.mcnk[i // 16][i % 16]
+			chunk.mcrf._remove_doodad(index)
+			self._size_changed(-MCRF.entry_size, chunk.mcrf.address)
+			chunk.n_doodad_refs -= 1
+
+		if index != last:
+			for i in placements.get_chunks(last):
+				self.mcnk[i // 16][i % 16].mcrf._replace_doodad(last, index)
+
 		self.mddf._remove(index)
+		placements.remove(index)
 		distance = -ADTDoodadDefinition.size
 		self._size_changed(distance, self.mddf.address)
 
-		for row in range(16):
-			for col in range(16):
-				chunk = self.mcnk[row][col]
-				if index in chunk.mcrf.doodad_refs:
-					chunk.mcrf._remove_doodad(index)
-					self._size_changed(-MCRF.entry_size, chunk.mcrf.address)
-					chunk.n_doodad_refs -= 1
-
-	
 	def add_wmo_instance(self, which_chunks, name_id, unique_id, position, rotation, 
 						extents, flags, doodad_set, name_set, scale):
+		""" Adds a WMO referenced from which_chunks, a list of (row, col), or with which_chunks None from the chunks
+		its extents overlap, see add_m2_instance. """
 		self.modf._add(name_id, unique_id, position, rotation, 
 						extents, flags, doodad_set, name_set, scale)
 		distance = ADTWMODefinition.size
 		self._size_changed(distance, self.modf.address)
 
-		for row, col in which_chunks:	# list of tuples [(row, col), (row, col), etc]
-			modf_index = len(self.modf.wmo_instances) - 1
-			self.mcnk[row][col].mcrf._add_object(modf_index)
-			self._size_changed(MCRF.entry_size, self.mcnk[row][col].mcrf.address)
-			self.mcnk[row][col].n_map_obj_refs += 1
+		modf_index = len(self.modf.wmo_instances) - 1
+		if self._wmo_index is not None:
+			self._wmo_index.append(self._get_wmo_bounds(self.modf.wmo_instances[modf_index]))
+
+		if which_chunks is None:
+			self._unassigned_wmos.append(modf_index)
+		else:
+			for row, col in which_chunks:	# list of tuples [(row, col), (row, col), etc]
+				self._add_wmo_ref(modf_index, row, col)
+
+		if not self._batch_depth:
+			self._assign_placements()
 
 	def remove_wmo_instance(self, index):
+		""" Removes a WMO and its references. The last WMO takes its index, see remove_m2_instance. """
 		if index > len(self.modf.wmo_instances) - 1:
 			raise IndexError("Index not in wmo_instances: {}".format(index))
 
+		placements = self._get_wmo_index()
+		last = len(self.modf.wmo_instances) - 1
+
+		for i in placements.get_chunks(index):
+			chunk = self.mcnk[i // 16][i % 16]
+			chunk.mcrf._remove_object(index)
+			self._size_changed(-MCRF.entry_size, chunk.mcrf.address)
+			chunk.n_map_obj_refs -= 1
+
+		if index != last:
+			for i in placements.get_chunks(last):
+				self.mcnk[i // 16][i % 16].mcrf._replace_object(last, index)
+
 		self.modf._remove(index)
+		placements.remove(index)
 		distance = -ADTWMODefinition.size
 		self._size_changed(distance, self.modf.address)
 
+	def get_m2_instance_chunks(self, index):
+		""" (row, col) of the chunks referencing a doodad """
+		return sorted(divmod(i, 16) for i in self._get_doodad_index().get_chunks(index))
+
+	def get_wmo_instance_chunks(self, index):
+		""" (row, col) of the chunks referencing a WMO """
+		return sorted(divmod(i, 16) for i in self._get_wmo_index().get_chunks(index))
+
+	def get_m2_instances_in_box(self, box_min, box_max):
+		""" Indices of the doodads positioned within the box, given by its minimum and maximum corners in placement
+		coordinates as in MDDF. """
+		(min_x, min_y, min_z), (max_x, max_y, max_z) = box_min, box_max
+		doodads = self.mddf.doodad_instances
+
+		return sorted(i for i in self._get_doodad_index().query(min_x, min_z, max_x, max_z)
+					  if min_y <= doodads[i].position.y <= max_y)
+
+	def get_m2_instances_in_radius(self, center, radius):
+		""" Indices of the doodads positioned within radius of center, in placement coordinates as in MDDF. """
+		x, y, z = center
+		doodads = self.mddf.doodad_instances
+		result = []
+
+		for i in self._get_doodad_index().query(x - radius, z - radius, x + radius, z + radius):
+			position = doodads[i].position
+			if (position.x - x) ** 2 + (position.y - y) ** 2 + (position.z - z) ** 2 <= radius ** 2:
+				result.append(i)
+
+		return sorted(result)
+
+	def get_wmo_instances_in_box(self, box_min, box_max):
+		""" Indices of the WMOs whose extents overlap the box, given by its minimum and maximum corners in placement
+		coordinates as in MODF. """
+		(min_x, min_y, min_z), (max_x, max_y, max_z) = box_min, box_max
+		wmos = self.modf.wmo_instances
+
+		return sorted(i for i in self._get_wmo_index().query(min_x, min_z, max_x, max_z)
+					  if wmos[i].extents.min[1] <= max_y and wmos[i].extents.max[1] >= min_y)
+
+	def get_wmo_instances_in_radius(self, center, radius):
+		""" Indices of the WMOs whose extents come within radius of center, in placement coordinates as in MODF. """
+		wmos = self.modf.wmo_instances
+		result = []
+
+		for i in self._get_wmo_index().query(center[0] - radius, center[2] - radius, center[0] + radius,
+											  center[2] + radius):
+			extents = wmos[i].extents
+			# distance from the center to the closest point of the extents
+			distance = sum(max(low - value, 0.0, value - high) ** 2
+						   for value, low, high in zip(center, extents.min, extents.max))
+			if distance <= radius ** 2:
+				result.append(i)
+
+		return sorted(result)
+
+	def _get_height_grids(self):
+		""" Absolute heights of the tile as a 129x129 grid of outer vertices and a 128x128 grid of inner ones, rows
+		and columns following those of the chunks. Vertices shared by chunks take the heights of the first one. """
+		base = numpy.array([chunk.position.z for row in self.mcnk for chunk in row], dtype='f8')
+		heights = self.heights + base[:, None]
+
+		chunk_outer = heights[:, _OUTER_VERTICES].reshape(16, 16, 9, 9)
+		outer = numpy.empty((129, 129))
+		outer[:128, :128] = chunk_outer[:, :, :8, :8].transpose(0, 2, 1, 3).reshape(128, 128)
+		outer[128, :128] = chunk_outer[15, :, 8, :8].reshape(128)
+		outer[:128, 128] = chunk_outer[:, 15, :8, 8].reshape(128)
+		outer[128, 128] = chunk_outer[15, 15, 8, 8]
+
+		inner = heights[:, _INNER_VERTICES].reshape(16, 16, 8, 8).transpose(0, 2, 1, 3).reshape(128, 128)
+
+		return outer, inner
+
+	def recalculate_normals(self, neighbors=None):
+		""" Recomputes the MCNR normals of all chunks from their heights.
+
+		Each cell of the terrain is split in 4 triangles around its inner vertex, vertex normals are the sums of the
+		normals of the triangles they belong to. The tile is processed as a whole so normals match across chunk
+		borders. Along the tile borders, neighbors can provide the adjacent tiles, as a dict mapping (row offset,
+		column offset), from -1 to 1, to an ADTFile. Rows and columns are those of the chunks (mcnk[row][col]).
+		"""
+		# grids padded by a ring of vertices from the neighbor tiles, NaN where unknown
+		outer = numpy.full((131, 131), numpy.nan)
+		inner = numpy.full((130, 130), numpy.nan)
+		outer[1:130, 1:130], inner[1:129, 1:129] = self._get_height_grids()
+
+		for (d_row, d_col), tile in (neighbors or {}).items():
+			tile_outer, tile_inner = tile._get_height_grids()
+
+			for grid, tile_grid, size in ((outer, tile_outer, 129), (inner, tile_inner, 128)):
+				# padded indices in the neighbor's grid, a tile's last outer row is the first of the next one
+				rows = numpy.arange(-1, len(grid) - 1) - d_row * 128
+				cols = numpy.arange(-1, len(grid) - 1) - d_col * 128
+				rows_in, cols_in = (rows >= 0) & (rows < size), (cols >= 0) & (cols < size)
+
+				block = numpy.ix_(rows_in, cols_in)
+				grid[block] = numpy.where(numpy.isnan(grid[block]), tile_grid[numpy.ix_(rows[rows_in], cols[cols_in])],
+										  grid[block])
+
+		# edges from the inner vertex of each cell to its corners, as (row, column, height) in yards
+		half = _UNIT_SIZE / 2
+
+		def edge(corner, d_row, d_col):
+			vectors = numpy.empty(corner.shape + (3,))
+			vectors[..., 0] = d_row * half
+			vectors[..., 1] = d_col * half
+			vectors[..., 2] = corner - inner
+			return vectors
+
+		top_left = edge(outer[:-1, :-1], -1, -1)
+		top_right = edge(outer[:-1, 1:], -1, 1)
+		bottom_right = edge(outer[1:, 1:], 1, 1)
+		bottom_left = edge(outer[1:, :-1], 1, -1)
+
+		# counter-clockwise in (row, column) so that normals point up, triangles with unknown vertices are left out
+		faces = []
+		for a, b in ((top_right, top_left), (bottom_right, top_right), (bottom_left, bottom_right),
+					 (top_left, bottom_left)):
+			face = numpy.cross(a, b)
+			face[numpy.isnan(face).any(axis=-1)] = 0.0
+			faces.append(face)
+
+		top, right, bottom, left = faces
+
+		outer_normals = numpy.zeros((131, 131, 3))
+		outer_normals[:-1, :-1] += top + left
+		outer_normals[:-1, 1:] += top + right
+		outer_normals[1:, 1:] += right + bottom
+		outer_normals[1:, :-1] += bottom + left
+		inner_normals = top + right + bottom + left
+
+		outer_normals = outer_normals[1:130, 1:130]
+		inner_normals = inner_normals[1:129, 1:129]
+
+		# back to the chunks' vertex order
+		indices = numpy.arange(16)[:, None] * 8 + numpy.arange(9)
+		normals = numpy.empty((16, 16, 145, 3))
+		normals[:, :, _OUTER_VERTICES] = outer_normals[indices[:, None, :, None], indices[None, :, None, :]] \
+			.reshape(16, 16, 81, 3)
+		normals[:, :, _INNER_VERTICES] = inner_normals.reshape(16, 8, 16, 8, 3).transpose(0, 2, 1, 3, 4) \
+			.reshape(16, 16, 64, 3)
+		normals = normals.reshape(256, 145, 3)
+		normals /= numpy.linalg.norm(normals, axis=-1, keepdims=True)
+
+		# MCNR stores world X, Y and Z, which decrease along rows, decrease along columns and go up
+		normals *= (-127, -127, 127)
+		self.normals[:] = numpy.clip(numpy.rint(normals), -127, 127)
+
+	# Call this whenever the size of something changes to update offsets.
+	def _size_changed(self, distance, address_of_changed):
+		if self._batch_depth or self._layout_dirty:
+			self._layout_dirty = True
+			return
+
+		self._addresses.shift(distance, address_of_changed)
+
+	@contextmanager
+	def batch(self):
+		""" Groups edits so that the layout is computed once, instead of relocating everything after each edit.
+
+		Within the block, edits only change chunk contents, addresses and offsets are stale until the outermost
+		batch exits and update_layout() runs. Batches can be nested.
+
+			with adt.batch():
+				for i, position in enumerate(positions):
+					adt.add_m2_instance(which_chunks, name_id, i, position, (0, 0, 0), 1024, 0)
+		"""
+		self._batch_depth += 1
+		try:
+			yield self
+		finally:
+			self._batch_depth -= 1
+
+			if not self._batch_depth:
+				self._assign_placements()
+
+				if self._layout_dirty:
+					self.update_layout()
+
+	def _get_chunk_order(self):
+		""" Names of the chunks written before and after the map chunks, in the order the client writes them: MH2O
+		precedes the map chunks, MFBO and MTXF follow them. Optional chunks are kept if present. """
+		mhdr = self.mhdr
+		before = ['mcin', 'mtex', 'mmdx', 'mmid', 'mwmo', 'mwid', 'mddf', 'modf']
+		after = []
+
+		if int(mhdr.ofs_mh2o) or any(chunk.layer_count for chunk in self.mh2o.chunks):
+			before.append('mh2o')
+
+		if mhdr.flags & ADTHeaderFlags.mhdr_MFBO:
+			after.append('mfbo')
+
+		if int(mhdr.ofs_mtxf) or self.mtxf.flags:
+			after.append('mtxf')
+
+		return before, after
+
+	def update_layout(self):
+		""" Recomputes the address of every chunk, and all MHDR, MCIN and MCNK offsets, from the chunk contents.
+		Chunks are laid out back to back, see _get_chunk_order. Returns the size of the file. """
+		mhdr = self.mhdr
+		mhdr.start_data = ChunkHeader.size + MVER.data_size + ChunkHeader.size
+		pos = mhdr.start_data + mhdr._get_written_size()
+		before, after = self._get_chunk_order()
+
+		data_sizes = {
+			'mcin': len(self.mcin.entries) * MCIN_entry.size,
+			'mtex': self.mtex.filenames.size,
+			'mmdx': self.mmdx.filenames.size,
+			'mmid': len(self.mmid.offsets) * MMID.entry_size,
+			'mwmo': self.mwmo.filenames.size,
+			'mwid': len(self.mwid.offsets) * MWID.entry_size,
+			'mddf': len(self.mddf.doodad_instances) * ADTDoodadDefinition.size,
+			'modf': len(self.modf.wmo_instances) * ADTWMODefinition.size,
+			'mh2o': len(self.mh2o.chunks) * SMLiquidChunk.size + len(self.mh2o.instances) * SMLiquidInstance.size
+					+ len(self.mh2o.attributes) * SMLiquidAttributes.size,
+			'mfbo': 2 * 9 * int16.size(),
+			'mtxf': len(self.mtxf.flags) * MTXF.entry_size,
+		}
+
+		def place(name):
+			nonlocal pos
+			getattr(self, name).set_address(pos)
+			getattr(mhdr, 'ofs_' + name).set_rel(pos - mhdr.start_data, mhdr.start_data)
+			pos += ChunkHeader.size + data_sizes[name]
+
+		for name in before:
+			place(name)
+
+		self._update_filename_offsets(self.mmdx, self.mmid)
+		self._update_filename_offsets(self.mwmo, self.mwid)
+
 		for row in range(16):
 			for col in range(16):
-				chunk = self.mcnk[row][col]
-				if index in chunk.mcrf.object_refs:
-					chunk.mcrf._remove_object(index)
-					self._size_changed(-MCRF.entry_size, chunk.mcrf.address)
-					chunk.n_map_obj_refs -= 1
+				entry = self.mcin.entries[row * 16 + col]
+				entry.size = self.mcnk[row][col]._update_layout(pos)
+				entry.offset.set_rel(pos, 0)
+				pos += entry.size
+
+		for name in after:
+			place(name)
+
+		for name in MHDR.chunk_names:
+			if name not in before and name not in after:
+				getattr(mhdr, 'ofs_' + name).set_rel(0, mhdr.start_data)
+
+		self._layout_dirty = False
+		return pos
+
+	@staticmethod
+	def _get_filename_offsets(filename_chunk, offset_chunk):
+		# offsets usually point to each filename in order, otherwise they are kept
+		if len(offset_chunk.offsets) != len(filename_chunk.filenames):
+			return [int(offset) for offset in offset_chunk.offsets]
+
+		return filename_chunk.filenames.get_offsets()
+
+	@staticmethod
+	def _update_filename_offsets(filename_chunk, offset_chunk):
+		data_start = filename_chunk.address + ChunkHeader.size
+
+		for offset, ofs in zip(offset_chunk.offsets, ADTFile._get_filename_offsets(filename_chunk, offset_chunk)):
+			offset.set_rel(ofs, data_start)
+
+	def write_sequential(self, f):
+		""" Writes the file at the start of f with chunks back to back, laid out as by update_layout. Offsets are
+		computed from the sizes written instead of read from the tracked ones, which are neither used nor changed,
+		so this works whatever the state of the layout. MHDR and MCIN are patched once the map chunks are written,
+		f is meant to be an in-memory buffer such as BytesIO. """
+		mhdr = self.mhdr
+		before, after = self._get_chunk_order()
+		offsets = {}
+		mcnk_offsets = [0] * 256
+
+		writers = {
+			'mcin': lambda f_: self.mcin.write(f_, mcnk_offsets),
+			'mmid': lambda f_: self.mmid.write(f_, self._get_filename_offsets(self.mmdx, self.mmid)),
+			'mwid': lambda f_: self.mwid.write(f_, self._get_filename_offsets(self.mwmo, self.mwid)),
+		}
+
+		def write_chunks(names):
+			for name in names:
+				offsets[name] = f.tell() - data_start
+				writers.get(name, getattr(self, name).write)(f)
+
+		self.mver.write(f)
+		mhdr_pos = f.tell()
+		mhdr.write(f, offsets)
+		data_start = mhdr_pos + ChunkHeader.size
+
+		write_chunks(before)
 
+		for row in range(16):
+			for col in range(16):
+				i = row * 16 + col
+				mcnk_offsets[i] = f.tell()
+				self.mcin.entries[i].size = self.mcnk[row][col].write_sequential(f)
 
-	# Call this whenever the size of something changes to update offsets.
-	def _size_changed(self, distance, address_of_changed):
-		self._update_offsets(distance, address_of_changed)
-		self._update_mobile_chunks(distance, address_of_changed)
+		write_chunks(after)
+		end = f.tell()
+
+		f.seek(mhdr_pos)
+		mhdr.write(f, offsets)
+		f.seek(data_start + offsets['mcin'])
+		self.mcin.write(f, mcnk_offsets)
+		f.seek(end)
+
+
+	# chunks ADTFile.scan() can read, MCNK stands for the headers of the map chunks
+	scan_chunk_names = ('MHDR', 'MCIN', 'MTEX', 'MMDX', 'MMID', 'MWMO', 'MWID', 'MDDF', 'MODF', 'MCNK')
+
+	@staticmethod
+	def scan(path, chunks=('MTEX', 'MMDX', 'MWMO')):
+		""" Reads some chunks of a file without loading it. The file is mapped and only the requested chunks are
+		read, found through the MHDR and MCIN offsets. Results are plain values, no chunk or offset is tracked.
+
+		Returns a dict of chunk name, from scan_chunk_names, to:
+			MHDR: the flags and the offsets by lowercase chunk name, relative to the MHDR data, as a dict
+			MCIN: (offset, size, flags, async_id) of each map chunk
+			MTEX, MMDX, MWMO: filenames
+			MMID, MWID: offsets of the filenames in MMDX and MWMO
+			MDDF, MODF: ADTDoodadDefinition and ADTWMODefinition instances
+			MCNK: header values of each map chunk by name, see MCNK._unpack_header
 
+			areas = [header['area_id'] for header in ADTFile.scan(path, {'MCNK'})['MCNK']]
+
+		Map chunks are indexed like MCIN (row * 16 + col). Chunks absent from the file are empty.
+		"""
+		chunks = set(chunks)
+		unknown = chunks.difference(ADTFile.scan_chunk_names)
+		if unknown:
+			raise ValueError('Unknown chunks to scan: {}'.format(', '.join(sorted(unknown))))
+
+		result = {}
+
+		with BinaryReader.from_file(path) as f:
+			mver = MVER().read(f)
+			if mver.version != 18:
+				raise NotImplementedError('Unknown ADT version: ({})'.format(mver.version))
+
+			ChunkHeader().read(f)
+			start_data = f.tell()
+			values = uint32.read(f, 1 + len(MHDR.chunk_names))
+			mhdr = dict(zip(MHDR.chunk_names, values[1:]), flags=values[0])
+
+			if 'MHDR' in chunks:
+				result['MHDR'] = mhdr
+
+			def seek(name):
+				# position at the chunk data, False if absent
+				if not mhdr[name]:
+					return False
+
+				f.seek(start_data + mhdr[name])
+				return ChunkHeader().read(f)
+
+			for name in ('MTEX', 'MMDX', 'MWMO'):
+				if name in chunks:
+					header = seek(name.lower())
+					result[name] = StringBlock(header.size).read(f).strings if header else []
+
+			for name in ('MMID', 'MWID'):
+				if name in chunks:
+					header = seek(name.lower())
+					result[name] = numpy.frombuffer(f.read(header.size), dtype='<u4').tolist() if header else []
+
+			for name, entry_type in (('MDDF', ADTDoodadDefinition), ('MODF', ADTWMODefinition)):
+				if name in chunks:
+					header = seek(name.lower())
+					result[name] = entry_type.read_array(f, header.size // entry_type.size) if header else []
+
+			if chunks.intersection(('MCIN', 'MCNK')):
+				header = seek('mcin')
+				entries = list(MCIN._entry_layout.iter_unpack(f.read(header.size))) if header else []
+
+				if 'MCIN' in chunks:
+					result['MCIN'] = entries
+
+				if 'MCNK' in chunks:
+					headers = []
+					for offset, *_ in entries:
+						f.seek(offset + ChunkHeader.size)
+						headers.append(MCNK._unpack_header(f.read(MCNK.header_data_size)))
+
+					result['MCNK'] = headers
+
+		return result
 
 	def read(self, f):
 		self.mver.read(f)
@@ -264,80 +823,161 @@ class ADTFile:
 				f.seek(offset)
 				self.mcnk[row][col].read(f)
 
+		self._layout_dirty = False
+
 
 	def _prune_unused_layers(self):
-		for row in range(16):
-			for col in range(16):
-				chunk = self.mcnk[row][col]
-				for i in range(len(chunk.mcal.layers), 0, -1):
-					if chunk.mcal.layers[i-1].is_fully_transparent():
-						chunk.remove_texture_layer(i)
+		""" Removes the texture layers whose alpha map is fully transparent, returns their number. """
+		n_removed = 0
+
+		for row in self.mcnk:
+			for chunk in row:
+				layers, alpha_layers = chunk.mcly.layers, chunk.mcal.layers
+				# the base layer has no alpha map, the others have one each
+				if len(layers) != len(alpha_layers) + 1:
+					continue
+
+				kept = [i for i, alpha_layer in enumerate(alpha_layers) if not alpha_layer.is_fully_transparent()]
+				if len(kept) == len(alpha_layers):
+					continue
+
+				chunk.mcly.layers = layers[:1] + [layers[i + 1] for i in kept]
+				chunk.mcal.layers = [alpha_layers[i] for i in kept]
+				n_removed += len(alpha_layers) - len(kept)
+
+		if n_removed:
+			self._layout_dirty = True
+
+		return n_removed
+
+	@staticmethod
+	def _get_unused(n, used_ids):
+		""" Indices below n not in used_ids. """
+		return numpy.setdiff1d(numpy.arange(n), numpy.fromiter(used_ids, dtype=numpy.int64)).tolist()
+
+	def _remove_filenames(self, filename_chunk, indices):
+		""" Removes filenames at once, returns an array of the new index of each former one, -1 for removed ones. """
+		n_filenames = len(filename_chunk.filenames)
+		kept = filename_chunk.filenames._remove_many(indices)
+		self._layout_dirty = True
+
+		remap = numpy.full(n_filenames, -1, dtype=numpy.int64)
+		remap[kept] = numpy.arange(len(kept))
+		return remap
+
+	@staticmethod
+	def _remap_ids(entries, name, remap):
+		""" Sets the name attribute of entries to its new index in remap. Ids out of remap are kept. """
+		ids = numpy.fromiter((getattr(entry, name) for entry in entries), dtype=numpy.int64, count=len(entries))
+		valid = ids < len(remap)
+		ids[valid] = remap[ids[valid]]
+
+		for entry, new_id in zip(entries, ids.tolist()):
+			setattr(entry, name, new_id)
 
 	def _prune_unused_textures(self):
-		tex_indices = [i for i in range(len(self.mtex.filenames))]
-		tex_indices.sort(reverse=True)
+		""" Removes the textures no layer uses, returns their filenames. """
+		layers = [layer for row in self.mcnk for chunk in row for layer in chunk.mcly.layers]
+		unused = self._get_unused(len(self.mtex.filenames), {layer.texture_id for layer in layers})
+		if not unused:
+			return []
 
-		used_tex_indices = {}
-		for row in range(16):
-			for col in range(16):
-				chunk = self.mcnk[row][col]
-				for tex_layer in chunk.mcly.layers:
-					index = tex_layer.texture_id
-					used_tex_indices[index] = True
-		
-		for k,_ in enumerate(used_tex_indices):
-			tex_indices.remove(k)
+		filenames = [self.mtex.filenames[index] for index in unused]
+		remap = self._remove_filenames(self.mtex, unused)
 
-		for index in tex_indices:
-			self.remove_texture_filename(index)
+		if int(self.mhdr.ofs_mtxf):
+			self.mtxf.flags = [flags for flags, index in zip(self.mtxf.flags, remap.tolist()) if index >= 0]
 
-	def _prune_unused_M2s(self):
-		m2_indices = [i for i in range(len(self.mmdx.filenames))]
-		m2_indices.sort(reverse=True)
+		self._remap_ids(layers, 'texture_id', remap)
+		return filenames
 
-		used_m2_indices = {}
-		for row in range(16):
-			for col in range(16):
-				chunk = self.mcnk[row][col]
-				
-				for doodad_instance in self.mddf.doodad_instances:
-					used_m2_indices[doodad_instance.name_id] = True
+	def _prune_unused_model_filenames(self, filename_chunk, offset_chunk, instances):
+		# offsets that do not point to each filename in order cannot be reindexed with them
+		if len(offset_chunk.offsets) != len(filename_chunk.filenames):
+			return []
 
-		for k,_ in enumerate(used_m2_indices):
-			m2_indices.remove(k)
-		
-		for index in m2_indices:
-			self.remove_m2_filename(index)
+		unused = self._get_unused(len(filename_chunk.filenames), {instance.name_id for instance in instances})
+		if not unused:
+			return []
 
-	def _prune_unused_WMOs(self):
-		wmo_indices = [i for i in range(len(self.mwmo.filenames))]
-		wmo_indices.sort(reverse=True)
+		filenames = [filename_chunk.filenames[index] for index in unused]
+		remap = self._remove_filenames(filename_chunk, unused)
+		offset_chunk.offsets = [offset for offset, index in zip(offset_chunk.offsets, remap.tolist()) if index >= 0]
 
-		used_wmo_indices = {}
-		for row in range(16):
-			for col in range(16):
-				chunk = self.mcnk[row][col]
-				
-				for wmo_instance in self.modf.wmo_instances:
-					used_wmo_indices[wmo_instance.name_id] = True
-
-		for k,_ in enumerate(used_wmo_indices):
-			wmo_indices.remove(k)
-		
-		for index in wmo_indices:
-			self.remove_wmo_filename(index)
+		self._remap_ids(instances, 'name_id', remap)
+		return filenames
 
+	def _prune_unused_M2s(self):
+		""" Removes the M2 filenames no doodad uses, returns them. """
+		return self._prune_unused_model_filenames(self.mmdx, self.mmid, self.mddf.doodad_instances)
 
-	def write(self, write_path=None, optimize=False):
+	def _prune_unused_WMOs(self):
+		""" Removes the WMO filenames no WMO instance uses, returns them. """
+		return self._prune_unused_model_filenames(self.mwmo, self.mwid, self.modf.wmo_instances)
+
+	def _prune_missing_refs(self):
+		""" Removes the MCRF references to doodads and WMOs past the end of MDDF and MODF, returns their number. """
+		n_doodads, n_wmos = len(self.mddf.doodad_instances), len(self.modf.wmo_instances)
+		n_removed = 0
+
+		for row in self.mcnk:
+			for chunk in row:
+				mcrf = chunk.mcrf
+				doodad_refs = [ref for ref in mcrf.doodad_refs if ref < n_doodads]
+				object_refs = [ref for ref in mcrf.object_refs if ref < n_wmos]
+				n_chunk_removed = len(mcrf.doodad_refs) + len(mcrf.object_refs) - len(doodad_refs) - len(object_refs)
+
+				if n_chunk_removed:
+					mcrf.doodad_refs, mcrf.object_refs = doodad_refs, object_refs
+					n_removed += n_chunk_removed
+
+		if n_removed:
+			self._layout_dirty = True
+			self.update_placement_index()
+
+		return n_removed
+
+	def optimize(self):
+		""" Removes what the tile does not use, in one pass: fully transparent texture layers, then the textures no
+		layer uses, the M2 and WMO filenames no placement uses, and MCRF references to missing placements. Each
+		table is rebuilt once, the indices referencing it are remapped at once, and the file is laid out anew.
+		Returns an OptimizeReport. """
+		self._assign_placements()
+		size = self.update_layout()
+
+		# edits only change contents from here, _size_changed does not move anything while the layout is dirty
+		self._layout_dirty = True
+		n_layers = self._prune_unused_layers()
+		textures = self._prune_unused_textures()
+		m2s = self._prune_unused_M2s()
+		wmos = self._prune_unused_WMOs()
+		n_refs = self._prune_missing_refs()
+
+		return OptimizeReport(n_layers, textures, m2s, wmos, n_refs, size - self.update_layout())
+
+
+	def write(self, write_path=None, optimize=False, sequential=False):
+		""" Writes the file, by default chunks are written at their tracked addresses. With sequential, they are
+		serialized back to back in memory and written at once, see write_sequential. """
 		if not write_path:
 			write_path = self.filepath
 
 		if optimize:
-			self._prune_unused_layers()
-			self._prune_unused_textures()
-			self._prune_unused_M2s()
-			self._prune_unused_WMOs()
-		
+			self.optimize()
+
+		if sequential:
+			buffer = BytesIO()
+			self.write_sequential(buffer)
+
+			with open(write_path, 'wb') as f:
+				f.write(buffer.getbuffer())
+
+			return
+
+		# compressed alpha maps are written as encoded now, their sizes may differ from the tracked layout
+		if self._layout_dirty or any(chunk._is_alpha_layout_stale() for row in self.mcnk for chunk in row):
+			self.update_layout()
+
 		with open(write_path, 'wb') as f:
 			self.mver.write(f)
 			self.mhdr.write(f)
@@ -0,0 +1,118 @@
+from math import floor
+from typing import Dict, Iterable, List, Set, Tuple
+
+from .file_formats.adt_chunks import CHUNK_SIZE
+
+# placements spanning more cells are not bucketed but checked by every query
+_MAX_CELLS = 256
+
+
+class PlacementIndex:
+    """ Placements of a tile, doodads from MDDF or WMOs from MODF, by location and by the map chunks referencing them.
+
+    Placements are identified by their index in MDDF or MODF. Their horizontal bounds, (min x, min z, max x, max z)
+    in placement coordinates, are bucketed in a uniform grid, so that query() only looks at the cells a rectangle
+    overlaps. The chunks referencing each placement in MCRF are kept as indices in MCIN (row * 16 + col).
+
+    remove() follows MDDF and MODF removal: the last placement takes the index of the removed one, so only the
+    placements and chunks involved change.
+    """
+    __slots__ = ('_cell_size', '_cells', '_large', '_bounds', '_cell_ranges', '_chunks')
+
+    def __init__(self, cell_size: float = CHUNK_SIZE):
+        self._cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], Set[int]] = {}
+        self._large: Set[int] = set()
+        self._bounds: List[Tuple[float, float, float, float]] = []
+        self._cell_ranges: List[Tuple[int, int, int, int]] = []
+        self._chunks: List[Set[int]] = []
+
+    def _get_cell_range(self, bounds) -> Tuple[int, int, int, int]:
+        cell_size = self._cell_size
+        min_x, min_z, max_x, max_z = bounds
+        return (floor(min_x / cell_size), floor(min_z / cell_size),
+                floor(max_x / cell_size), floor(max_z / cell_size))
+
+    def _insert(self, index: int):
+        cell_range = self._cell_ranges[index] = self._get_cell_range(self._bounds[index])
+        min_i, min_j, max_i, max_j = cell_range
+
+        if (max_i - min_i + 1) * (max_j - min_j + 1) > _MAX_CELLS:
+            self._large.add(index)
+            return
+
+        for i in range(min_i, max_i + 1):
+            for j in range(min_j, max_j + 1):
+                self._cells.setdefault((i, j), set()).add(index)
+
+    def _erase(self, index: int):
+        if index in self._large:
+            self._large.discard(index)
+            return
+
+        min_i, min_j, max_i, max_j = self._cell_ranges[index]
+        for i in range(min_i, max_i + 1):
+            for j in range(min_j, max_j + 1):
+                cell = self._cells[i, j]
+                cell.discard(index)
+                if not cell:
+                    del self._cells[i, j]
+
+    def append(self, bounds: Tuple[float, float, float, float], chunks: Iterable[int] = ()):
+        """ Adds a placement after the last one. """
+        self._bounds.append(tuple(bounds))
+        self._cell_ranges.append((0, 0, -1, -1))
+        self._chunks.append(set(chunks))
+        self._insert(len(self._bounds) - 1)
+
+    def remove(self, index: int):
+        """ Removes a placement, the last one takes its index. """
+        last = len(self._bounds) - 1
+        self._erase(index)
+
+        if index != last:
+            self._erase(last)
+            self._bounds[index] = self._bounds[last]
+            self._chunks[index] = self._chunks[last]
+            self._insert(index)
+
+        del self._bounds[last]
+        del self._cell_ranges[last]
+        del self._chunks[last]
+
+    def add_ref(self, index: int, chunk: int):
+        self._chunks[index].add(chunk)
+
+    def remove_ref(self, index: int, chunk: int):
+        self._chunks[index].discard(chunk)
+
+    def get_chunks(self, index: int) -> Set[int]:
+        """ Chunks referencing the placement, as indices in MCIN. """
+        return self._chunks[index]
+
+    def get_bounds(self, index: int) -> Tuple[float, float, float, float]:
+        return self._bounds[index]
+
+    def query(self, min_x: float, min_z: float, max_x: float, max_z: float) -> Set[int]:
+        """ Placements whose bounds overlap the rectangle. """
+        min_i, min_j, max_i, max_j = self._get_cell_range((min_x, min_z, max_x, max_z))
+        candidates = set(self._large)
+
+        if (max_i - min_i + 1) * (max_j - min_j + 1) <= len(self._cells):
+            for i in range(min_i, max_i + 1):
+                for j in range(min_j, max_j + 1):
+                    cell = self._cells.get((i, j))
+                    if cell:
+                        candidates.update(cell)
+        else:
+            # the rectangle covers more cells than are occupied
+            for (i, j), cell in self._cells.items():
+                if min_i <= i <= max_i and min_j <= j <= max_j:
+                    candidates.update(cell)
+
+        bounds = self._bounds
+        return {index for index in candidates if bounds[index][0] <= max_x and bounds[index][2] >= min_x
+                and bounds[index][1] <= max_z and bounds[index][3] >= min_z}
+
+    def __len__(self) -> int:
+        return len(self._bounds)
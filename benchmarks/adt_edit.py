@@ -0,0 +1,59 @@
+"""
+Benchmark of in-place ADT edits: places doodads on a synthetic tile, each referenced from two chunks, so that every
+placement relocates the addresses of all data behind MDDF and the referencing MCRF chunks. The same placement is
+then timed within ADTFile.batch(), which computes the layout once when the batch exits.
+
+Usage: python -m pywowlib.benchmarks.adt_edit [n_doodads]
+"""
+
+import os
+import sys
+
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from .. import WoWVersionManager, WoWVersions
+from .synthetic import make_adt
+
+
+def place_doodads(adt, n_doodads):
+    name_id = adt.add_m2_filename('world\\synthetic\\placed.m2')
+
+    for i in range(n_doodads):
+        row, col = (i // 16) % 16, i % 16
+        adt.add_m2_instance([(row, col), (row, (col + 1) % 16)], name_id, 100000 + i,
+                            (col * 33.3 + 1.0, row * 33.3 + 1.0, 0.0), (0.0, 0.0, 0.0), 1024, 0)
+
+
+def run(n_doodads=5000):
+    from ..adt_file import ADTFile
+
+    WoWVersionManager().set_client_version(WoWVersions.WOTLK)
+
+    with TemporaryDirectory(prefix='pywowlib_bench_') as directory:
+        path = make_adt(os.path.join(directory, 'synthetic.adt'))
+        immediate = ADTFile(path)
+        batched = ADTFile(path)
+
+    start = perf_counter()
+    place_doodads(immediate, n_doodads)
+    t_immediate = perf_counter() - start
+
+    start = perf_counter()
+    with batched.batch():
+        place_doodads(batched, n_doodads)
+    t_batched = perf_counter() - start
+
+    return t_immediate, t_batched
+
+
+def main():
+    n_doodads = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    for name, elapsed in zip(('immediate', 'batch'), run(n_doodads)):
+        print("{:<10}{} doodads placed in {:.3f} s ({:.1f} us per doodad)".format(
+            name, n_doodads, elapsed, elapsed / n_doodads * 1e6))
+
+
+if __name__ == '__main__':
+    main()
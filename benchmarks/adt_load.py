@@ -0,0 +1,63 @@
+"""
+Benchmark of loading and discarding ADT tiles: reads a synthetic tile repeatedly, dropping each ADTFile before
+loading the next one, as map-wide tools do. Reports the time to load tiles and the time to free them, the latter
+split between reference counting and the cyclic garbage collector, which chunks referencing their file go through.
+With --lazy, tiles are read lazily, map chunk sub-chunks are then left undecoded.
+
+Usage: python -m pywowlib.benchmarks.adt_load [n_tiles] [--lazy]
+"""
+
+import gc
+import os
+import sys
+
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from .. import WoWVersionManager, WoWVersions
+from .synthetic import make_adt
+
+
+def run(n_tiles=100, lazy=False):
+    from ..adt_file import ADTFile
+
+    WoWVersionManager().set_client_version(WoWVersions.WOTLK)
+
+    t_load = t_free = t_collect = 0.0
+    gc.collect()
+    gc.disable()
+
+    try:
+        with TemporaryDirectory(prefix='pywowlib_bench_') as directory:
+            path = make_adt(os.path.join(directory, 'synthetic.adt'))
+
+            for _ in range(n_tiles):
+                start = perf_counter()
+                adt = ADTFile(path, lazy=lazy)
+                t_load += perf_counter() - start
+
+                start = perf_counter()
+                del adt
+                t_free += perf_counter() - start
+
+                start = perf_counter()
+                gc.collect()
+                t_collect += perf_counter() - start
+    finally:
+        gc.enable()
+
+    return t_load, t_free, t_collect
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != '--lazy']
+    n_tiles = int(args[0]) if args else 100
+
+    t_load, t_free, t_collect = run(n_tiles, '--lazy' in sys.argv)
+    print("{} tiles loaded in {:.3f} s ({:.1f} ms per tile)".format(n_tiles, t_load, t_load / n_tiles * 1e3))
+    print("freed in {:.3f} s, of which {:.3f} s in the garbage collector ({:.1f} ms per tile)".format(
+        t_free + t_collect, t_collect, (t_free + t_collect) / n_tiles * 1e3))
+
+
+if __name__ == '__main__':
+    main()
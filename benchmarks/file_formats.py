@@ -0,0 +1,198 @@
+"""
+Read, write and round-trip benchmarks for every supported file format.
+
+Synthetic files are generated into a temporary directory first (see benchmarks.synthetic). Each operation is timed
+over several runs, then run once more under tracemalloc to record its memory peak. Results are printed as JSON,
+to be compared between revisions.
+
+Usage: python -m pywowlib.benchmarks.file_formats [--repeat N] [--output results.json] [format ...]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tracemalloc
+
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from .. import WoWVersionManager, WoWVersions
+from . import synthetic
+
+
+###### Formats ######
+
+def _read_adt(path):
+    from ..adt_file import ADTFile
+    return ADTFile(path)
+
+
+def _write_adt(adt, path):
+    adt.write(path)
+
+
+def _read_m2(path):
+    from ..m2_file import M2File
+    return M2File(WoWVersions.WOTLK, path)
+
+
+def _write_m2(m2, path):
+    m2.write(path)
+
+
+def _read_wmo(path):
+    from ..wmo_file import WMOFile
+
+    wmo = WMOFile(WoWVersions.WOTLK, path)
+    wmo.read()
+    return wmo
+
+
+def _write_wmo(wmo, path):
+    root_name = os.path.splitext(path)[0]
+
+    wmo.filepath = path
+    for i, group in enumerate(wmo.groups):
+        group.filepath = "{}_{}.wmo".format(root_name, str(i).zfill(3))
+
+    wmo.write()
+
+
+def _read_dbc(path):
+    from ..wdbx.wdbc import DBCFile
+    from ..io_utils.binary_reader import BinaryReader
+
+    dbc = DBCFile('CharSections', synthetic.dbc_definition())
+    with BinaryReader.from_file(path) as f:
+        dbc.read(f)
+
+    return dbc
+
+
+def _write_dbc(dbc, path):
+    with open(path, 'wb') as f:
+        dbc.write(f)
+
+
+def _read_wdc1(path):
+    from ..wdbx.wdc1 import WDC1
+    from ..io_utils.binary_reader import BinaryReader
+
+    wdc1 = WDC1()
+    with BinaryReader.from_file(path) as f:
+        wdc1.read(f)
+
+    return wdc1
+
+
+# name: (file extension, generator, reader, writer or None if the format is read-only)
+FORMATS = {
+    'adt': ('.adt', synthetic.make_adt, _read_adt, _write_adt),
+    'm2': ('.m2', synthetic.make_m2, _read_m2, _write_m2),
+    'wmo': ('.wmo', synthetic.make_wmo, _read_wmo, _write_wmo),
+    'dbc': ('.dbc', synthetic.make_dbc, _read_dbc, _write_dbc),
+    'wdc1': ('.db2', synthetic.make_wdc1, _read_wdc1, None),
+}
+
+
+###### Measurement ######
+
+def measure(func, repeat):
+    """ Times func over repeat runs, then runs it once more to record the traced memory peak. """
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        times.append(perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    mean = sum(times) / len(times)
+
+    return {
+        'mean_s': mean,
+        'min_s': min(times),
+        'max_s': max(times),
+        'ops_per_sec': 1 / mean if mean else None,
+        'peak_memory_bytes': peak,
+    }
+
+
+def run_format(name, directory, repeat):
+    ext, generate, read, write = FORMATS[name]
+
+    directory = os.path.join(directory, name)
+    os.mkdir(directory)
+
+    src = os.path.join(directory, 'synthetic' + ext)
+    dst = os.path.join(directory, 'synthetic_out' + ext)
+
+    generate(src)
+
+    # including WMO groups and M2 skins
+    result = {'file_size_bytes': sum(entry.stat().st_size for entry in os.scandir(directory))}
+
+    result['read'] = measure(lambda: read(src), repeat)
+
+    if write is None:
+        result['write'] = result['roundtrip'] = None
+        return result
+
+    loaded = read(src)
+    result['write'] = measure(lambda: write(loaded, dst), repeat)
+    result['roundtrip'] = measure(lambda: write(read(src), dst), repeat)
+
+    return result
+
+
+def run(formats=None, repeat=3):
+    """ Benchmarks the given formats, all by default. A format failing to import or run reports its error. """
+    WoWVersionManager().set_client_version(WoWVersions.WOTLK)
+
+    results = {}
+
+    with TemporaryDirectory(prefix='pywowlib_bench_') as directory:
+        for name in formats or FORMATS:
+            try:
+                results[name] = run_format(name, directory, repeat)
+            except Exception as e:
+                results[name] = {'error': '{}: {}'.format(type(e).__name__, e)}
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('formats', nargs='*', metavar='format',
+                        help="formats to benchmark: {}, all by default".format(', '.join(FORMATS)))
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per operation")
+    parser.add_argument('--output', help="write the JSON results to a file instead of stdout")
+    args = parser.parse_args()
+
+    for name in args.formats:
+        if name not in FORMATS:
+            parser.error("unknown format \"{}\"".format(name))
+
+    report = json.dumps(run(args.formats, args.repeat), indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        sys.stdout.write(report + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Micro-benchmark for io_utils.types.GenericType.
+
+Compares the per-call cost of the precompiled struct.Struct codecs against the previous implementation,
+which validated the length and built the format string on every call.
+
+Usage: python -m pywowlib.benchmarks.generic_type [n_calls]
+"""
+
+import sys
+
+from io import BytesIO
+from collections.abc import Iterable
+from struct import pack, unpack
+from timeit import timeit
+
+from ..io_utils.types import uint32, float32, vec3D
+
+
+def legacy_read(type_, f, n=1):
+    if type(n) is not int:
+        raise TypeError('Length can only be represented by an integer value.')
+
+    if n <= 0:
+        raise TypeError('Length should be an integer value above 0.')
+
+    if n == 1:
+        ret = unpack(type_.format, f.read(type_.size_))
+    else:
+        ret = unpack(str(n) + type_.format, f.read(type_.size_ * n))
+    return ret[0] if len(ret) == 1 else ret
+
+
+def legacy_write(type_, f, value, n=1):
+    if type(n) is not int:
+        raise TypeError('Length can only be represented by an integer value.')
+
+    if n <= 0:
+        raise TypeError('Length should be an integer value above 0.')
+
+    if n == 1:
+        if isinstance(value, Iterable):
+            f.write(pack(type_.format, *value))
+        else:
+            f.write(pack(type_.format, value))
+    else:
+        f.write(pack(str(n) + type_.format, *value))
+
+
+def run(n_calls=200000):
+    # enough data for every call to consume its own bytes without rewinding
+    data = bytes(range(256)) * (n_calls * 64 // 256 + 1)
+    values = tuple(range(16))
+
+    ns = {
+        'f': BytesIO(data),
+        'view': memoryview(data),
+        'sink': BytesIO(),
+        'values': values,
+        'legacy_read': legacy_read,
+        'legacy_write': legacy_write,
+        'uint32': uint32,
+        'float32': float32,
+        'vec3D': vec3D,
+    }
+
+    cases = (
+        ('uint32.read', 'legacy_read(uint32, f)', 'uint32.read(f)'),
+        ('uint32.read n=16', 'legacy_read(uint32, f, 16)', 'uint32.read(f, 16)'),
+        ('vec3D.read', 'legacy_read(vec3D, f)', 'vec3D.read(f)'),
+        ('float32.write', 'legacy_write(float32, sink, 1.0)', 'float32.write(sink, 1.0)'),
+        ('uint32.write n=16', 'legacy_write(uint32, sink, values, 16)', 'uint32.write(sink, values, 16)'),
+        ('uint32.unpack_from', 'legacy_read(uint32, f)', 'uint32.unpack_from(view, 64)'),
+    )
+
+    results = []
+    for name, before, after in cases:
+        setup = 'f.seek(0); sink.seek(0)'
+        t_before = timeit(before, setup, number=n_calls, globals=ns) / n_calls * 1e9
+        t_after = timeit(after, setup, number=n_calls, globals=ns) / n_calls * 1e9
+        results.append((name, t_before, t_after))
+
+    return results
+
+
+def main():
+    n_calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    print("{:<22}{:>14}{:>14}{:>10}".format('case', 'before, ns', 'after, ns', 'speedup'))
+    for name, t_before, t_after in run(n_calls):
+        print("{:<22}{:>14.1f}{:>14.1f}{:>9.2f}x".format(name, t_before, t_after, t_before / t_after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark of the cold start of declarative structs: specializes templates in a fresh process, as a converter worker
+does on its first file, with and without the compiled code saved by struct_cache.save_struct_cache(). The time left
+with the cache loaded is that of building the struct classes, which the cache does not spare.
+
+Usage: python -m pywowlib.benchmarks.struct_cold_start [n_specializations]
+"""
+
+import os
+import subprocess
+import sys
+
+from tempfile import TemporaryDirectory
+
+
+_WORKER = '''
+import sys
+from time import perf_counter
+
+from {package}.io_utils.ctypes import *
+from {package}.io_utils.struct import *
+from {package}.io_utils.var_type import VarType
+from {package}.io_utils.metaclass_hook import Structs
+from {package}.io_utils.struct_cache import save_struct_cache, load_struct_cache
+
+T = VarType('T')
+Tx = VarType('Tx')
+
+with Structs:
+    class Record:
+        kind: T
+        flags: uint32
+        position: float32[3]
+        values: uint16[Tx]
+
+n, cache_path, mode = int(sys.argv[1]), sys.argv[2], sys.argv[3]
+if mode == 'load':
+    load_struct_cache(cache_path)
+
+start = perf_counter()
+for i in range(n):
+    Record % {{'T': (uint8, uint16, uint32, float32)[i % 4], 'Tx': i // 4 + 1}}
+print(perf_counter() - start)
+
+if mode == 'save':
+    save_struct_cache(cache_path)
+'''
+
+
+def run(n_specializations=400):
+    package = __package__.rpartition('.')[0]
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    with TemporaryDirectory(prefix='pywowlib_bench_') as directory:
+        cache_path = os.path.join(directory, 'structs.cache')
+
+        def worker(mode):
+            output = subprocess.check_output([sys.executable, '-c', _WORKER.format(package=package),
+                                              str(n_specializations), cache_path, mode], cwd=root)
+            return float(output)
+
+        t_cold = worker('save')
+        t_cached = worker('load')
+
+    return t_cold, t_cached
+
+
+def main():
+    n_specializations = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+
+    t_cold, t_cached = run(n_specializations)
+    print("{} specializations: {:.1f} ms cold, {:.1f} ms with the compiled code cache loaded".format(
+        n_specializations, t_cold * 1e3, t_cached * 1e3))
+    print("class construction left: {:.0f} us per specialization".format(t_cached / n_specializations * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+"""
+Synthetic, but realistically sized files for benchmarks.
+
+Terrain, geometry and table contents are deterministic pseudo-random data, so that consecutive runs measure the
+same work. Every generator writes to the given path and returns it.
+"""
+
+import math
+import random
+
+from struct import pack
+
+from .. import WoWVersions
+
+
+def _chunk(magic, data, size=None):
+    """ Chunk header with the reversed magic the client uses, followed by the data. """
+    return magic[::-1].encode('ascii') + pack('<I', len(data) if size is None else size) + data
+
+
+def _string_block(strings):
+    block = b''.join(s.encode('ascii') + b'\0' for s in strings)
+    offsets = []
+    ofs = 0
+
+    for s in strings:
+        offsets.append(ofs)
+        ofs += len(s) + 1
+
+    return block, offsets
+
+
+###### ADT ######
+
+def _adt_mcnk(rng, row, col, n_doodads, n_wmos, alpha_maps):
+    heights = [math.sin((row * 8 + i % 17) * 0.1) * 25.0 + rng.uniform(-1.0, 1.0) for i in range(145)]
+    normals = [(rng.randint(-20, 20), rng.randint(-20, 20), 127) for _ in range(145)]
+
+    mcvt = _chunk('MCVT', pack('<145f', *heights))
+    # pre-Cata MCNR is followed by 13 bytes not included in its size
+    mcnr = _chunk('MCNR', b''.join(pack('<3b', *n) for n in normals) + bytes(13), size=435)
+
+    # four texture layers, three of them with an uncompressed highres alpha map
+    mcly = _chunk('MCLY', b''.join(pack('<4I', i, 0x100 if i else 0, (i - 1) * 4096 if i else 0, 0)
+                                   for i in range(4)))
+
+    refs = [rng.randrange(n_doodads) for _ in range(4)] + [rng.randrange(n_wmos)]
+    mcrf = _chunk('MCRF', pack('<{}I'.format(len(refs)), *refs))
+
+    mcal = _chunk('MCAL', b''.join(alpha_maps[(row + col + i) % len(alpha_maps)] for i in range(3)))
+
+    mcse = _chunk('MCSE', b'')
+
+    header_size = 8 + 128
+    ofs_mcvt = header_size
+    ofs_mcnr = ofs_mcvt + len(mcvt)
+    ofs_mcly = ofs_mcnr + len(mcnr)
+    ofs_mcrf = ofs_mcly + len(mcly)
+    ofs_mcal = ofs_mcrf + len(mcrf)
+    ofs_mcse = ofs_mcal + len(mcal)
+
+    header = pack('<5I2I6I2I2H16s8s4I3f3I',
+                  0, col, row, 4, 4,                                    # flags, index x/y, layers, doodad refs
+                  ofs_mcvt, ofs_mcnr,
+                  ofs_mcly, ofs_mcrf, ofs_mcal, len(mcal) - 8, 0, 0,   # MCSH offset and size
+                  row * 16 + col, 1,                                    # area id, wmo refs
+                  0, 0, bytes(16), bytes(8),
+                  ofs_mcse, 0, 0, 0,                                    # no sound emitters, no MCLQ
+                  col * 33.3333, row * 33.3333, heights[0],
+                  0, 0, 0)
+
+    return _chunk('MCNK', header + mcvt + mcnr + mcly + mcrf + mcal + mcse)
+
+
+def make_adt(path, seed=0):
+    """ WotLK terrain tile with 256 chunks, 4 texture layers each, liquid in every chunk, doodads and WMOs. """
+    rng = random.Random(seed)
+    n_textures, n_doodads, n_wmos = 8, 64, 4
+
+    textures, _ = _string_block(['tileset\\synthetic\\texture_{:02}.blp'.format(i) for i in range(n_textures)])
+    m2_block, m2_offsets = _string_block(['world\\synthetic\\doodad_{:02}.m2'.format(i) for i in range(16)])
+    wmo_block, wmo_offsets = _string_block(['world\\wmo\\synthetic\\building_{}.wmo'.format(i)
+                                            for i in range(n_wmos)])
+
+    mddf = b''.join(pack('<2I6f2H', i % 16, i, rng.uniform(0, 533), rng.uniform(0, 533), rng.uniform(0, 50),
+                         0.0, rng.uniform(0, 360), 0.0, 1024, 0) for i in range(n_doodads))
+    modf = b''.join(pack('<2I12f4H', i, 1000 + i, i * 100.0, i * 100.0, 10.0, 0.0, 0.0, 0.0,
+                         i * 100.0 - 20, 0.0, i * 100.0 - 20, i * 100.0 + 20, 30.0, i * 100.0 + 20, 0, 0, 0, 1024)
+                    for i in range(n_wmos))
+
+    # MH2O: every chunk has one liquid instance and attributes, offsets are relative to the chunk data
+    instances_start = 256 * 12
+    attributes_start = instances_start + 256 * 24
+    mh2o = b''.join(pack('<3I', instances_start + i * 24, 1, attributes_start + i * 16) for i in range(256))
+    mh2o += b''.join(pack('<2H2f4B2I', 0, 0, 10.0, 12.0, 0, 0, 8, 8, 0, 0) for _ in range(256))
+    mh2o += b''.join(pack('<2Q', 0xFFFFFFFFFFFFFFFF, 0) for _ in range(256))
+
+    data_chunks = [
+        ('mtex', _chunk('MTEX', textures)),
+        ('mmdx', _chunk('MMDX', m2_block)),
+        ('mmid', _chunk('MMID', pack('<{}I'.format(len(m2_offsets)), *m2_offsets))),
+        ('mwmo', _chunk('MWMO', wmo_block)),
+        ('mwid', _chunk('MWID', pack('<{}I'.format(len(wmo_offsets)), *wmo_offsets))),
+        ('mddf', _chunk('MDDF', mddf)),
+        ('modf', _chunk('MODF', modf)),
+        ('mh2o', _chunk('MH2O', mh2o)),
+    ]
+
+    # a few distinct highres alpha maps shared between the chunks
+    alpha_maps = [bytes(int(128 + 127 * math.sin((x + y * i) * 0.05 + i)) for y in range(64) for x in range(64))
+                  for i in range(8)]
+    mcnks = [_adt_mcnk(rng, row, col, n_doodads, n_wmos, alpha_maps) for row in range(16) for col in range(16)]
+
+    mhdr_data_start = 12 + 8
+    mcin_start = mhdr_data_start + 64
+    ofs = mcin_start + 8 + 256 * 16
+
+    chunk_offsets = {}
+    for name, data in data_chunks:
+        chunk_offsets[name] = ofs
+        ofs += len(data)
+
+    mcin = b''
+    for data in mcnks:
+        mcin += pack('<4I', ofs, len(data), 0, 0)
+        ofs += len(data)
+
+    # flags, offsets relative to the MHDR data: MCIN, MTEX, MMDX, MMID, MWMO, MWID, MDDF, MODF, MFBO, MH2O, MTXF
+    rel = {name: adr - mhdr_data_start for name, adr in chunk_offsets.items()}
+    mhdr = pack('<12I4I', 0, mcin_start - mhdr_data_start, rel['mtex'], rel['mmdx'], rel['mmid'], rel['mwmo'],
+                rel['mwid'], rel['mddf'], rel['modf'], 0, rel['mh2o'], 0, 0, 0, 0, 0)
+
+    with open(path, 'wb') as f:
+        f.write(_chunk('MVER', pack('<I', 18)))
+        f.write(_chunk('MHDR', mhdr))
+        f.write(_chunk('MCIN', mcin))
+
+        for _, data in data_chunks:
+            f.write(data)
+
+        for data in mcnks:
+            f.write(data)
+
+    return path
+
+
+###### M2 ######
+
+def make_m2(path, n_bones=64, n_vertices=4000, n_keys=30, seed=0):
+    """ WotLK model with a bone chain animated by translation, rotation and scale tracks, and one skin. """
+    from ..m2_file import M2File
+    from ..file_formats.m2_format import M2CompQuaternion
+
+    rng = random.Random(seed)
+    m2 = M2File(WoWVersions.WOTLK)
+    m2.add_dummy_anim_set((0.0, 0.0, 0.0))
+
+    timestamps = list(range(0, n_keys * 33, 33))
+
+    for i in range(n_bones):
+        bone = m2.root.bones[m2.add_bone((0.0, 0.0, i * 0.1), -1, 0, i - 1)]
+
+        bone.translation.timestamps.new().extend(timestamps)
+        bone.translation.values.new().extend([(rng.uniform(-0.1, 0.1), 0.0, 0.0) for _ in timestamps])
+        bone.rotation.timestamps.new().extend(timestamps)
+        bone.rotation.values.new().extend([M2CompQuaternion((32767, 0, 0, rng.randint(-512, 512)))
+                                           for _ in timestamps])
+        bone.scale.timestamps.new().extend(timestamps)
+        bone.scale.values.new().extend([(1.0, 1.0, 1.0)] * n_keys)
+
+    side = int(math.sqrt(n_vertices))
+    vertices = [(x * 0.1, y * 0.1, rng.uniform(0, 0.1)) for y in range(side) for x in range(side)]
+    n = len(vertices)
+    tris = []
+    for y in range(side - 1):
+        for x in range(side - 1):
+            i = y * side + x
+            tris.append((i, i + 1, i + side))
+            tris.append((i + 1, i + side + 1, i + side))
+
+    m2.add_geoset(vertices, [(0.0, 0.0, 1.0)] * n, [(x / side, y / side) for x, y, _ in vertices], None, tris,
+                  [(i * n_bones // n, 0, 0, 0) for i in range(n)], [(255, 0, 0, 0)] * n,
+                  (0.0, 0.0, 0.0), (0.0, 0.0, 0.0), 1.0, 0)
+
+    m2.write(path)
+
+    return path
+
+
+###### WMO ######
+
+def make_wmo(path, n_groups=4, n_vertices=3000, n_doodads=64, seed=0):
+    """ WotLK root with materials and doodads, and group files with geometry, one batch each and vertex colors.
+    Group files are written next to the root as <name>_<index>.wmo.
+    """
+    from ..wmo_file import WMOFile
+    from ..file_formats.wmo_format_root import GroupInfo
+    from ..file_formats.wmo_format_group import TriangleMaterial, Batch
+
+    rng = random.Random(seed)
+    wmo = WMOFile(WoWVersions.WOTLK, path)
+
+    for i in range(4):
+        wmo.add_material('world\\wmo\\synthetic\\texture_{}.blp'.format(i))
+
+    wmo.add_doodad_set('Set_$DefaultGlobal', n_doodads)
+    for i in range(n_doodads):
+        wmo.add_doodad('world\\synthetic\\doodad_{:02}.m2'.format(i % 16),
+                       (rng.uniform(-50, 50), rng.uniform(-50, 50), 0.0), (0.0, 0.0, 0.0, 1.0), 1.0,
+                       (255, 255, 255, 255), 0)
+
+    n_triangles = n_vertices - 2
+
+    for g in range(n_groups):
+        group = wmo.add_group()
+        group.movt.vertices = [(i * 0.1, g * 10.0, rng.uniform(0, 5)) for i in range(n_vertices)]
+        group.monr.normals = [(0.0, 0.0, 1.0)] * n_vertices
+        group.motv.tex_coords = [(i / n_vertices, 0.0) for i in range(n_vertices)]
+        group.movi.indices = [i + k for i in range(n_triangles) for k in range(3)]
+        group.mocv.vert_colors = [(127, 127, 127, 255)] * n_vertices
+
+        material = TriangleMaterial()
+        material.material_id = g % 4
+        group.mopy.triangle_materials = [material] * n_triangles
+
+        batch = Batch()
+        batch.n_triangles = n_triangles
+        batch.last_vertex = n_vertices - 1
+        batch.material_id = g % 4
+        group.moba.batches = [batch]
+
+        wmo.mogi.infos.append(GroupInfo())
+
+    wmo.mohd.n_groups = n_groups
+    wmo.mohd.n_materials = len(wmo.momt.materials)
+    wmo.write()
+
+    return path
+
+
+###### DBC / WDC1 ######
+
+def dbc_definition():
+    """ Definition of the CharSections table from the bundled WotLK definitions: integer and string fields. """
+    from ..wdbx.definitions.wotlk import CharSections
+    return CharSections
+
+
+def make_dbc(path, n_records=5000, seed=0):
+    """ WDBC table following dbc_definition(), every record with unique strings. """
+    from ..wdbx.types import DBCString
+
+    rng = random.Random(seed)
+    fields = dbc_definition()
+    n_fields = len(fields)
+
+    strings = bytearray(b'\0')
+    records = bytearray()
+
+    for i in range(n_records):
+        values = []
+        for name, type_ in fields.items():
+            if type_ is DBCString:
+                values.append(len(strings))
+                strings.extend('character\\synthetic\\{}_{}.blp\0'.format(name.lower(), i).encode('ascii'))
+            elif name == 'ID':
+                values.append(i + 1)
+            else:
+                values.append(rng.randrange(16))
+
+        records.extend(pack('<{}I'.format(n_fields), *values))
+
+    with open(path, 'wb') as f:
+        f.write(b'WDBC' + pack('<4I', n_records, n_fields, n_fields * 4, len(strings)))
+        f.write(records)
+        f.write(strings)
+
+    return path
+
+
+def make_wdc1(path, n_records=5000, n_fields=8, seed=0):
+    """ WDC1 table with uncompressed uint32 fields, an ID list and field storage info. """
+    rng = random.Random(seed)
+    record_size = n_fields * 4
+
+    records = b''.join(pack('<{}I'.format(n_fields), *(rng.randrange(1 << 16) for _ in range(n_fields)))
+                       for _ in range(n_records))
+    strings = b'\0' + b''.join('synthetic_{}\0'.format(i).encode('ascii') for i in range(n_records // 10))
+    ids = pack('<{}I'.format(n_records), *range(1, n_records + 1))
+    fields = b''.join(pack('<hH', 0, i * 4) for i in range(n_fields))
+    storage_info = b''.join(pack('<2H5I', i * 32, 32, 0, 0, 0, 0, 0) for i in range(n_fields))
+
+    header = b'WDC1' + pack('<10I2H9I', n_records, n_fields, record_size, len(strings), 0, 0, 1, n_records, 0, 0,
+                             0, 0, n_fields, 0, 0, 0, len(ids), len(storage_info), 0, 0, 0)
+
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(fields)
+        f.write(records)
+        f.write(strings)
+        f.write(ids)
+        f.write(storage_info)
+
+    return path
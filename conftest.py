@@ -0,0 +1,63 @@
+"""
+Shared fixtures and helpers of the ADT tests. Tests run from the project root: python -m pytest test_<name>.py
+"""
+import pytest
+
+from . import WoWVersionManager, WoWVersions
+from .adt_file import ADTFile
+from .enums.adt_enums import ADTChunkLayerFlags
+
+
+@pytest.fixture
+def wotlk():
+    """ Sets the WotLK client version for the test, restoring the previous one after it. """
+    version = WoWVersionManager().client_version
+    WoWVersionManager().set_client_version(WoWVersions.WOTLK)
+    yield
+    WoWVersionManager().set_client_version(version)
+
+
+def make_tile(path):
+    adt = ADTFile()
+    ground = adt.add_texture_filename('tileset\\ground.blp')
+    grass = adt.add_texture_filename('tileset\\grass.blp')
+    adt.add_m2_filename('world\\tree.m2')
+
+    for row in range(16):
+        for col in range(16):
+            chunk = adt.mcnk[row][col]
+            chunk.index_x, chunk.index_y = col, row
+            chunk.mcvt.height = [float(row * 16 + col)] * 145
+            chunk.add_texture_layer(ground, 0, 0)
+
+            if row == col or row == 3:
+                chunk.add_texture_layer(grass, ADTChunkLayerFlags.use_alpha_map, 0)
+                chunk.mcal.layers[0].alpha_map[row][col] = 255
+
+    adt.write(path)
+    return path
+
+
+def edit(adt):
+    name_id = adt.add_m2_filename('world\\bush.m2')
+    adt.add_wmo_filename('world\\wmo\\house.wmo')
+
+    for i in range(100):
+        adt.add_m2_instance([(i % 16, i // 16), ((i + 1) % 16, i // 16)], name_id, i, (i, i, 0), (0, 0, 0), 1024, 0)
+
+    adt.add_wmo_instance([(0, 0)], 0, 1000, (0, 0, 0), (0, 0, 0), ((0, 0, 0), (1, 1, 1)), 0, 0, 0, 1024)
+    adt.remove_m2_instance(10)
+    adt.add_texture_filename('tileset\\rock.blp')
+    adt.mcnk[3][3].remove_texture_layer(1)
+
+
+def content(adt):
+    chunks = [(chunk.index_x, chunk.index_y, chunk.mcvt.height.tolist(), chunk.mcrf.doodad_refs, chunk.mcrf.object_refs,
+               [(layer.texture_id, layer.flags, int(layer.offset_in_mcal)) for layer in chunk.mcly.layers],
+               [layer.alpha_map.tolist() for layer in chunk.mcal.layers])
+              for row in adt.mcnk for chunk in row]
+
+    return (adt.mtex.filenames.strings, adt.mmdx.filenames.strings, adt.mwmo.filenames.strings,
+            [int(ofs) for ofs in adt.mmid.offsets], [int(ofs) for ofs in adt.mwid.offsets],
+            [doodad._get_values() for doodad in adt.mddf.doodad_instances],
+            [wmo._get_values() for wmo in adt.modf.wmo_instances], chunks)
@@ -1,41 +1,48 @@
+import numpy
+
+from struct import Struct
+
 from .wow_common_types import *
+from ..io_utils.binary_reader import BinaryReader
 from ..enums.adt_enums import *
 from .. import WoWVersionManager, WoWVersions
 
 __reload_order_index__ = 2
 
-TILE_SIZE = 5533.333333333
+TILE_SIZE = 1600 / 3
+CHUNK_SIZE = TILE_SIZE / 16
 MAP_SIZE_MIN = -17066.66656
 MAP_SIZE_MAX = 17066.66657
 
 
 class OFFSET:
-	def __init__(self, file, ofs=0, absolute_adr=0):
-		self.ofs = ofs
-		self.absolute = absolute_adr
-		self.file = file
-		self.file._register_offset(self)
+	# Tracks the absolute address pointed to and the address the offset is relative to, the offset itself is their
+	# difference. Both move with the data they are in, see ADTFile._size_changed. They stop being tracked once the
+	# offset is freed, the file only references them weakly.
+	__slots__ = ('_index', '_absolute', '_base')
 
-	def __del__(self):
-		self.file._unregister_offset(self)
+	def __init__(self, file, ofs=0, absolute_adr=0):
+		self._index = file._addresses
+		self._absolute, self._base = file._register_offset(absolute_adr, absolute_adr - ofs)
 
 	def __int__(self):
 		return self.ofs
 
-	def _update(self, distance, address_of_changed):
-		if self.absolute > address_of_changed:
-			rel_point = self.absolute - self.ofs
-			if rel_point <= address_of_changed:
-				self.ofs += distance
-			self.absolute += distance
+	@property
+	def ofs(self):
+		return self._index.get(self._absolute) - self._index.get(self._base)
+
+	@property
+	def absolute(self):
+		return self._index.get(self._absolute)
 
 	def set(self, ofs, absolute_adr):
-		self.ofs = ofs
-		self.absolute = absolute_adr
+		self._index.set(self._absolute, absolute_adr)
+		self._index.set(self._base, absolute_adr - ofs)
 
 	def set_rel(self, ofs, base):
-		self.ofs = ofs
-		self.absolute = ofs + base
+		self._index.set(self._absolute, ofs + base)
+		self._index.set(self._base, base)
 
 
 class ADT_REF:
@@ -46,15 +53,14 @@ class ADT_REF:
 class MOBILE_CHUNK(ADT_REF):
 	def __init__(self, adt):
 		ADT_REF.__init__(self, adt)
-		self.adt._register_mobile_chunk(self)
-		self.address = 0
+		self._address = self.adt._register_mobile_chunk(self)
 
-	def set_address(self, address):
-		self.address = address
+	@property
+	def address(self):
+		return self.adt._addresses.get(self._address)
 
-	def update_address(self, distance, address_of_changed):
-		if self.address > address_of_changed:
-			self.address += distance
+	def set_address(self, address):
+		self.adt._addresses.set(self._address, address)
 
 
 class MVER:
@@ -84,6 +90,8 @@ class MHDR:
 	# Cata+: 54 bytes (with mamp_value and padding)
 	data_size_wotlk = 44
 	data_size_cata_plus = 54
+	# chunks pointed to by the offsets, in the order they are written
+	chunk_names = ('mcin', 'mtex', 'mmdx', 'mmid', 'mwmo', 'mwid', 'mddf', 'modf', 'mfbo', 'mh2o', 'mtxf')
 
 	def __init__(self, adt):
 		self.adt = adt
@@ -105,6 +113,13 @@ class MHDR:
 		# Cata+ only
 		self.mamp_value = 0
 
+	def _get_written_size(self):
+		"""Size of the data written by write(), flags and offsets plus the Cata+ fields"""
+		size = 12 * uint32.size()
+		if WoWVersionManager().client_version >= WoWVersions.CATA:
+			size += uint8.size() + 9
+		return size
+
 	def _set_data_size(self):
 		"""Set data size based on WoW version"""
 		if WoWVersionManager().client_version >= WoWVersions.CATA:
@@ -136,23 +151,16 @@ class MHDR:
 		
 		return self
 
-	def write(self, f):
+	def write(self, f, offsets=None):
+		"""Offsets are taken from the tracked ones, or from offsets, a dict of chunk name to offset (absent chunks
+		are 0)"""
 		self._set_data_size()
 		self.header.size = self.data_size
 		self.header.write(f)
-		pos = f.tell()
 		uint32.write(f, self.flags)
-		uint32.write(f, int(self.ofs_mcin))
-		uint32.write(f, int(self.ofs_mtex))
-		uint32.write(f, int(self.ofs_mmdx))
-		uint32.write(f, int(self.ofs_mmid))
-		uint32.write(f, int(self.ofs_mwmo))
-		uint32.write(f, int(self.ofs_mwid))
-		uint32.write(f, int(self.ofs_mddf))
-		uint32.write(f, int(self.ofs_modf))
-		uint32.write(f, int(self.ofs_mfbo))
-		uint32.write(f, int(self.ofs_mh2o))
-		uint32.write(f, int(self.ofs_mtxf))
+
+		for name in MHDR.chunk_names:
+			uint32.write(f, int(getattr(self, 'ofs_' + name)) if offsets is None else offsets.get(name, 0))
 		
 		# Cata+ only fields
 		if WoWVersionManager().client_version >= WoWVersions.CATA:
@@ -180,8 +188,8 @@ class MCIN_entry:
 
 		return self
 
-	def write(self, f):
-		uint32.write(f, int(self.offset))
+	def write(self, f, offset=None):
+		uint32.write(f, int(self.offset) if offset is None else offset)
 		uint32.write(f, self.size)
 		uint32.write(f, self.flags)
 		uint32.write(f, self.async_id)
@@ -193,6 +201,8 @@ class MCIN_entry:
 class MCIN(MOBILE_CHUNK):
 	magic = 'NICM'
 	data_size = 16
+	# offset, size, flags and async id of an entry, see MCIN_entry
+	_entry_layout = Struct('<4I')
 
 	def __init__(self, adt):
 		MOBILE_CHUNK.__init__(self, adt)
@@ -207,12 +217,16 @@ class MCIN(MOBILE_CHUNK):
 
 		return self
 
-	def write(self, f):
+	def write(self, f, offsets=None):
 		self.header.size = len(self.entries) * MCIN_entry.size
 		self.header.write(f)
 
-		for entry in self.entries:
-			entry.write(f)
+		if offsets is None:
+			for entry in self.entries:
+				entry.write(f)
+		else:
+			for entry, offset in zip(self.entries, offsets):
+				entry.write(f, offset)
 
 		return self
 
@@ -268,11 +282,11 @@ class MMID(MOBILE_CHUNK):
 
 		return self
 
-	def write(self, f):
+	def write(self, f, offsets=None):
 		self.header.size = len(self.offsets) * MMID.entry_size
 		self.header.write(f)
 
-		for offset in self.offsets:
+		for offset in self.offsets if offsets is None else offsets:
 			uint32.write(f, int(offset))
 
 		return self
@@ -315,16 +329,17 @@ class MWID(MOBILE_CHUNK):
 			abs_ofs = ofs + self.adt._get_mwmo_data_start()
 			self.offsets.append(OFFSET(self.adt, ofs, abs_ofs))
 
-	def write(self, f):
+	def write(self, f, offsets=None):
 		self.header.size = len(self.offsets) * MWID.entry_size
 		self.header.write(f)
 
-		for offset in self.offsets:
+		for offset in self.offsets if offsets is None else offsets:
 			uint32.write(f, int(offset))
 
 
-class ADTDoodadDefinition:
+class ADTDoodadDefinition(FixedLayout):
 	size = 36
+	_layout = Struct('<2I6f2H')
 
 	def __init__(self, name_id=0, unique_id=0, position=None, rotation=None, scale=0, flags=0):
 		if position is None:
@@ -338,25 +353,19 @@ class ADTDoodadDefinition:
 		self.scale = scale
 		self.flags = flags
 
-	def read(self, f):
-		self.name_id = uint32.read(f)
-		self.unique_id = uint32.read(f)
-		self.position.read(f)
-		self.rotation.read(f)
-		self.scale = uint16.read(f)
-		self.flags = uint16.read(f)
-
-		return self
-
-	def write(self, f):
-		uint32.write(f, self.name_id)
-		uint32.write(f, self.unique_id)
-		self.position.write(f)
-		self.rotation.write(f)
-		uint16.write(f, self.scale)
-		uint16.write(f, self.flags)
+	def _set_values(self, values):
+		self.name_id = values[0]
+		self.unique_id = values[1]
+		self.position = C3Vector(values[2:5])
+		self.rotation = C3Vector(values[5:8])
+		self.scale = values[8]
+		self.flags = values[9]
 
-		return self
+	def _get_values(self):
+		position = self.position
+		rotation = self.rotation
+		return (self.name_id, self.unique_id, position.x, position.y, position.z,
+				rotation.x, rotation.y, rotation.z, self.scale, self.flags)
 
 
 class MDDF(MOBILE_CHUNK):
@@ -376,24 +385,26 @@ class MDDF(MOBILE_CHUNK):
 		self.doodad_instances.append(dad)
 
 	def _remove(self, index):
-		del self.doodad_instances[index]
+		# the last instance takes the index of the removed one, so that only references to these two change
+		instances = self.doodad_instances
+		instances[index] = instances[-1]
+		instances.pop()
 
 	def read(self, f):
 		self.set_address(f.tell())
 		self.header.read(f)
-		for _ in range(self.header.size // ADTDoodadDefinition.size):
-			self.doodad_instances.append(ADTDoodadDefinition().read(f))
+		n_doodads = self.header.size // ADTDoodadDefinition.size
+		self.doodad_instances.extend(ADTDoodadDefinition.read_array(f, n_doodads))
 
 	def write(self, f):
 		self.header.size = len(self.doodad_instances) * ADTDoodadDefinition.size
 		self.header.write(f)
-
-		for doodad in self.doodad_instances:
-			doodad.write(f)
+		ADTDoodadDefinition.write_array(f, self.doodad_instances)
 
 
-class ADTWMODefinition:
+class ADTWMODefinition(FixedLayout):
 	size = 64
+	_layout = Struct('<2I12f4H')
 
 	def __init__(self, name_id=0, unique_id=0, position=None, rotation=None, 
 				extents=None, flags=0, doodad_set=0, name_set=0, scale=0):
@@ -413,27 +424,23 @@ class ADTWMODefinition:
 		self.name_set = name_set
 		self.scale = scale
 
-	def read(self, f):
-		self.name_id = uint32.read(f)
-		self.unique_id = uint32.read(f)
-		self.position.read(f)
-		self.rotation.read(f)
-		self.extents.read(f)
-		self.flags = uint16.read(f)
-		self.doodad_set = uint16.read(f)
-		self.name_set = uint16.read(f)
-		self.scale = uint16.read(f)
-
-	def write(self, f):
-		uint32.write(f, self.name_id)
-		uint32.write(f, self.unique_id)
-		self.position.write(f)
-		self.rotation.write(f)
-		self.extents.write(f)
-		uint16.write(f, self.flags)
-		uint16.write(f, self.doodad_set)
-		uint16.write(f, self.name_set)
-		uint16.write(f, self.scale)
+	def _set_values(self, values):
+		self.name_id = values[0]
+		self.unique_id = values[1]
+		self.position = C3Vector(values[2:5])
+		self.rotation = C3Vector(values[5:8])
+		self.extents = CAaBox(values[8:11], values[11:14])
+		self.flags = values[14]
+		self.doodad_set = values[15]
+		self.name_set = values[16]
+		self.scale = values[17]
+
+	def _get_values(self):
+		position = self.position
+		rotation = self.rotation
+		return (self.name_id, self.unique_id, position.x, position.y, position.z,
+				rotation.x, rotation.y, rotation.z, *self.extents.min, *self.extents.max,
+				self.flags, self.doodad_set, self.name_set, self.scale)
 
 
 class MODF(MOBILE_CHUNK):
@@ -457,22 +464,21 @@ class MODF(MOBILE_CHUNK):
 		self.wmo_instances.append(wmo)
 
 	def _remove(self, index):
-		del self.wmo_instances[index]
+		# the last instance takes the index of the removed one, see MDDF._remove
+		instances = self.wmo_instances
+		instances[index] = instances[-1]
+		instances.pop()
 
 	def read(self, f):
 		self.set_address(f.tell())
 		self.header.read(f)
-		for _ in range(self.header.size // ADTWMODefinition.size):
-			wmo_instance = ADTWMODefinition()
-			wmo_instance.read(f)
-			self.wmo_instances.append(wmo_instance)
+		n_wmos = self.header.size // ADTWMODefinition.size
+		self.wmo_instances.extend(ADTWMODefinition.read_array(f, n_wmos))
 
 	def write(self, f):
 		self.header.size = len(self.wmo_instances) * ADTWMODefinition.size
 		self.header.write(f)
-
-		for wmo_instance in self.wmo_instances:
-			wmo_instance.write(f)
+		ADTWMODefinition.write_array(f, self.wmo_instances)
 
 
 class MFBO(MOBILE_CHUNK):
@@ -543,31 +549,27 @@ class MFBO(MOBILE_CHUNK):
 #             chunk.read()
 
 #     def write(self, f):
-class SMLiquidChunk:
+class SMLiquidChunk(FixedLayout):
 	"""MH2O chunk entry for each of 256 map tiles"""
 	size = 12
+	_layout = Struct('<3I')
 
 	def __init__(self):
 		self.offset_instances = 0
 		self.layer_count = 0
 		self.offset_attributes = 0
 
-	def read(self, f):
-		self.offset_instances = uint32.read(f)
-		self.layer_count = uint32.read(f)
-		self.offset_attributes = uint32.read(f)
-		return self
+	def _set_values(self, values):
+		self.offset_instances, self.layer_count, self.offset_attributes = values
 
-	def write(self, f):
-		uint32.write(f, self.offset_instances)
-		uint32.write(f, self.layer_count)
-		uint32.write(f, self.offset_attributes)
-		return self
+	def _get_values(self):
+		return self.offset_instances, self.layer_count, self.offset_attributes
 
 
-class SMLiquidInstance:
+class SMLiquidInstance(FixedLayout):
 	"""Liquid instance data"""
 	size = 24
+	_layout = Struct('<2H2f4B2I')
 
 	def __init__(self):
 		self.liquid_type = 0  # 0-3: water, ocean, magma, slime
@@ -581,50 +583,33 @@ class SMLiquidInstance:
 		self.offset_exists_bitmap = 0
 		self.offset_vertex_data = 0
 
-	def read(self, f):
-		self.liquid_type = uint16.read(f)
-		self.liquid_object_or_vertex_format = uint16.read(f)
-		self.min_height_level = float32.read(f)
-		self.max_height_level = float32.read(f)
-		self.offset_x = uint8.read(f)
-		self.offset_y = uint8.read(f)
-		self.width = uint8.read(f)
-		self.height = uint8.read(f)
-		self.offset_exists_bitmap = uint32.read(f)
-		self.offset_vertex_data = uint32.read(f)
-		return self
+	def _set_values(self, values):
+		(self.liquid_type, self.liquid_object_or_vertex_format,
+		 self.min_height_level, self.max_height_level,
+		 self.offset_x, self.offset_y, self.width, self.height,
+		 self.offset_exists_bitmap, self.offset_vertex_data) = values
 
-	def write(self, f):
-		uint16.write(f, self.liquid_type)
-		uint16.write(f, self.liquid_object_or_vertex_format)
-		float32.write(f, self.min_height_level)
-		float32.write(f, self.max_height_level)
-		uint8.write(f, self.offset_x)
-		uint8.write(f, self.offset_y)
-		uint8.write(f, self.width)
-		uint8.write(f, self.height)
-		uint32.write(f, self.offset_exists_bitmap)
-		uint32.write(f, self.offset_vertex_data)
-		return self
+	def _get_values(self):
+		return (self.liquid_type, self.liquid_object_or_vertex_format,
+				self.min_height_level, self.max_height_level,
+				self.offset_x, self.offset_y, self.width, self.height,
+				self.offset_exists_bitmap, self.offset_vertex_data)
 
 
-class SMLiquidAttributes:
+class SMLiquidAttributes(FixedLayout):
 	"""Liquid attributes (fishable, deep)"""
 	size = 16
+	_layout = Struct('<2Q')
 
 	def __init__(self):
 		self.fishable = 0  # 64-bit mask
 		self.deep = 0      # 64-bit mask
 
-	def read(self, f):
-		self.fishable = uint64.read(f)
-		self.deep = uint64.read(f)
-		return self
+	def _set_values(self, values):
+		self.fishable, self.deep = values
 
-	def write(self, f):
-		uint64.write(f, self.fishable)
-		uint64.write(f, self.deep)
-		return self
+	def _get_values(self):
+		return self.fishable, self.deep
 
 
 class MH2O(MOBILE_CHUNK):
@@ -645,17 +630,13 @@ class MH2O(MOBILE_CHUNK):
 		data_start = f.tell()
 
 		# Read 256 chunk headers
-		for chunk in self.chunks:
-			chunk.read(f)
+		self.chunks = SMLiquidChunk.read_array(f, 256)
 
 		# Read instances and attributes based on offsets
 		for i, chunk in enumerate(self.chunks):
 			if chunk.layer_count > 0 and chunk.offset_instances > 0:
 				f.seek(data_start + chunk.offset_instances)
-				for _ in range(chunk.layer_count):
-					instance = SMLiquidInstance()
-					instance.read(f)
-					self.instances.append(instance)
+				self.instances.extend(SMLiquidInstance.read_array(f, chunk.layer_count))
 
 			if chunk.offset_attributes > 0:
 				f.seek(data_start + chunk.offset_attributes)
@@ -666,8 +647,6 @@ class MH2O(MOBILE_CHUNK):
 		return self
 
 	def write(self, f):
-		self.set_address(f.tell())
-		
 		# Calculate sizes and offsets
 		header_size = 256 * SMLiquidChunk.size
 		instance_data_size = len(self.instances) * SMLiquidInstance.size
@@ -697,16 +676,14 @@ class MH2O(MOBILE_CHUNK):
 				attr_offset += SMLiquidAttributes.size
 			else:
 				chunk.offset_attributes = 0
-			
-			chunk.write(f)
-		
+
+		SMLiquidChunk.write_array(f, self.chunks)
+
 		# Write instances
-		for instance in self.instances:
-			instance.write(f)
-		
+		SMLiquidInstance.write_array(f, self.instances)
+
 		# Write attributes
-		for attr in self.attributes:
-			attr.write(f)
+		SMLiquidAttributes.write_array(f, self.attributes)
 		
 		return self
 
@@ -757,16 +734,38 @@ class MTXF(MOBILE_CHUNK):
 
 	def write(self, f):
 		self.header.size = len(self.flags) * MTXF.entry_size
-		self.header.write()
+		self.header.write(f)
 		for flag in self.flags:
-			flag.write(f)
+			uint32.write(f, flag)
 
 
 class MCNK(MOBILE_CHUNK):
 	magic = 'KNCM'
-
-	def __init__(self, adt):
+	header_data_size = 128
+	# sub-chunks with an offset in the header (MCVT and MCNR pre-MoP only), in the order they are written
+	sub_chunk_names = ('mcvt', 'mccv', 'mcnr', 'mcly', 'mcrf', 'mcsh', 'mcal', 'mcse', 'mclq', 'mclv')
+	# sub-chunks created on first access in lazy chunks, in the order they are read. MCVT and MCNR are always read,
+	# as they back ADTFile.heights and ADTFile.normals
+	lazy_sub_chunk_names = ('mcly', 'mcrf', 'mcal', 'mcsh', 'mcse', 'mclq', 'mccv', 'mclv')
+	# header data, with the MCVT and MCNR offsets before MoP and the high resolution holes since, offsets are relative
+	# to the chunk
+	_header_layout = Struct('<5I2I8I2H16s8s4I3f3I')
+	_header_layout_mop = Struct('<5IQ8I2H16s8s4I3f3I')
+	_header_names_tail = ('ofs_mcly', 'ofs_mcrf', 'ofs_mcal', 'size_mcal', 'ofs_mcsh', 'size_mcsh', 'area_id',
+						  'n_map_obj_refs', 'holes_low_res', 'unknown_but_used', 'low_quality_texture_map',
+						  'no_effect_doodad', 'ofs_mcse', 'n_sound_emitters', 'ofs_mclq', 'size_liquid', 'position_x',
+						  'position_y', 'position_z', 'ofs_mccv', 'ofs_mclv', 'unused')
+	_header_names = ('flags', 'index_x', 'index_y', 'n_layers', 'n_doodad_refs', 'ofs_mcvt', 'ofs_mcnr') \
+		+ _header_names_tail
+	_header_names_mop = ('flags', 'index_x', 'index_y', 'n_layers', 'n_doodad_refs', 'hole_high_res') \
+		+ _header_names_tail
+
+	def __init__(self, adt, index=None, lazy=False):
 		MOBILE_CHUNK.__init__(self, adt)
+		# lazy chunks create their sub-chunks on first access, from the data read if any (see read)
+		self._undecoded = set(MCNK.lazy_sub_chunk_names) if lazy else set()
+		self._raw = None
+		self._raw_header = None
 		self.header = ChunkHeader(MCNK.magic)
 		self.flags = 0
 		self.index_x = 0
@@ -801,16 +800,51 @@ class MCNK(MOBILE_CHUNK):
 		self.ofs_mclv = OFFSET(self.adt)
 		self.unused = 0
 
-		self.mcvt = MCVT(adt)
-		self.mcnr = MCNR(adt)
-		self.mcly = MCLY(adt, self)
-		self.mcrf = MCRF(adt)
-		self.mcal = MCAL(adt)
-		self.mcsh = MCSH(adt)
-		self.mcse = MCSE(adt)
-		self.mclq = MCLQ(adt)
-		self.mccv = MCCV(adt)
-		self.mclv = MCLV(adt)
+		# chunks of a file store heights and normals in the tile-wide arrays, at their index in MCIN
+		self.mcvt = MCVT(adt, None if index is None else adt.heights[index])
+		self.mcnr = MCNR(adt, None if index is None else adt.normals[index])
+
+		if not lazy:
+			for name in MCNK.lazy_sub_chunk_names:
+				setattr(self, name, self._new_sub_chunk(name))
+
+	def __getattr__(self, name):
+		# only called for missing attributes, that is sub-chunks of lazy chunks not accessed yet
+		if name in self.__dict__.get('_undecoded', ()):
+			return self._decode_sub_chunk(name)
+
+		raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, name))
+
+	def _new_sub_chunk(self, name):
+		if name == 'mcly':
+			return MCLY(self.adt, self)
+
+		return {'mcrf': MCRF, 'mcal': MCAL, 'mcsh': MCSH, 'mcse': MCSE, 'mclq': MCLQ, 'mccv': MCCV,
+				'mclv': MCLV}[name](self.adt)
+
+	def _decode_sub_chunk(self, name):
+		sub_chunk = self._new_sub_chunk(name)
+		setattr(self, name, sub_chunk)
+		self._undecoded.discard(name)
+
+		if self._raw is not None:
+			f = BinaryReader(self._raw)
+			header = self._raw_header
+			if not self._undecoded:
+				self._raw = self._raw_header = None
+
+			self._read_sub_chunk(f, name, 0, header)
+
+		return sub_chunk
+
+	def _is_raw(self):
+		"""Whether the chunk was read lazily and none of its sub-chunks were accessed since, it is then written as
+		read. Heights and normals excepted, they are written from the tile-wide arrays."""
+		return self._raw is not None and len(self._undecoded) == len(MCNK.lazy_sub_chunk_names)
+
+	def _is_alpha_layout_stale(self):
+		"""See MCAL._is_layout_stale, alpha maps not decoded are written as read."""
+		return 'mcal' not in self._undecoded and not self._is_raw() and self.mcal._is_layout_stale()
 
 	def _get_mcal_data_start(self):
 		return self.address + int(self.ofs_mcal) + ChunkHeader.size
@@ -884,93 +918,185 @@ class MCNK(MOBILE_CHUNK):
 		self.n_layers -= 1
 
 
+	@staticmethod
+	def _unpack_header(data):
+		"""Header values by name, see _header_names"""
+		if WoWVersionManager().client_version >= WoWVersions.MOP:
+			return dict(zip(MCNK._header_names_mop, MCNK._header_layout_mop.unpack(data)))
+
+		return dict(zip(MCNK._header_names, MCNK._header_layout.unpack(data)))
+
 	def read(self, f):
 		self.set_address(f.tell())
 		self.header.read(f)
-		self.flags = uint32.read(f)
-		self.index_x = uint32.read(f)
-		self.index_y = uint32.read(f)
-		self.n_layers = uint32.read(f)
-		self.n_doodad_refs = uint32.read(f)
-
-		if WoWVersionManager().client_version >= WoWVersions.MOP:
-			self.hole_high_res = uint64.read(f)
-		else:
-			self.ofs_mcvt.set_rel(uint32.read(f), self.address)
-			self.ofs_mcnr.set_rel(uint32.read(f), self.address)
-
-		self.ofs_mcly.set_rel(uint32.read(f), self.address)
-		self.ofs_mcrf.set_rel(uint32.read(f), self.address)
-		self.ofs_mcal.set_rel(uint32.read(f), self.address)
-		self.size_mcal = uint32.read(f)
-		self.ofs_mcsh.set_rel(uint32.read(f), self.address)
-		self.size_mcsh = uint32.read(f)
-		self.area_id = uint32.read(f)
-		self.n_map_obj_refs = uint32.read(f)
-		self.holes_low_res = uint16.read(f)
-		self.unknown_but_used = uint16.read(f)
-
-		for i in range(8):
-			self.low_quality_texture_map[i] = []
-			for _ in range(2):
-				b = uint8.read(f)
-				self.low_quality_texture_map[i] += uint8_to_uint2_list(b)
-
-		for i in range(8):
-			b = uint8.read(f)
-			self.no_effect_doodad[i] = uint8_to_uint1_list(b)
-
-		self.ofs_mcse.set_rel(uint32.read(f), self.address)
-		self.n_sound_emitters = uint32.read(f)
-		self.ofs_mclq.set_rel(uint32.read(f), self.address)
-		self.size_liquid = uint32.read(f)
-		self.position.read(f)
-		self.ofs_mccv.set_rel(uint32.read(f), self.address)
-		self.ofs_mclv.set_rel(uint32.read(f), self.address)
-		self.unused = uint32.read(f)
+		header = self._unpack_header(f.read(MCNK.header_data_size))
+
+		for name, value in header.items():
+			if name.startswith('ofs_'):
+				getattr(self, name).set_rel(value, self.address)
+			elif not name.startswith('position_'):
+				setattr(self, name, value)
+
+		# 2 bits per value and 2 bytes per row, 1 bit per value and 1 byte per row, least significant bits first
+		low_quality_texture_map = header['low_quality_texture_map']
+		self.low_quality_texture_map = [[(b >> shift) & 0b11 for b in low_quality_texture_map[i * 2:i * 2 + 2]
+										 for shift in (0, 2, 4, 6)] for i in range(8)]
+		self.no_effect_doodad = [[(b >> shift) & 0b1 for shift in range(8)] for b in header['no_effect_doodad']]
+		self.position.x, self.position.y, self.position.z = \
+			header['position_x'], header['position_y'], header['position_z']
 
 		f.seek(self.address + int(self.ofs_mcvt))
 		self.mcvt.read(f)
 		f.seek(self.address + int(self.ofs_mcnr))
 		self.mcnr.read(f)
-		f.seek(self.address + int(self.ofs_mcly))
-		self.mcly.read(f)
-		f.seek(self.address + int(self.ofs_mcrf))
-		self.mcrf.read(f, self.n_doodad_refs, self.n_map_obj_refs)
 
-		alpha_is_broken = not (self.flags & ADTChunkFlags.DO_NOT_FIX_ALPHA_MAP)
-		alpha_is_compressed = []
-		for layer in self.mcly.layers:
-			is_comp = layer.flags & ADTChunkLayerFlags.alpha_map_compressed
-			alpha_is_compressed.append(is_comp)
-		f.seek(self.address + int(self.ofs_mcal))
-		n_alpha_layers = self.n_layers - 1
-		self.mcal.read(f, n_alpha_layers, alpha_is_broken, alpha_is_compressed)
+		if self._undecoded:
+			# lazy chunks keep their data, sub-chunks are decoded from it on first access
+			f.seek(self.address)
+			self._raw = f.read(ChunkHeader.size + self.header.size)
+			self._raw_header = header
+			return
 
-		if (self.flags & ADTChunkFlags.HAS_MCSH):
-			f.seek(self.address + int(self.ofs_mcsh))
-			self.mcsh.read(f)
+		for name in MCNK.lazy_sub_chunk_names:
+			self._read_sub_chunk(f, name, self.address, header)
 
-		f.seek(self.address + int(self.ofs_mcse))
-		self.mcse.read(f, self.n_sound_emitters)
+	def _read_sub_chunk(self, f, name, start, header):
+		"""Reads a sub-chunk from f, in which the chunk starts at start. Offsets, counts and flags are taken from
+		header, the header values as read (see _unpack_header), as those of the chunk may have been edited since."""
+		sub_chunk = getattr(self, name)
+		ofs = header['ofs_' + name]
+		flags = header['flags']
 
-		if self.ofs_mclq:
-			f.seek(self.address + int(self.ofs_mclq))
-			self.mclq.read(f)
+		is_present = {
+			'mcsh': flags & ADTChunkFlags.HAS_MCSH,
+			'mclq': ofs,
+			'mccv': flags & ADTChunkFlags.HAS_MCCV,
+			'mclv': False,		# TODO: MCLV
+		}.get(name, True)
 
-		if (self.flags & ADTChunkFlags.HAS_MCCV):
-			f.seek(self.address + int(self.ofs_mccv))
-			self.mccv.read(f)
+		if not is_present:
+			return
 
-		# TODO: MCLV
-		# f.seek(self.start + self.ofs_mclv)
-		# self.mclv.read(f)
+		if name == 'mcal':
+			# compression flags of the texture layers as read, the first layer has no alpha map
+			n_alpha_layers = header['n_layers'] - 1
+			f.seek(start + header['ofs_mcly'] + ChunkHeader.size + MCLYLayer.size)
+			layers = numpy.frombuffer(f.read(max(n_alpha_layers, 0) * MCLYLayer.size), dtype='<u4').reshape(-1, 4)
+			alpha_is_compressed = [layer_flags & ADTChunkLayerFlags.alpha_map_compressed
+								   for layer_flags in layers[:, 1].tolist()]
+			alpha_is_broken = not (flags & ADTChunkFlags.DO_NOT_FIX_ALPHA_MAP)
+
+			f.seek(start + ofs)
+			sub_chunk.read(f, n_alpha_layers, alpha_is_broken, alpha_is_compressed)
+		else:
+			f.seek(start + ofs)
+
+			if name == 'mcrf':
+				sub_chunk.read(f, header['n_doodad_refs'], header['n_map_obj_refs'])
+			elif name == 'mcse':
+				sub_chunk.read(f, header['n_sound_emitters'])
+			else:
+				sub_chunk.read(f)
+
+		# addresses are those in the file, f may only hold the chunk
+		sub_chunk.set_address(self.address + int(getattr(self, 'ofs_' + name)))
+
+	def _get_layout(self):
+		"""Layout of the chunk with its sub-chunks right after its header, in the order the client writes them.
+		Returns the sub-chunk offsets by name (absent ones are 0), the offsets of the layers' alpha maps in MCAL,
+		the encoded alpha maps (see MCAL._encode_layers) and the chunk size, header included."""
+		offsets = dict.fromkeys(MCNK.sub_chunk_names, 0)
+		pos = ChunkHeader.size + MCNK.header_data_size
+
+		offsets['mcvt'] = pos
+		pos += ChunkHeader.size + MCVT.data_size
+
+		if self.flags & ADTChunkFlags.HAS_MCCV:
+			offsets['mccv'] = pos
+			pos += ChunkHeader.size + MCCV.data_size
+
+		offsets['mcnr'] = pos
+		pos += ChunkHeader.size + len(self.mcnr.normals) * 3 + len(self.mcnr.unknown)
+
+		offsets['mcly'] = pos
+		pos += ChunkHeader.size + len(self.mcly.layers) * MCLYLayer.size
+
+		offsets['mcrf'] = pos
+		pos += ChunkHeader.size + (len(self.mcrf.doodad_refs) + len(self.mcrf.object_refs)) * MCRF.entry_size
+
+		if self.flags & ADTChunkFlags.HAS_MCSH:
+			offsets['mcsh'] = pos
+			pos += ChunkHeader.size + MCSH.data_size
+
+		# the first texture layer has no alpha map, the others point to theirs in MCAL
+		encoded_layers = self.mcal._encode_layers()
+		layer_sizes = encoded_layers[0]
+		offsets_in_mcal = []
+		ofs_in_mcal = 0
+		for i in range(len(self.mcly.layers)):
+			offsets_in_mcal.append(ofs_in_mcal)
+			if i and i <= len(layer_sizes):
+				ofs_in_mcal += layer_sizes[i - 1]
+
+		offsets['mcal'] = pos
+		pos += ChunkHeader.size + sum(layer_sizes)
+
+		offsets['mcse'] = pos
+		pos += ChunkHeader.size + len(self.mcse.entries) * MCSESoundEmitter.size
+
+		# legacy liquids and MCLV are not written
+		return offsets, offsets_in_mcal, encoded_layers, pos
+
+	def _set_counts(self, encoded_layers, size):
+		"""Sets the header counts and sizes from the sub-chunk contents"""
+		self.n_layers = len(self.mcly.layers)
+		self.n_doodad_refs = len(self.mcrf.doodad_refs)
+		self.n_map_obj_refs = len(self.mcrf.object_refs)
+		self.size_mcsh = MCSH.data_size if self.flags & ADTChunkFlags.HAS_MCSH else 0
+		self.size_mcal = ChunkHeader.size + sum(encoded_layers[0])
+		self.n_sound_emitters = len(self.mcse.entries)
+		self.size_liquid = 0
+		self.header.size = size - ChunkHeader.size
+
+	def _update_layout(self, address):
+		"""Places the chunk at address and its sub-chunks as in _get_layout. Offsets, sizes and counts in the header
+		are set from the sub-chunk contents. Returns the chunk size, header included."""
+		if self._is_raw():
+			# the chunk is moved as a whole, offsets relative to it are kept
+			offsets = self._get_offsets()
+			self.set_address(address)
+			for name, ofs in offsets.items():
+				getattr(self, 'ofs_' + name).set_rel(ofs, address)
+			for name in ('mcvt', 'mcnr'):
+				if name in offsets:
+					getattr(self, name).set_address(address + offsets[name])
+
+			return len(self._raw)
+
+		offsets, offsets_in_mcal, encoded_layers, size = self._get_layout()
+		self._set_counts(encoded_layers, size)
+		self.set_address(address)
+		self.mcal._laid_out_sizes = list(encoded_layers[0])
+
+		for name in MCNK.sub_chunk_names:
+			ofs = offsets[name]
+			if ofs:
+				getattr(self, name).set_address(address + ofs)
+
+			if name not in ('mcvt', 'mcnr') or WoWVersionManager().client_version < WoWVersions.MOP:
+				getattr(self, 'ofs_' + name).set_rel(ofs, address)
+
+		mcal_data_start = address + offsets['mcal'] + ChunkHeader.size
+		for layer, ofs_in_mcal in zip(self.mcly.layers, offsets_in_mcal):
+			layer.offset_in_mcal.set_rel(ofs_in_mcal, mcal_data_start)
+
+		return size
 
 	def _set_header_size(self):
 		size = 0
 
 		# MCNK header
-		size += 128
+		size += MCNK.header_data_size
 
 		# MCVT
 		size += ChunkHeader.size
@@ -1000,8 +1126,7 @@ class MCNK(MOBILE_CHUNK):
 
 		# MCAL
 		size += ChunkHeader.size
-		for layer in self.mcal.layers:
-			size += layer.size
+		size += sum(self.mcal._get_layer_sizes())
 
 		# MCSE
 		size += ChunkHeader.size
@@ -1015,50 +1140,82 @@ class MCNK(MOBILE_CHUNK):
 
 		self.header.size = size
 
-	def write(self, f):
-		self._set_header_size()
+	def _write_header(self, f, offsets):
+		"""Writes the chunk header, sub-chunk offsets are taken from offsets, a dict of sub-chunk name to offset"""
 		self.header.write(f)
-		uint32.write(f, self.flags)
-		uint32.write(f, self.index_x)
-		uint32.write(f, self.index_y)
-		uint32.write(f, self.n_layers)
-		uint32.write(f, self.n_doodad_refs)
 
 		if WoWVersionManager().client_version >= WoWVersions.MOP:
-			uint64.write(f, self.hole_high_res)
+			layout = MCNK._header_layout_mop
+			values = [self.hole_high_res]
 		else:
-			uint32.write(f, int(self.ofs_mcvt))
-			uint32.write(f, int(self.ofs_mcnr))
-
-		uint32.write(f, int(self.ofs_mcly))
-		uint32.write(f, int(self.ofs_mcrf))
-		uint32.write(f, int(self.ofs_mcal))
-		uint32.write(f, self.size_mcal)
-		uint32.write(f, int(self.ofs_mcsh))
-		uint32.write(f, self.size_mcsh)
-		uint32.write(f, self.area_id)
-		uint32.write(f, self.n_map_obj_refs)
-		uint16.write(f, self.holes_low_res)
-		uint16.write(f, self.unknown_but_used)
-
-		for i in range(8):
-			b = uint2_list_to_uint8(self.low_quality_texture_map[i][0:4])
-			uint8.write(f, b)
-			b = uint2_list_to_uint8(self.low_quality_texture_map[i][4:])
-			uint8.write(f, b)
-
-		for i in range(8):
-			b = uint1_list_to_uint8(self.no_effect_doodad[i])
-			uint8.write(f, b)
-
-		uint32.write(f, int(self.ofs_mcse))
-		uint32.write(f, self.n_sound_emitters)
-		uint32.write(f, int(self.ofs_mclq))
-		uint32.write(f, self.size_liquid)
-		self.position.write(f)
-		uint32.write(f, int(self.ofs_mccv))
-		uint32.write(f, int(self.ofs_mclv))
-		uint32.write(f, self.unused)
+			layout = MCNK._header_layout
+			values = [offsets['mcvt'], offsets['mcnr']]
+
+		low_quality_texture_map = bytes(uint2_list_to_uint8(row[i:i + 4]) for row in self.low_quality_texture_map
+										for i in (0, 4))
+		no_effect_doodad = bytes(uint1_list_to_uint8(row) for row in self.no_effect_doodad)
+
+		f.write(layout.pack(self.flags, self.index_x, self.index_y, self.n_layers, self.n_doodad_refs, *values,
+							offsets['mcly'], offsets['mcrf'], offsets['mcal'], self.size_mcal, offsets['mcsh'],
+							self.size_mcsh, self.area_id, self.n_map_obj_refs, self.holes_low_res,
+							self.unknown_but_used, low_quality_texture_map, no_effect_doodad,
+							offsets['mcse'], self.n_sound_emitters, offsets['mclq'], self.size_liquid,
+							self.position.x, self.position.y, self.position.z,
+							offsets['mccv'], offsets['mclv'], self.unused))
+
+	def _get_offsets(self):
+		"""Sub-chunk offsets as tracked"""
+		return {name: int(getattr(self, 'ofs_' + name)) for name in MCNK.sub_chunk_names
+				if name not in ('mcvt', 'mcnr') or WoWVersionManager().client_version < WoWVersions.MOP}
+
+	def _write_raw(self, f):
+		"""Writes the chunk as read at the current position, with the header and the heights and normals as they
+		are now. Returns the chunk size, header included."""
+		start = f.tell()
+		offsets = self._get_offsets()
+		self._write_header(f, offsets)
+		f.write(memoryview(self._raw)[ChunkHeader.size + MCNK.header_data_size:])
+		end = f.tell()
+
+		for name in ('mcvt', 'mcnr'):
+			if name in offsets:
+				f.seek(start + offsets[name])
+				getattr(self, name).write(f)
+
+		f.seek(end)
+		return end - start
+
+	def write_sequential(self, f):
+		"""Writes the chunk and its sub-chunks back to back at the current position, the header is set from the
+		contents as in _update_layout but tracked addresses and offsets are neither used nor changed. Returns the
+		chunk size, header included."""
+		if self._is_raw():
+			return self._write_raw(f)
+
+		offsets, offsets_in_mcal, encoded_layers, size = self._get_layout()
+		self._set_counts(encoded_layers, size)
+		self._write_header(f, offsets)
+
+		self.mcvt.write(f)
+		if self.flags & ADTChunkFlags.HAS_MCCV:
+			self.mccv.write(f)
+		self.mcnr.write(f)
+		self.mcly.write(f, offsets_in_mcal)
+		self.mcrf.write(f)
+		if self.flags & ADTChunkFlags.HAS_MCSH:
+			self.mcsh.write(f)
+		self.mcal.write(f, encoded_layers)
+		self.mcse.write(f)
+
+		return size
+
+	def write(self, f):
+		if self._is_raw():
+			self._write_raw(f)
+			return
+
+		self._set_header_size()
+		self._write_header(f, self._get_offsets())
 
 		f.seek(self.address + int(self.ofs_mcvt))
 		self.mcvt.write(f)
@@ -1095,19 +1252,29 @@ class MCVT(MOBILE_CHUNK):
 	magic = 'TVCM'
 	data_size = 580
 
-	def __init__(self, adt):
+	def __init__(self, adt, height=None):
 		MOBILE_CHUNK.__init__(self, adt)
 		self.header = ChunkHeader(MCVT.magic, MCVT.data_size)
-		self.height = [0.0] * 145
+		# chunks of a file use their row of ADTFile.heights
+		self._height = numpy.zeros(145, dtype='<f4') if height is None else height
+
+	@property
+	def height(self):
+		return self._height
+
+	@height.setter
+	def height(self, values):
+		# assigned in place, to keep sharing memory with the tile-wide array
+		self._height[:] = values
 
 	def read(self, f):
 		self.set_address(f.tell())
 		self.header.read(f)
-		self.height = [float32.read(f) for _ in range(145)]
+		self._height[:] = numpy.frombuffer(f.read(MCVT.data_size), dtype='<f4')
 
 	def write(self, f):
 		self.header.write(f)
-		for value in self.height: float32.write(f, value)
+		f.write(self._height.tobytes())
 
 
 class MCLV(MOBILE_CHUNK):
@@ -1149,21 +1316,31 @@ class MCNR(MOBILE_CHUNK):
 	magic = 'RNCM'
 	data_size = 435 if WoWVersionManager().client_version <= WoWVersions.WOTLK else 448
 
-	def __init__(self, adt):
+	def __init__(self, adt, normals=None):
 		MOBILE_CHUNK.__init__(self, adt)
 		self.header = ChunkHeader(MCNR.magic, MCNR.data_size)
-		self.normals = [(0, 0, 0)] * 145
+		# chunks of a file use their row of ADTFile.normals
+		self._normals = numpy.zeros((145, 3), dtype='i1') if normals is None else normals
 		self.unknown = [0] * 13
 
+	@property
+	def normals(self):
+		return self._normals
+
+	@normals.setter
+	def normals(self, values):
+		# assigned in place, to keep sharing memory with the tile-wide array
+		self._normals[:] = values
+
 	def read(self, f):
 		self.set_address(f.tell())
 		self.header.read(f)
-		self.normals = [int8.read(f, 3) for _ in range(145)]
+		self._normals[:] = numpy.frombuffer(f.read(145 * 3), dtype='i1').reshape(145, 3)
 		self.unknown = uint8.read(f, 13)
 
 	def write(self, f):
 		self.header.write(f)
-		for normal in self.normals: int8.write(f, normal, 3)
+		f.write(self._normals.tobytes())
 		for unk in self.unknown: uint8.write(f, unk)
 
 
@@ -1187,10 +1364,10 @@ class MCLYLayer:
 		self.offset_in_mcal.set_rel(uint32.read(f), mcal_data_start)
 		self.effect_id = uint32.read(f)
 
-	def write(self, f):
+	def write(self, f, offset_in_mcal=None):
 		uint32.write(f, self.texture_id)
 		uint32.write(f, self.flags)
-		uint32.write(f, int(self.offset_in_mcal))
+		uint32.write(f, int(self.offset_in_mcal) if offset_in_mcal is None else offset_in_mcal)
 		uint32.write(f, self.effect_id)
 
 
@@ -1221,12 +1398,16 @@ class MCLY(MOBILE_CHUNK):
 			layer.read(f)
 			self.layers.append(layer)
 
-	def write(self, f):
+	def write(self, f, offsets_in_mcal=None):
 		self.header.size = len(self.layers) * MCLYLayer.size
 		self.header.write(f)
 
-		for layer in self.layers:
-			layer.write(f)
+		if offsets_in_mcal is None:
+			for layer in self.layers:
+				layer.write(f)
+		else:
+			for layer, offset_in_mcal in zip(self.layers, offsets_in_mcal):
+				layer.write(f, offset_in_mcal)
 
 
 class MCRF(MOBILE_CHUNK):
@@ -1244,18 +1425,19 @@ class MCRF(MOBILE_CHUNK):
 
 	def _remove_doodad(self, index_in_mddf):
 		self.doodad_refs.remove(index_in_mddf)
-		for i in range(len(self.doodad_refs)):
-			if self.doodad_refs[i] > index_in_mddf:
-				self.doodad_refs[i] -= 1
+
+	def _replace_doodad(self, index_in_mddf, new_index_in_mddf):
+		# instances are not reordered when removed, the last one takes the index of the removed one (see MDDF._remove)
+		self.doodad_refs[self.doodad_refs.index(index_in_mddf)] = new_index_in_mddf
 
 	def _add_object(self, index_in_modf):
 		self.object_refs.append(index_in_modf)
 
 	def _remove_object(self, index_in_modf):
 		self.object_refs.remove(index_in_modf)
-		for i in range(len(self.object_refs)):
-			if self.object_refs[i] > index_in_modf:
-				self.object_refs[i] -= 1
+
+	def _replace_object(self, index_in_modf, new_index_in_modf):
+		self.object_refs[self.object_refs.index(index_in_modf)] = new_index_in_modf
 
 	def read(self, f, n_doodad_refs, n_object_refs):
 		self.set_address(f.tell())
@@ -1299,10 +1481,77 @@ class MCSH(MOBILE_CHUNK):
 				uint8.write(f, b)
 
 
+# worst case size of a compressed alpha map, a command byte for each value
+_RLE_MAX_SIZE = 2 * ADTAlphaSize.HIGHRES
+
+
+def _decode_rle(data):
+	"""Decodes a compressed alpha map from the start of data. Commands fill (high bit set) the next count values with
+	the following byte, or copy the count following bytes. Returns the 4096 values and the number of bytes used."""
+	values = bytearray()
+	pos = 0
+
+	while len(values) < ADTAlphaSize.HIGHRES and pos < len(data):
+		command = data[pos]
+		count = command & 0x7F
+
+		if command & 0x80:
+			values += data[pos + 1:pos + 2] * count
+			pos += 2
+		else:
+			values += data[pos + 1:pos + 1 + count]
+			pos += 1 + count
+
+	values = values[:ADTAlphaSize.HIGHRES]
+	values += bytes(ADTAlphaSize.HIGHRES - len(values))
+	return values, pos
+
+
+def _encode_rle(alpha_map):
+	"""Compresses a 64x64 alpha map, each row on its own as the client expects. Runs of equal values are filled,
+	other values are copied, consecutive ones sharing a command."""
+	values = numpy.asarray(alpha_map, dtype=numpy.uint8).reshape(-1)
+	n = len(values)
+	index = numpy.arange(n)
+
+	# runs of equal values within rows
+	run_start = numpy.ones(n, dtype=bool)
+	run_start[1:] = values[1:] != values[:-1]
+	run_start[::64] = True
+	starts = numpy.flatnonzero(run_start)
+	lengths = numpy.diff(numpy.append(starts, n))
+	fill = lengths > 1
+
+	# commands: a fill per run of several values, a copy per sequence of single values within a row
+	command_start = fill.copy()
+	command_start[1:] |= fill[:-1]
+	command_start |= starts % 64 == 0
+	command_of_run = numpy.cumsum(command_start) - 1
+
+	command_first = starts[command_start]
+	command_count = numpy.bincount(command_of_run, weights=lengths).astype(numpy.intp)
+	command_fill = fill[command_start]
+
+	# a fill is written as 2 bytes, a copy as its count then the values
+	command_size = numpy.where(command_fill, 2, command_count + 1)
+	command_pos = numpy.cumsum(command_size) - command_size
+
+	out = numpy.empty(command_size.sum(), dtype=numpy.uint8)
+	out[command_pos] = command_count | (command_fill << 7)
+	out[command_pos[command_fill] + 1] = values[command_first[command_fill]]
+
+	command_of_value = command_of_run[numpy.cumsum(run_start) - 1]
+	copied = ~command_fill[command_of_value]
+	copied_commands = command_of_value[copied]
+	out[command_pos[copied_commands] + 1 + index[copied] - command_first[copied_commands]] = values[copied]
+
+	return out.tobytes()
+
+
 class MCALLayer:
 	def __init__(self, type=None):
 		self.type = type
-		self.alpha_map = [[0 for _ in range(64)] for _ in range(64)]
+		self.alpha_map = numpy.zeros((64, 64), dtype=numpy.uint8)
 
 	def _set_class(self):
 		class_map = {
@@ -1314,8 +1563,7 @@ class MCALLayer:
 		self.__class__ = class_map[self.type]
 
 	def is_fully_transparent(self):
-		flattened = [item for sublist in self.alpha_map for item in sublist]
-		return not any(flattened)
+		return not numpy.any(self.alpha_map)
 			
 	def read(self, f, alpha_type):
 		self.type = alpha_type
@@ -1329,139 +1577,57 @@ class MCALLayerLowresOrBroken(MCALLayer):
 	size = ADTAlphaSize.LOWRES
 
 	def read(self, f):
-		cur_pos = 0
-		alpha_map_flat = [0] * ADTAlphaSize.HIGHRES
-
-		for i in range(ADTAlphaSize.LOWRES):
-			cur_byte = uint8.read(f)
-
-			nibble1 = cur_byte & 0x0F
-			nibble2 = (cur_byte & 0xF0) >> 4
-
-			first = nibble1 * 255 // 15
-			second = nibble2 * 255 // 15
-
-			alpha_map_flat[i + cur_pos + 0] = first
-			alpha_map_flat[i + cur_pos + 1] = second
-			cur_pos += 1
-
-		# Nice cropcircles
-		# self.alpha_map = [[alpha_map_flat[i * j] for i in range(64)] for j in range(64)]
-		self.alpha_map = [[alpha_map_flat[i * 64 + j] for j in range(64)] for i in range(64)]
+		# two values per byte, low nibble first, scaled from 0-15 to 0-255
+		packed = numpy.frombuffer(f.read(ADTAlphaSize.LOWRES), dtype=numpy.uint8)
+		alpha_map = numpy.empty(ADTAlphaSize.HIGHRES, dtype=numpy.uint8)
+		alpha_map[0::2] = (packed & 0x0F) * 17
+		alpha_map[1::2] = (packed >> 4) * 17
+		self.alpha_map = alpha_map.reshape(64, 64)
 
 		if self.type == ADTAlphaTypes.BROKEN:
-			for row in self.alpha_map:
-				row[63] = row[62]
-
-			for i, column in enumerate(self.alpha_map[62]):
-				self.alpha_map[63][i] = column
+			self.alpha_map[:, 63] = self.alpha_map[:, 62]
+			self.alpha_map[63] = self.alpha_map[62]
 
 	def write(self, f):
-		alpha_map_flat = []
-		for row in self.alpha_map:
-			for value in row:
-				alpha_map_flat.append(value)
-
-		for i in range(0, ADTAlphaSize.HIGHRES, 2):
-			nibble1 = alpha_map_flat[i] // (255 // 15)
-			nibble2 = alpha_map_flat[i + 1] // (255 // 15)
-			uint8.write(f, nibble1 + (nibble2 << 4))
+		values = numpy.asarray(self.alpha_map, dtype=numpy.uint8).reshape(-1) // 17
+		f.write((values[0::2] | (values[1::2] << 4)).tobytes())
 
 
 class MCALLayerHighres(MCALLayer):
 	size = ADTAlphaSize.HIGHRES
 
 	def read(self, f):
-		self.alpha_map = [[uint8.read(f) for _ in range(64)] for _ in range(64)]
+		data = bytearray(f.read(ADTAlphaSize.HIGHRES))
+		self.alpha_map = numpy.frombuffer(data, dtype=numpy.uint8).reshape(64, 64)
 
 	def write(self, f):
-		for row in self.alpha_map:
-			for value in row:
-				uint8.write(f, value)
+		f.write(numpy.asarray(self.alpha_map, dtype=numpy.uint8).tobytes())
 
 
 class MCALLayerHighresCompressed(MCALLayer):
-	size = ADTAlphaSize.HIGHRES
-	
-	def read(self, f):
-		alpha_map_flat = [0] * ADTAlphaSize.HIGHRES
-		alpha_offset = 0
-
-		while alpha_offset < ADTAlphaSize.HIGHRES:
-			cur_byte = uint8.read(f)
-			mode = bool(cur_byte >> 7)
-			count = cur_byte & 0b1111111
-
-			if mode:  # fill
-				alpha = uint8.read(f)
-				for i in range(count):
-					alpha_map_flat[alpha_offset] = alpha
-					alpha_offset += 1
-			else:  # copy
-				for i in range(count):
-					alpha_map_flat[alpha_offset] = uint8.read(f)
-					alpha_offset += 1
+	# size of the alpha map as last read or encoded, it changes with the alpha map
+	_size = None
 
-	def write(self, f):
-		alpha_map_flat = []
-		for row in self.alpha_map:
-			for value in row:
-				alpha_map_flat.append(value)
-
-		class Cache:
-			def __init__(self, pos=0, val=256):
-				self.reset_pos(pos)
-				self.reset_val(val)
-
-			def reset_pos(self, pos):
-				self.pos = pos
-				self.stride = 1
-
-			def reset_val(self, val):
-				self.val = val
-				self.count = 1
-
-			def dump(self, file, mode=None, container=None):
-				mode = mode if mode is not None else self.count > 1
-
-				if not (mode or container):
-					return False
-
-				count = (self.count if mode else self.stride - 1) & 0x7F
-				uint8.write(file, mode * 0x80 | count)
-
-				if mode:
-					uint8.write(file, self.val)
-				else:
-					for j in range(self.pos, self.pos + count):
-						uint8.write(file, container[j])
-
-				return True
-
-		cache = Cache(0, alpha_map_flat[0])
-
-		for pos, val in enumerate(alpha_map_flat, 1):
-			if not (pos % 64):
-				cache.dump(f, container=alpha_map_flat)
-				cache.reset_pos(pos)
-				cache.reset_val(val)
-				continue
-
-			if cache.val != val:
-				if cache.count > 1:
-					cache.dump(f, True)
-					cache.reset_pos(pos)
-				else:
-					cache.stride += 1
-
-				cache.reset_val(val)
-			else:
-				if cache.count == 1 and cache.stride > 1:
-					cache.dump(f, False, alpha_map_flat)
+	@property
+	def size(self):
+		if self._size is None:
+			self._encode()
+		return self._size
 
-				cache.count += 1
+	def read(self, f):
+		# the compressed size is only known once decoded, read enough for any map and go back to its end
+		start = f.tell()
+		values, self._size = _decode_rle(f.read(_RLE_MAX_SIZE))
+		f.seek(start + self._size)
+		self.alpha_map = numpy.frombuffer(values, dtype=numpy.uint8).reshape(64, 64)
 
-		cache.dump(f, container=alpha_map_flat)
+	def _encode(self):
+		data = _encode_rle(self.alpha_map)
+		self._size = len(data)
+		return data
+
+	def write(self, f):
+		f.write(self._encode())
 
 
 class MCAL(MOBILE_CHUNK):
@@ -1471,22 +1637,25 @@ class MCAL(MOBILE_CHUNK):
 		MOBILE_CHUNK.__init__(self, adt)
 		self.header = ChunkHeader(MCAL.magic)
 		self.layers = []
+		# sizes of the alpha maps the tracked layout was computed for, compressed ones change with their content
+		self._laid_out_sizes = []
 
 	def _add_layer(self, type):
 		layer = MCALLayer(type)
 		layer._set_class()
 		self.layers.append(layer)
-		ofs = 0
-		for i in range(1, len(self.layers)):
-			ofs += self.layers[i].size
+		# after the alpha maps as laid out
+		ofs = sum(self._laid_out_sizes)
+		self._laid_out_sizes.append(layer.size)
 
 		address_of_change = self.address + ChunkHeader.size + ofs - 1	# Dirty, but should be safe
 		self.adt._size_changed(layer.size, address_of_change)
 		return ofs
 
 	def _remove_layer(self, index, address):
-		self.adt._size_changed(-self.layers[index].size, address)
+		self.adt._size_changed(-self._laid_out_sizes[index], address)
 		del self.layers[index]
+		del self._laid_out_sizes[index]
 
 	def _get_alpha_type(self, alpha_is_highres, alpha_is_compressed, alpha_is_broken):
 		alpha_type = None
@@ -1518,18 +1687,49 @@ class MCAL(MOBILE_CHUNK):
 			layer.read(f, alpha_type)
 			self.layers.append(layer)
 
-	def write(self, f):
-		size = 0
-		for layer in self.layers:
-			size += layer.size
-		self.header.size = size
+		self._laid_out_sizes = [layer.size for layer in self.layers]
+
+	def _encode_layers(self):
+		"""Compressed alpha maps have to be encoded to know their size. Returns the sizes of the alpha maps as
+		written, and the encoded compressed ones by layer index."""
+		sizes = []
+		encoded = {}
+		for i, layer in enumerate(self.layers):
+			if layer.type == ADTAlphaTypes.HIGHRES_COMPRESSED:
+				encoded[i] = layer._encode()
+				sizes.append(len(encoded[i]))
+			else:
+				sizes.append(layer.size)
+
+		return sizes, encoded
+
+	def _get_layer_sizes(self):
+		"""Sizes of the alpha maps as written"""
+		return self._encode_layers()[0]
+
+	def _is_layout_stale(self):
+		"""Whether compressed alpha maps no longer encode to the sizes the tracked layout was computed for, as after
+		editing them or reading maps encoded differently. Offsets in and after MCAL are then to be laid out again."""
+		if not any(layer.type == ADTAlphaTypes.HIGHRES_COMPRESSED for layer in self.layers):
+			return False
+
+		return self._get_layer_sizes() != self._laid_out_sizes
+
+	def write(self, f, encoded_layers=None):
+		"""encoded_layers is the result of _encode_layers() if already called"""
+		sizes, encoded = self._encode_layers() if encoded_layers is None else encoded_layers
+		self.header.size = sum(sizes)
 		self.header.write(f)
-		for layer in self.layers:
-			layer.write(f)
+		for i, layer in enumerate(self.layers):
+			if i in encoded:
+				f.write(encoded[i])
+			else:
+				layer.write(f)
 
 
-class MCSESoundEmitter:
+class MCSESoundEmitter(FixedLayout):
 	size = 28
+	_layout = Struct('<I6f')
 
 	def __init__(self, entry_id=0, position=None, size=None):
 		if position is None:
@@ -1540,15 +1740,15 @@ class MCSESoundEmitter:
 		self.position = position
 		self.size = size
 
-	def read(self, f):
-		self.entry_id = uint32.read(f)
-		self.position.read(f)
-		self.size.read(f)
+	def _set_values(self, values):
+		self.entry_id = values[0]
+		self.position = C3Vector(values[1:4])
+		self.size = C3Vector(values[4:7])
 
-	def write(self, f):
-		uint32.write(f, self.entry_id)
-		self.position.write(f)
-		self.size.write(f)
+	def _get_values(self):
+		position = self.position
+		size = self.size
+		return self.entry_id, position.x, position.y, position.z, size.x, size.y, size.z
 
 
 class MCSE(MOBILE_CHUNK):
@@ -1571,51 +1771,44 @@ class MCSE(MOBILE_CHUNK):
 	def read(self, f, n_sound_emitters):
 		self.set_address(f.tell())
 		self.header.read(f)
-		self.entries = [MCSESoundEmitter() for _ in range(n_sound_emitters)]
+		self.entries = MCSESoundEmitter.read_array(f, n_sound_emitters)
 
 	def write(self, f):
 		self.header.size = len(self.entries) * MCSESoundEmitter.size
 		self.header.write(f)
-		for entry in self.entries:
-			entry.write(f)
+		MCSESoundEmitter.write_array(f, self.entries)
 
 
-class MCLQVertex:
+class MCLQVertex(FixedLayout):
 	"""MCLQ liquid vertex (8 bytes)"""
 	size = 8
+	_layout = Struct('<2f')
 
 	def __init__(self):
 		self.liquid_height = 0.0  # float
 		self.liquid_height_2 = 0.0  # float (often unused)
 
-	def read(self, f):
-		self.liquid_height = float32.read(f)
-		self.liquid_height_2 = float32.read(f)
-		return self
+	def _set_values(self, values):
+		self.liquid_height, self.liquid_height_2 = values
 
-	def write(self, f):
-		float32.write(f, self.liquid_height)
-		float32.write(f, self.liquid_height_2)
-		return self
+	def _get_values(self):
+		return self.liquid_height, self.liquid_height_2
 
 
-class MCLQAttributes:
+class MCLQAttributes(FixedLayout):
 	"""MCLQ tile attributes (8 bytes)"""
 	size = 8
+	_layout = Struct('<2Q')
 
 	def __init__(self):
 		self.fishable = 0  # uint64 bitmask (8x8 tiles)
 		self.deep = 0      # uint64 bitmask (8x8 tiles)
 
-	def read(self, f):
-		self.fishable = uint64.read(f)
-		self.deep = uint64.read(f)
-		return self
+	def _set_values(self, values):
+		self.fishable, self.deep = values
 
-	def write(self, f):
-		uint64.write(f, self.fishable)
-		uint64.write(f, self.deep)
-		return self
+	def _get_values(self):
+		return self.fishable, self.deep
 
 
 class MCLQ(MOBILE_CHUNK):
@@ -1640,10 +1833,13 @@ class MCLQ(MOBILE_CHUNK):
 		self.set_address(f.tell())
 		self.header.read(f)
 
+		# chunks without legacy liquid still have an empty MCLQ
+		if not self.header.size:
+			return self
+
 		# Read 9x9 vertices
-		for y in range(9):
-			for x in range(9):
-				self.vertices[y][x].read(f)
+		vertices = MCLQVertex.read_array(f, 81)
+		self.vertices = [vertices[y * 9:y * 9 + 9] for y in range(9)]
 
 		# Read attributes
 		self.attributes.read(f)
@@ -1655,9 +1851,7 @@ class MCLQ(MOBILE_CHUNK):
 		self.header.write(f)
 
 		# Write 9x9 vertices
-		for y in range(9):
-			for x in range(9):
-				self.vertices[y][x].write(f)
+		MCLQVertex.write_array(f, [vertex for row in self.vertices for vertex in row])
 
 		# Write attributes
 		self.attributes.write(f)
@@ -3,6 +3,7 @@ import struct
 from io import BytesIO
 
 from .wow_common_types import M2RawChunk
+from ..io_utils.binary_reader import BinaryReader
 
 
 class AFM2(M2RawChunk):
@@ -33,8 +34,7 @@ class AnimFile:
     def read(self, f):
 
         if self.old:
-            self.raw_data.write(f.read())
-            self.raw_data.seek(0)
+            self.raw_data = BinaryReader.from_stream(f, -1)
 
         else:
 
@@ -1,6 +1,7 @@
-from io import BytesIO
 from .wow_common_types import MVER, M2Array, fixed16, M2ContentChunk, M2ArrayChunk
 from ..io_utils.types import *
+from ..io_utils.binary_writer import BinaryWriter
+from ..io_utils.binary_reader import BinaryReader
 from .m2_format import M2Header, M2PartTrack, M2Track, M2Bounds, M2TrackBase
 
 
@@ -397,9 +398,7 @@ class MD21(M2Header, M2ContentChunk):
 
     def read(self, f):
         M2ContentChunk.read(self, f)
-        md20_raw = f.read(self.size)
-
-        with BytesIO(md20_raw) as f2:
+        with BinaryReader.from_stream(f, self.size) as f2:
             magic = f2.read(4)
             assert magic != 'MD20'
 
@@ -409,12 +408,12 @@ class MD21(M2Header, M2ContentChunk):
 
     def write(self, f):
 
-        with BytesIO() as f2:
-            M2Header.write(self, f2)
-            md20_raw = f2.read()
-            self.size = len(md20_raw)
-            M2ContentChunk.write(self, f)
-            f.write(md20_raw)
+        f2 = BinaryWriter()
+        M2Header.write(self, f2)
+        md20_raw = f2.getbuffer()
+        self.size = len(md20_raw)
+        M2ContentChunk.write(self, f)
+        f.write(md20_raw)
 
         return self
 
@@ -3,6 +3,7 @@ from collections import OrderedDict
 from .wow_common_types import CAaBox, CRange, M2Array, M2Versions, fixed16, fixed_point, MemoryManager, \
     M2VersionsManager, M2ExternalSequenceCache
 from ..io_utils.types import *
+from ..io_utils.binary_writer import BinaryWriter
 from .skin_format import M2SkinProfile
 from ..enums.m2_enums import M2KeyBones, M2GlobalFlags, M2AttachmentTypes, M2EventTokens
 
@@ -48,14 +49,21 @@ class M2String:
         return self
 
     def write(self, f):
+        data = (self.value + '\0').encode('utf-8')
+
+        if type(f) is BinaryWriter:
+            uint32.write(f, len(data))
+            f.write_deferred(data)
+            return self
+
         ofs = MemoryManager.ofs_request(f)
 
-        uint32.write(f, len(self.value) + 1)
+        uint32.write(f, len(data))
         uint32.write(f, ofs)
 
         pos = f.tell()
         f.seek(ofs)
-        self.value = f.write((self.value + '\0').encode('utf-8'))
+        f.write(data)
         f.seek(pos)
         
         return self
@@ -1,4 +1,5 @@
 from enum import IntFlag
+from struct import Struct
 from typing import List, Tuple
 from .wow_common_types import *
 
@@ -125,17 +126,7 @@ class MOTX(ContentChunk):
         return self.string_table[start:i].decode('ascii')
 
     def get_all_strings(self):
-        strings = []
-        cur_str = ""
-
-        for byte in self.string_table:
-            if byte:
-                cur_str += chr(byte)
-            elif cur_str:
-                strings.append(cur_str)
-                cur_str = ""
-
-        return strings
+        return decode_strings(self.string_table)[0]
 
 class WMOMaterial:
 
@@ -583,20 +574,12 @@ class MODN(ContentChunk):
         return self.string_table[start:i].decode('ascii')
 
     def get_all_strings(self):
-        strings = []
-        cur_str = ""
+        return decode_strings(self.string_table)[0]
 
-        for byte in self.string_table:
-            if byte:
-                cur_str += chr(byte)
-            elif cur_str:
-                strings.append(cur_str)
-                cur_str = ""
 
-        return strings
+class DoodadDefinition(FixedLayout):
+    _layout = Struct('<I3f4ff4B')
 
-
-class DoodadDefinition:
     def __init__(self):
         self.name_ofs = 0
         self.flags = 0
@@ -605,26 +588,18 @@ class DoodadDefinition:
         self.scale = 0
         self.color = [0, 0, 0, 0]
 
-    def read(self, f):
-        weird_thing = uint32.read(f)
+    def _set_values(self, values):
+        weird_thing = values[0]
         self.name_ofs = weird_thing & 0xFFFFFF
         self.flags = (weird_thing >> 24) & 0xFF
-        self.position = vec3D.read(f)
-        self.rotation = float32.read(f, 4)
-        self.scale = float32.read(f)
-        self.color = uint8.read(f, 4)
+        self.position = values[1:4]
+        self.rotation = values[4:8]
+        self.scale = values[8]
+        self.color = values[9:]
 
-        return self
-
-    def write(self, f):
+    def _get_values(self):
         weird_thing = ((self.flags & 0xFF) << 24) | (self.name_ofs & 0xFFFFFF)
-        uint32.write(f, weird_thing)
-        vec3D.write(f, self.position)
-        float32.write(f, self.rotation, 4)
-        float32.write(f, self.scale)
-        uint8.write(f, self.color, 4)
-
-        return self
+        return (weird_thing, *self.position, *self.rotation, self.scale, *self.color)
 
     @staticmethod
     def size():
@@ -1,6 +1,10 @@
+import re
 import struct
 
+from struct import Struct
 from ..io_utils.types import *
+from ..io_utils.binary_reader import BinaryReader
+from ..io_utils.binary_writer import BinaryWriter
 from io import SEEK_CUR, BytesIO
 from collections.abc import Iterable
 from typing import Optional, Protocol
@@ -85,72 +89,105 @@ class CImVector:
         uint8.write(f, (self.b, self.g, self.r, self.a), 4)
 
 
-class C3Vector:
+class FixedLayout:  # for inheriting only
+    """ A record with a fixed binary layout, described by a single composite format.
+
+    Subclasses define _layout and implement _set_values() / _get_values(). Arrays of such records are then
+    decoded with one read and one iter_unpack via read_array(), and encoded with one write via write_array().
+    """
+    __slots__ = ()
+    _layout: Struct = None
+
+    def _set_values(self, values):
+        raise NotImplementedError
+
+    def _get_values(self):
+        raise NotImplementedError
+
+    @classmethod
+    def _from_values(cls, values):
+        record = cls.__new__(cls)
+        record._set_values(values)
+        return record
+
+    def read(self, f):
+        self._set_values(self._layout.unpack(f.read(self._layout.size)))
+        return self
+
+    def write(self, f):
+        f.write(self._layout.pack(*self._get_values()))
+        return self
+
+    @classmethod
+    def read_array(cls, f, n):
+        if n <= 0:
+            return []
+
+        layout = cls._layout
+        from_values = cls._from_values
+        return [from_values(values) for values in layout.iter_unpack(f.read(n * layout.size))]
+
+    @classmethod
+    def write_array(cls, f, records):
+        pack = cls._layout.pack
+        f.write(b''.join([pack(*record._get_values()) for record in records]))
+
+
+class C3Vector(FixedLayout):
     """A three component float vector"""
+    _layout = Struct('<3f')
+
     def __init__(self, vector=None):
         if vector is None:
             vector = (0.0, 0.0, 0.0)
         self.x, self.y, self.z = vector
 
-    def read(self, f):
-        self.x = float32.read(f)
-        self.y = float32.read(f)
-        self.z = float32.read(f)
+    def _set_values(self, values):
+        self.x, self.y, self.z = values
 
-        return self
-
-    def write(self, f):
-        float32.write(f, self.x)
-        float32.write(f, self.y)
-        float32.write(f, self.z)
-
-        return self
+    def _get_values(self):
+        return self.x, self.y, self.z
 
 
-class C4Plane:
+class C4Plane(FixedLayout):
     """A 3D plane defined by four floats"""
+    _layout = Struct('<4f')
+
     def __init__(self):
         self.normal = (0, 0, 0)
         self.distance = 0.0
 
-    def read(self, f):
-        self.normal = vec3D.read(f)
-        self.distance = float32.read(f)
-
-        return self
+    def _set_values(self, values):
+        self.normal = values[:3]
+        self.distance = values[3]
 
-    def write(self, f):
-        vec3D.write(f, self.normal)
-        float32.write(f, self.distance)
-
-        return self
+    def _get_values(self):
+        return (*self.normal, self.distance)
 
     @staticmethod
     def size():
         return 16
 
 
-class CRange:
+class CRange(FixedLayout):
     """A one dimensional float range defined by the bounds."""
+    _layout = Struct('<2f')
+
     def __init__(self):
         self.min = 0.0
         self.max = 0.0
 
-    def read(self, f):
-        self.min = float32.read(f)
-        self.max = float32.read(f)
-
-        return self
+    def _set_values(self, values):
+        self.min, self.max = values
 
-    def write(self, f):
-        float32.write(f, self.min)
-        float32.write(f, self.max)
-
-        return self
+    def _get_values(self):
+        return self.min, self.max
 
 
-class CAaBox:
+class CAaBox(FixedLayout):
     """An axis aligned box described by the minimum and maximum point."""
+    _layout = Struct('<6f')
+
     def __init__(self, min_=None, max_=None):
         if min_ is None:
             min_ = (0.0, 0.0, 0.0)
@@ -159,17 +196,12 @@ class CAaBox:
         self.min = min_
         self.max = max_
 
-    def read(self, f):
-        self.min = vec3D.read(f)
-        self.max = vec3D.read(f)
-
-        return self
-
-    def write(self, f):
-        vec3D.write(f, self.min)
-        vec3D.write(f, self.max)
+    def _set_values(self, values):
+        self.min = values[:3]
+        self.max = values[3:]
 
-        return self
+    def _get_values(self):
+        return (*self.min, *self.max)
 
 
 class fixed_point:
@@ -259,6 +291,8 @@ class M2Array(metaclass=Template):
 
             if type_t is GenericType:
                 self.values = [self.type.read(f) for _ in range(self.n_elements)]
+            elif isinstance(self.type, type) and issubclass(self.type, FixedLayout):
+                self.values = self.type.read_array(f, self.n_elements)
             else:
                 self.values = [self.type().read(f) for _ in range(self.n_elements)]
 
@@ -271,6 +305,17 @@ class M2Array(metaclass=Template):
         return self
 
     def write(self, f):
+        # in-memory writers append the values after everything written so far and patch the offset later
+        if type(f) is BinaryWriter:
+            uint32.write(f, len(self.values))
+
+            if self.values:
+                f.write_deferred(self._write_values)
+            else:
+                uint32.write(f, 0)
+
+            return self
+
         ofs = MemoryManager.ofs_request(f)
         uint32.write(f, len(self.values))
         uint32.write(f, ofs if len(self.values) else 0)
@@ -286,15 +331,22 @@ class M2Array(metaclass=Template):
         elif hasattr(self.type.func, 'size'):
             MemoryManager.mem_reserve(f, len(self.values) * self.type.func.size())
 
+        self._write_values(f)
+        f.seek(pos)
+
+        return self
+
+    def _write_values(self, f):
+        type_t = type(self.type)
+
         if type_t is GenericType:
             for value in self.values:
                 self.type.write(f, value)
+        elif isinstance(self.type, type) and issubclass(self.type, FixedLayout):
+            self.type.write_array(f, self.values)
         else:
             for value in self.values:
                 value.write(f)
-        f.seek(pos)
-
-        return self
 
     def __getitem__(self, item):
         return self.values[item]
@@ -425,8 +477,7 @@ class M2RawChunk(M2ContentChunk):
     def read(self, f):
         super().read(f)
 
-        self.raw_data.write(f.read(self.size))
-        self.raw_data.seek(0)
+        self.raw_data = BinaryReader.from_stream(f, self.size)
 
         return self
 
@@ -477,6 +528,9 @@ class ArrayChunkBase:  # for internal use only
 
             setattr(self, self.data, [tuple([var().read(f) for var in self.item]) for _ in range(self.size // size)])
 
+        elif isinstance(self.item, type) and issubclass(self.item, FixedLayout):
+            setattr(self, self.data, self.item.read_array(f, self.size // self.item.size()))
+
         else:
             setattr(self, self.data, [self.item().read(f) for _ in range(self.size // self.item.size())])
 
@@ -529,6 +583,10 @@ class ArrayChunkBase:  # for internal use only
                 f.write(self.raw_data)
                 return self
 
+            if isinstance(self.item, type) and issubclass(self.item, FixedLayout):
+                self.item.write_array(f, content)
+                return self
+
             for var in content:
 
                 if isinstance(self.item, GenericType):
@@ -543,7 +601,7 @@ class ArrayChunkBase:  # for internal use only
     def __getattribute__(self, item):
         raw_data = super().__getattribute__('raw_data')
         if item == super().__getattribute__('data') and raw_data is not None:
-            f = BytesIO(raw_data)
+            f = BinaryReader(raw_data)
             self.size = len(raw_data)
             self._read_content(f)
             self.raw_data = None
@@ -559,32 +617,108 @@ class M2ArrayChunk(ArrayChunkBase, M2ContentChunk):  # for inheriting only
     pass
 
 
+_STRING_PATTERN = re.compile(rb'[^\x00]+\x00')
+
+
+def decode_strings(data):
+    """ Zero terminated strings of a string table, bytes or bytearray, and their offsets in it. Empty strings are
+    skipped, as is a last string not terminated. Bytes are decoded one to one as characters (latin-1). """
+    strings = []
+    offsets = []
+
+    for match in _STRING_PATTERN.finditer(data):
+        strings.append(match.group()[:-1].decode('latin-1'))
+        offsets.append(match.start())
+
+    return strings, offsets
+
+
 class StringBlock:
-    """A block of zero terminated strings."""
+    """A block of zero terminated strings.
+
+    The index of each string and its offset in the block are kept along with the strings, so that finding a string
+    or its offset does not go through the block. Strings present more than once are found at their first index.
+    The block is read at once, and only decoded when the strings are first used.
+    """
 
     def __init__(self, size=0, padding=0):
-        self.strings = []
+        self._strings = []
+        # bytes read and not decoded yet
+        self._data = None
         self.size = size
         self.padding = padding
+        self._indices = {}
+        # offset of each string, then of the end of the block
+        self._offsets = [0]
+
+    def _decode(self):
+        if self._data is not None:
+            self._strings = decode_strings(self._data)[0]
+            self._data = None
+            self._update_indices()
+
+    @property
+    def strings(self):
+        self._decode()
+        return self._strings
+
+    @strings.setter
+    def strings(self, strings):
+        self._strings = list(strings)
+        self._data = None
+        self.size = sum(len(str_) + 1 for str_ in self._strings)
+        self._update_indices()
+
+    def _update_indices(self, start=0):
+        # indices and offsets of the strings from start on
+        strings = self.strings
+        del self._offsets[start + 1:]
+        ofs = self._offsets[start]
+
+        if not start:
+            self._indices = {}
+
+        for index in range(start, len(strings)):
+            str_ = strings[index]
+            self._indices.setdefault(str_, index)
+            ofs += len(str_) + 1 + self.padding
+            self._offsets.append(ofs)
 
     def read(self, f):
-        cur_str = ""
-
-        for _ in range(self.size):
-            # byte = f.read(1)
-            # if byte != b'\x00':
-            #     cur_str += byte.decode('ascii')
-            charcode = uint8.read(f)
-            if charcode:
-                cur_str += chr(charcode)
-            elif cur_str:
-                self.strings.append(cur_str)
-                cur_str = ""
-                f.seek(self.padding, SEEK_CUR)
+        if not self.padding:
+            self._data = f.read(self.size)
+            return self
+
+        # padding follows every string and is not part of the size
+        start = f.tell()
+        data = bytearray()
+        n_strings = 0
+
+        while len(data) < self.size:
+            f.seek(start + len(data) + n_strings * self.padding)
+            chunk = f.read(self.size - len(data))
+            end = len(chunk) - len(chunk.lstrip(b'\x00'))
+            end = chunk.find(b'\x00', end)
+
+            if end < 0:
+                data += chunk
+                break
+
+            data += chunk[:end + 1]
+            n_strings += 1
+
+        f.seek(start + self.size + n_strings * self.padding)
+        self._data = bytes(data)
 
         return self
 
     def write(self, f):
+        data = self._data
+        # blocks not decoded are written as read, unless they hold empty strings
+        if data is not None and not self.padding and (not data or (data[0] and not data[-1] and b'\x00\x00' not in data)):
+            f.write(data)
+            return
+
         for str_ in self.strings:
             f.write((str_ + '\x00').encode())
             f.seek(self.padding, SEEK_CUR)
@@ -592,15 +726,48 @@ class StringBlock:
     def _add(self, str_):
         self.size += len(str_) + 1
         self.strings.append(str_)
-        
+        self._update_indices(len(self.strings) - 1)
+
     def _replace(self, index, str_):
         size_change = len(str_) - len(self.strings[index])
         self.strings[index] = str_
         self.size += size_change
+        self._update_indices()
 
     def _remove(self, index):
         self.size -= len(self.strings[index]) + 1
         del self.strings[index]
+        self._update_indices()
+
+    def _remove_many(self, indices):
+        """ Removes the strings at indices at once. Returns the former indices of the strings kept, in order. """
+        removed = set(indices)
+        kept = [index for index in range(len(self.strings)) if index not in removed]
+
+        self.strings = [self.strings[index] for index in kept]
+
+        return kept
+
+    def index(self, str_):
+        """ Index of the first occurrence of str_, raises ValueError if absent. """
+        self._decode()
+        try:
+            return self._indices[str_]
+        except KeyError:
+            raise ValueError('{!r} is not in the string block'.format(str_)) from None
+
+    def get_offset(self, index):
+        """ Offset of the string at index from the start of the block. """
+        self._decode()
+        return self._offsets[index]
+
+    def get_offsets(self):
+        self._decode()
+        return self._offsets[:-1]
+
+    def __contains__(self, str_):
+        self._decode()
+        return str_ in self._indices
 
     def __getitem__(self, index):
         return self.strings[index]
@@ -609,7 +776,27 @@ class StringBlock:
         return len(self.strings)
 
 
-'''
+class ChunkHeader:
+    """ Magic and data size preceding the chunk data. """
+    size = 8  # size of the header itself, instances store the size of the chunk data
+
+    def __init__(self, magic='', size=0):
+        self.magic = magic
+        self.size = size
+
+    def read(self, f):
+        self.magic = f.read(4).decode('ascii')
+        self.size = uint32.read(f)
+
+        return self
+
+    def write(self, f):
+        f.write(self.magic[:4].encode('ascii'))
+        uint32.write(f, self.size)
+
+        return self
+
+
 class StringBlockChunk:
     magic = ""
 
@@ -630,8 +817,6 @@ class StringBlockChunk:
         self.filenames.write(f)
 
         return self
-        
-'''
 
 
 class MVER(ContentChunk):
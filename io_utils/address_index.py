@@ -0,0 +1,171 @@
+from itertools import accumulate
+from math import isqrt
+from operator import itemgetter
+from typing import List, Optional, Set
+from weakref import ref
+
+
+class AddressSlot:
+    """ Handle to an address tracked by an AddressIndex, the address stops being tracked when the handle is freed. """
+    __slots__ = ('pos', 'value', 'ref', '__weakref__')
+
+    def __init__(self, value: int):
+        self.pos = -1         # position in the ordered index, -1 while pending
+        self.value = value    # current address while pending
+        self.ref = ref(self)  # how the index references the slot
+
+
+class AddressIndex:
+    """ Addresses within a file, kept up to date as data is inserted into or removed from it.
+
+    shift(distance, after) moves every address greater than after by distance. Addresses are kept in order, and
+    shifts are accumulated in a Fenwick tree over their positions, so a shift costs O(log^2 n) instead of updating
+    every tracked address. Addresses registered or set since the index was last rebuilt are pending: they are
+    updated directly until there are enough of them to be worth merging into the ordered index.
+
+    Slots are only referenced weakly, so whoever owns an address does not have to unregister it: freed slots are
+    skipped, and dropped when the index is rebuilt.
+    """
+    __slots__ = ('_slots', '_base', '_tree', '_pending', '_n_removed')
+
+    def __init__(self):
+        self._slots: List[Optional[ref]] = []  # slots in address order, None where removed
+        self._base: List[int] = []               # address of each position when it was indexed
+        self._tree: List[int] = [0]              # 1-based Fenwick tree of shifts by position
+        self._pending: Set[ref] = set()
+        self._n_removed = 0
+
+    def register(self, address: int = 0) -> AddressSlot:
+        slot = AddressSlot(address)
+        self._pending.add(slot.ref)
+        return slot
+
+    def unregister(self, slot: AddressSlot):
+        if slot.pos < 0:
+            self._pending.discard(slot.ref)
+        else:
+            self._slots[slot.pos] = None
+            self._n_removed += 1
+            slot.pos = -1
+
+    def get(self, slot: AddressSlot) -> int:
+        pos = slot.pos
+        if pos < 0:
+            return slot.value
+
+        return self._base[pos] + self._shift_at(pos)
+
+    def set(self, slot: AddressSlot, address: int):
+        if slot.pos >= 0:
+            self._slots[slot.pos] = None
+            self._n_removed += 1
+            slot.pos = -1
+            self._pending.add(slot.ref)
+
+        slot.value = address
+
+    def shift(self, distance: int, after: int):
+        """ Moves all addresses greater than after by distance. """
+        if not distance:
+            return
+
+        if len(self._pending) > max(64, isqrt(len(self._slots))) or self._n_removed > len(self._slots) // 2:
+            self.rebuild()
+
+        for slot_ref in self._pending:
+            slot = slot_ref()
+            if slot is not None and slot.value > after:
+                slot.value += distance
+
+        base = self._base
+        n = len(base)
+
+        # first indexed position past the change
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if base[mid] + self._shift_at(mid) > after:
+                hi = mid
+            else:
+                lo = mid + 1
+
+        if lo == n:
+            return
+
+        self._add_shift(lo, distance)
+
+        if distance < 0 and lo:
+            # addresses within removed data now precede addresses that were not moved, take them out of the order
+            floor = base[lo - 1] + self._shift_at(lo - 1)
+            pos = lo
+
+            while pos < n:
+                address = base[pos] + self._shift_at(pos)
+                if address >= floor:
+                    break
+
+                base[pos] += floor - address
+                slot_ref = self._slots[pos]
+                slot = slot_ref() if slot_ref is not None else None
+
+                if slot is not None:
+                    self._slots[pos] = None
+                    self._n_removed += 1
+                    slot.pos = -1
+                    slot.value = address
+                    self._pending.add(slot_ref)
+
+                pos += 1
+
+    def rebuild(self):
+        """ Merges pending addresses into the ordered index and drops removed ones. """
+        tree = self._tree
+        n = len(self._slots)
+
+        # undo the Fenwick accumulation to get the shift starting at each position, then sum them up
+        deltas = tree[:]
+        for i in range(n, 0, -1):
+            j = i + (i & -i)
+            if j <= n:
+                deltas[j] -= deltas[i]
+
+        entries = [(base + shift, slot_ref) for base, shift, slot_ref
+                   in zip(self._base, accumulate(deltas[1:]), self._slots)
+                   if slot_ref is not None and slot_ref() is not None]
+        entries.extend((slot.value, slot.ref) for slot in map(ref.__call__, self._pending) if slot is not None)
+        entries.sort(key=itemgetter(0))
+
+        self._base = [address for address, _ in entries]
+        self._slots = [slot_ref for _, slot_ref in entries]
+        self._tree = [0] * (len(entries) + 1)
+        self._pending = set()
+        self._n_removed = 0
+
+        for pos, slot_ref in enumerate(self._slots):
+            slot = slot_ref()
+            if slot is not None:
+                slot.pos = pos
+
+    def _shift_at(self, pos: int) -> int:
+        tree = self._tree
+        i = pos + 1
+        total = 0
+
+        while i:
+            total += tree[i]
+            i &= i - 1
+
+        return total
+
+    def _add_shift(self, pos: int, distance: int):
+        tree = self._tree
+        n = len(tree)
+        i = pos + 1
+
+        while i < n:
+            tree[i] += distance
+            i += i & -i
+
+    def __len__(self) -> int:
+        return sum(1 for slot_ref in self._slots if slot_ref is not None and slot_ref() is not None) \
+               + sum(1 for slot_ref in self._pending if slot_ref() is not None)
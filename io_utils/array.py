@@ -2,21 +2,126 @@ from .struct_protocol import StructIOProtocol, StructFormatType
 from .exceptions import StructError
 from .var_type_protocol import VarTypeProtocol
 
+from array import array, typecodes
 from io import IOBase
-from typing import Union, Any, Dict, Set
+from struct import calcsize, pack, unpack
+from sys import byteorder
+from typing import Union, Any, Dict, Iterable, List, Sequence, Set, Tuple
+
+
+def _flatten(nested: Iterable[Any], depth: int) -> Iterable[Any]:
+    """ Yields leaves of nested lists of the given depth. """
+    if depth == 1:
+        yield from nested
+    else:
+        for sub in nested:
+            yield from _flatten(sub, depth - 1)
+
+
+def _reshape(values: Iterable[Any], dims: Sequence[int]) -> List[Any]:
+    """ Turns a flat sequence into nested lists of the given dimensions, outermost first. """
+    values = list(values)
+
+    for dim in reversed(dims[1:]):
+        values = [values[i:i + dim] for i in range(0, len(values), dim)]
+
+    return values
+
+
+def _numpy_dtype(fmt: str) -> Any:
+    """ Little-endian numpy dtype of a struct format character, None if numpy has no dtype of the same size. """
+    import numpy
+
+    try:
+        dtype = numpy.dtype('<' + fmt)
+    except TypeError:
+        return None
+
+    return dtype if dtype.itemsize == calcsize('<' + fmt) else None
+
+
+def _array_from_bytes(fmt: str, data: bytes, dims: Sequence[int], use_numpy: bool = False) -> Any:
+    """ Converts packed little-endian values into a contiguous array.
+
+    One-dimensional arrays become array.array, nested arrays a numpy.ndarray of the given shape (outermost
+    dimension first), indexed as a[i][j] or a[i, j]. Byte strings stay bytes. Formats array.array or numpy can not
+    hold fall back to (nested) lists.
+    """
+    if fmt == 's':
+        return data
+
+    if use_numpy or len(dims) > 1:
+        dtype = _numpy_dtype(fmt)
+        if dtype is not None:
+            import numpy
+            return numpy.frombuffer(bytearray(data), dtype=dtype).reshape(dims)
+
+    if fmt not in typecodes or len(dims) > 1:
+        n = len(data) // calcsize('<' + fmt)
+        values = unpack(f'<{n}{fmt}', data)
+        return list(values) if len(dims) == 1 else _reshape(values, dims)
+
+    values = array(fmt)
+    values.frombytes(data)
+
+    if byteorder == 'big':
+        values.byteswap()
+
+    return values
+
+
+def _array_to_bytes(fmt: str, values: Any, dims: Sequence[int]) -> bytes:
+    """ Packs an array as little-endian bytes. Accepts anything _array_from_bytes returns as well as (nested) lists.
+    The total number of elements is checked against the array dimensions.
+    """
+    n = 1
+    for dim in dims:
+        n *= dim
+
+    if fmt == 's':
+        return bytes(values)
+
+    if isinstance(values, (list, tuple)):
+        # nested lists are flattened, flat lists are taken as they are
+        if len(dims) > 1 and values and isinstance(values[0], (list, tuple)):
+            values = tuple(_flatten(values, len(dims)))
+
+        if len(values) != n:
+            raise StructError(f"Array of {n} elements expected, got {len(values)}.")
+
+        return pack(f'<{n}{fmt}', *values)
+
+    if hasattr(values, 'dtype'):
+        # numpy arrays, converted to little-endian whatever their byte order
+        import numpy
+        dtype = _numpy_dtype(fmt)
+        if dtype is not None:
+            values = numpy.ascontiguousarray(values, dtype=dtype)
+    elif byteorder == 'big':
+        values = array(fmt, memoryview(values).cast('B').cast(fmt))
+        values.byteswap()
+
+    data = memoryview(values).cast('B')
+    if len(data) != n * calcsize('<' + fmt):
+        raise StructError(f"Array of {n} elements expected, got {len(data) // calcsize('<' + fmt)}.")
+
+    return data.tobytes()
 
 
 class StructArray:
     _struct_array_is_generic: bool
     _struct_array_qualifier: Union[int, str, VarTypeProtocol]
     _struct_array_type: Union[StructIOProtocol, 'GenericType', VarTypeProtocol]
+    _struct_array_is_columnar: bool
+    _struct_is_conditional: bool
 
     # compling with StructIOProtocol interface
     _struct_is_template: bool
     _struct_is_resolved: bool
     _struct_is_specified: bool = True
 
-    def __init__(self, u_type: Union[StructIOProtocol, 'GenericType', VarTypeProtocol], qualifier: Union[int, VarTypeProtocol]):
+    def __init__(self, u_type: Union[StructIOProtocol, 'GenericType', VarTypeProtocol], qualifier: Union[int, VarTypeProtocol],
+                 columnar: bool = False):
         # check if any template arguments are passed
         self._struct_is_template = isinstance(u_type, VarTypeProtocol) \
                                    or isinstance(qualifier, VarTypeProtocol) \
@@ -36,10 +141,70 @@ class StructArray:
 
         self._struct_array_qualifier = qualifier
         self._struct_array_type = u_type
+        self._struct_array_is_columnar = columnar
+        self._struct_is_conditional = getattr(u_type, '_struct_is_conditional', False) is True
+
+    def columnar(self) -> 'StructArray':
+        """ Opt-in: store this array of plain old data structs as packed columns (see io_utils.columns). """
+        if self._struct_array_is_generic or isinstance(self._struct_array_type, StructArray):
+            raise StructError("Columnar storage is only supported for one-dimensional arrays of structs.")
+
+        return StructArray(self._struct_array_type, self._struct_array_qualifier, columnar=True)
+
+    def in_context(self, ctx: Any) -> 'StructArray':
+        """ Returns this array with its element struct's conditional fields resolved for the given context. """
+        if not self._struct_is_conditional:
+            return self
+
+        return StructArray(self._struct_array_type.in_context(ctx), self._struct_array_qualifier,
+                           self._struct_array_is_columnar)
+
+    def _struct_array_shape(self) -> Tuple[Any, List[int]]:
+        """ Unwraps nested arrays into the element type and the list of dimensions, outermost first. """
+        dims = []
+        array_type = self
+
+        while isinstance(array_type, StructArray):
+            dims.append(array_type._struct_array_qualifier)
+            array_type = array_type._struct_array_type
+
+        return array_type, dims
+
+    def _struct_array_generic_shape(self) -> Tuple['GenericType', List[int]]:
+        if not self._struct_is_resolved:
+            raise StructError("Reading or writing an unresolved array is undefined.")
+
+        elem_type, dims = self._struct_array_shape()
+
+        if elem_type.__class__.__name__ != 'GenericType':
+            raise StructError("Only arrays of plain types can be read or written directly, "
+                              "arrays of structs are handled by the struct containing them.")
+
+        return elem_type, dims
+
+    def write(self, f: IOBase, values: Any) -> 'StructArray':
+        """ Writes an array of plain values with a single write call. Values can be any buffer (array.array,
+        memoryview, numpy.ndarray) or (nested) lists.
+        """
+        elem_type, dims = self._struct_array_generic_shape()
+        f.write(_array_to_bytes(elem_type.format, values, dims))
+
+        return self
+
+    def read(self, f: IOBase, use_numpy: bool = False) -> Any:
+        """ Reads an array of plain values with a single read call.
+
+        Returns array.array for one-dimensional arrays, a numpy.ndarray of the given shape for nested ones,
+        or a numpy.ndarray if use_numpy is set.
+        """
+        elem_type, dims = self._struct_array_generic_shape()
+        n_bytes = self.length() * elem_type.size
+        data = f.read(n_bytes)
 
-    def write(self: StructIOProtocol, f: IOBase) -> StructIOProtocol: ...
+        if len(data) != n_bytes:
+            raise EOFError(f"Expected {n_bytes} bytes, got {len(data)}.")
 
-    def read(self: StructIOProtocol, f: IOBase) -> StructIOProtocol: ...
+        return _array_from_bytes(elem_type.format, data, dims, use_numpy)
 
     def _struct_format_chunked(self) -> Union[StructFormatType, str, None]:
         if not self._struct_is_resolved:
@@ -55,7 +220,7 @@ class StructArray:
             raise StructError("Accessing length of unresolved array is undefined.")
 
         if isinstance(self._struct_array_type, StructArray):
-            return self._struct_array_qualifier * self._struct_array_type._struct_array_qualifier
+            return self._struct_array_qualifier * self._struct_array_type.length()
 
         return self._struct_array_qualifier
 
@@ -137,7 +302,7 @@ class StructArray:
         #    raise StructError(f"Failed to substitute array template parameters. Expected {counter}, "
          #                     f"{len(params)} given.")
 
-        return StructArray(struct_array_type, struct_array_qualifier)
+        return StructArray(struct_array_type, struct_array_qualifier, self._struct_array_is_columnar)
 
 
     def __mod__(self, other: Union[Dict[str, Any], Any]) -> 'StructIOProtocol': ...
@@ -0,0 +1,128 @@
+from io import SEEK_SET, SEEK_CUR, SEEK_END
+from mmap import mmap, ACCESS_READ
+from struct import Struct
+from typing import Any, Optional, Tuple
+
+
+class BinaryReader:
+    """ Read-only file-like object over an in-memory buffer (bytes, bytearray, memoryview or mmap).
+
+    Implements the subset of the file interface used by read(f) methods (read, readinto, seek, tell), so it can be
+    passed anywhere a file opened in 'rb' mode is expected. read() returns bytes as files do, read_view() and
+    sub_reader() expose parts of the buffer without copying them.
+    """
+    __slots__ = ('_view', '_pos', '_mmap')
+
+    def __init__(self, buffer: Any, _mmap: Optional[mmap] = None):
+        self._view = memoryview(buffer).cast('B')
+        self._pos = 0
+        self._mmap = _mmap
+
+    @classmethod
+    def from_file(cls, path: str) -> 'BinaryReader':
+        """ Maps a file into memory. Use as a context manager or close() the reader to unmap it. """
+        with open(path, 'rb') as f:
+            try:
+                mapping = mmap(f.fileno(), 0, access=ACCESS_READ)
+            except ValueError:
+                # empty files can not be mapped
+                return cls(b'')
+
+        return cls(mapping, mapping)
+
+    @classmethod
+    def from_stream(cls, f: Any, size: int) -> 'BinaryReader':
+        """ Returns a reader over the next size bytes of f, sharing memory with f if it is a BinaryReader. """
+        if isinstance(f, BinaryReader):
+            return f.sub_reader(size)
+
+        return cls(f.read(size))
+
+    def read(self, size: int = -1) -> bytes:
+        start = self._pos
+        end = len(self._view) if size is None or size < 0 else min(start + size, len(self._view))
+        self._pos = max(end, start)
+
+        return self._view[start:end].tobytes()
+
+    def read_view(self, size: int = -1) -> memoryview:
+        """ Same as read(), but returns a memoryview into the underlying buffer instead of a copy. """
+        start = self._pos
+        end = len(self._view) if size is None or size < 0 else min(start + size, len(self._view))
+        self._pos = max(end, start)
+
+        return self._view[start:end]
+
+    def sub_reader(self, size: int = -1) -> 'BinaryReader':
+        """ Returns a reader over the next size bytes and advances past them, without copying. """
+        return BinaryReader(self.read_view(size))
+
+    def readinto(self, buffer: Any) -> int:
+        view = self.read_view(memoryview(buffer).nbytes)
+        n_bytes = len(view)
+        memoryview(buffer).cast('B')[:n_bytes] = view
+
+        return n_bytes
+
+    def unpack(self, codec: Struct) -> Tuple[Any, ...]:
+        """ Unpacks a record directly from the buffer and advances past it. """
+        values = codec.unpack_from(self._view, self._pos)
+        self._pos += codec.size
+
+        return values
+
+    def unpack_from(self, codec: Struct, offset: int) -> Tuple[Any, ...]:
+        """ Unpacks a record at an absolute offset, the position is left unchanged. """
+        return codec.unpack_from(self._view, offset)
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        if whence == SEEK_SET:
+            pos = offset
+        elif whence == SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == SEEK_END:
+            pos = len(self._view) + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence}).")
+
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}.")
+
+        self._pos = pos
+        return pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def getbuffer(self) -> memoryview:
+        return self._view
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return False
+
+    def close(self):
+        if self._mmap is not None:
+            self._view.release()
+
+            try:
+                self._mmap.close()
+            except BufferError:
+                # sub-readers still reference the mapping, it is unmapped once they are collected
+                pass
+
+            self._mmap = None
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+    def __enter__(self) -> 'BinaryReader':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
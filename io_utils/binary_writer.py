@@ -0,0 +1,135 @@
+from collections import deque
+from io import SEEK_SET, SEEK_CUR, SEEK_END
+from struct import Struct
+from typing import Any, Callable, Deque, List, Tuple, Union
+
+
+_offset = Struct('<I')
+
+DeferredData = Union[bytes, Callable[['BinaryWriter'], Any]]
+
+
+class BinaryWriter:
+    """ Write-only file-like object building output in memory, flushed to a file with a single write.
+
+    Implements the subset of the file interface used by write(f) methods (write, seek, tell), so it can be passed
+    anywhere a file opened in 'wb' mode is expected. Writing past the end zero-fills the gap, as files do.
+
+    Data referenced by an offset, e.g. M2Array contents, can be deferred with write_deferred(): the offset field is
+    left as a placeholder and the data is appended to the end of the buffer later, after everything written before
+    it. Offsets are recorded in a relocation table and patched in one pass by resolve_deferred(), which runs
+    implicitly before the output is retrieved.
+    """
+    __slots__ = ('_buffer', '_pos', '_deferred', '_relocations', 'alignment')
+
+    def __init__(self, alignment: int = 16):
+        self._buffer = bytearray()
+        self._pos = 0
+        self._deferred: Deque[Tuple[int, DeferredData]] = deque()
+        self._relocations: List[Tuple[int, int]] = []
+        self.alignment = alignment
+
+    def write(self, data: Any) -> int:
+        if type(data) is not bytes:
+            data = memoryview(data).cast('B')
+
+        buffer = self._buffer
+        pos = self._pos
+        n_bytes = len(data)
+
+        if pos == len(buffer):
+            buffer += data
+        else:
+            if pos > len(buffer):
+                buffer.extend(bytes(pos - len(buffer)))
+
+            buffer[pos:pos + n_bytes] = data
+
+        self._pos = pos + n_bytes
+        return n_bytes
+
+    def write_deferred(self, data: DeferredData):
+        """ Writes a placeholder uint32 offset at the current position, pointing to data written later.
+
+        Data is either bytes or a callable writing to this writer. It is appended aligned to the end of the buffer
+        once everything written so far is done, nested deferred data goes after it.
+        """
+        self._deferred.append((self._pos, data))
+        self.write(b'\0\0\0\0')
+
+    def resolve_deferred(self):
+        """ Appends all pending deferred data and patches the offsets pointing to it. """
+        deferred = self._deferred
+        relocations = self._relocations
+        buffer = self._buffer
+
+        while deferred:
+            ofs_pos, data = deferred.popleft()
+
+            end = len(buffer)
+            ofs = (end + self.alignment - 1) // self.alignment * self.alignment
+            buffer.extend(bytes(ofs - end))
+            self._pos = ofs
+
+            if callable(data):
+                data(self)
+            else:
+                self.write(data)
+
+            relocations.append((ofs_pos, ofs))
+
+        pack_into = _offset.pack_into
+        for ofs_pos, ofs in relocations:
+            pack_into(buffer, ofs_pos, ofs)
+
+        relocations.clear()
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        if whence == SEEK_SET:
+            pos = offset
+        elif whence == SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == SEEK_END:
+            pos = len(self._buffer) + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence}).")
+
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}.")
+
+        self._pos = pos
+        return pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def getbuffer(self) -> memoryview:
+        self.resolve_deferred()
+        return memoryview(self._buffer)
+
+    def getvalue(self) -> bytes:
+        self.resolve_deferred()
+        return bytes(self._buffer)
+
+    def write_to(self, f) -> int:
+        """ Flushes the complete output to a file with a single write. """
+        self.resolve_deferred()
+        return f.write(self._buffer)
+
+    def readable(self) -> bool:
+        return False
+
+    def seekable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return True
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def __enter__(self) -> 'BinaryWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
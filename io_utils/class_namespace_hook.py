@@ -11,7 +11,6 @@ class AnnotationsHook(dict):
 
         # handle special layout variables
         new_key = f"_struct_spec_var_{self.specials_counter}"
-        print(new_key)
         self.specials_counter += 1
 
         super().__setitem__(new_key, value)
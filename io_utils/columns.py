@@ -0,0 +1,181 @@
+from .ctypes import GenericType
+from .array import StructArray
+from .exceptions import StructError
+
+from array import array, typecodes
+from itertools import chain, starmap
+from typing import Any, Iterable, List, Tuple
+
+
+ColumnLayout = List[Tuple[str, str, int, int]]  # (attr_name, column format, elements per record, bytes per element)
+
+
+def _column_layout(struct_type) -> ColumnLayout:
+    """ Describes the columns of a plain old data struct, cached on the struct class. """
+    layout = struct_type.__dict__.get('_struct_column_layout')
+    if layout is not None:
+        return layout
+
+    if not struct_type._struct_is_resolved or getattr(struct_type, '_struct_codec', None) is None:
+        raise StructError(f"Struct <'{struct_type.__name__}'>: columnar storage requires a resolved struct.")
+
+    layout = []
+    for attr_name, annotation_type in struct_type.__annotations__.items():
+        elem_type = annotation_type
+        while isinstance(elem_type, StructArray):
+            elem_type = elem_type._struct_array_type
+
+        if not isinstance(elem_type, GenericType):
+            raise StructError(f"Struct <'{struct_type.__name__}'>: columnar storage requires a flat plain old data "
+                              f"struct, field '{attr_name}' is not a plain type or a plain type array.")
+
+        n_values = annotation_type.length()
+
+        # byte strings are stored as raw bytes
+        if elem_type.format == 's':
+            layout.append((attr_name, 's', 1, n_values))
+        elif elem_type.format in typecodes:
+            layout.append((attr_name, elem_type.format, n_values, elem_type.size))
+        else:
+            raise StructError(f"Struct <'{struct_type.__name__}'>: type '{elem_type.name}' of field '{attr_name}' "
+                              f"is not supported by columnar storage.")
+
+    struct_type._struct_column_layout = layout
+    return layout
+
+
+class StructColumns:
+    """ Array of plain old data structs stored as one bytearray, exposed as typed memoryview columns.
+
+    Each field occupies a contiguous region of the buffer. Fields that are arrays themselves store their elements
+    interleaved per record, which is their packed layout, so they are copied as bytes. Element access creates
+    a struct instance on demand.
+    """
+    __slots__ = ('struct_type', 'length', 'buffer', 'columns', 'raw_columns')
+
+    def __init__(self, struct_type, length: int):
+        self.struct_type = struct_type
+        self.length = length
+        self.columns = {}
+        self.raw_columns = {}
+
+        layout = _column_layout(struct_type)
+
+        # every column starts 8 bytes aligned
+        offsets = []
+        n_bytes = 0
+        for _, _, n_values, value_size in layout:
+            offsets.append(n_bytes)
+            n_bytes += (length * n_values * value_size + 7) & ~7
+
+        self.buffer = bytearray(n_bytes)
+        view = memoryview(self.buffer)
+
+        for (attr_name, fmt, n_values, value_size), ofs in zip(layout, offsets):
+            raw = view[ofs:ofs + length * n_values * value_size]
+            self.raw_columns[attr_name] = raw
+            self.columns[attr_name] = raw if fmt == 's' else raw.cast(fmt)
+
+    @classmethod
+    def from_bytes(cls, struct_type, data: bytes) -> 'StructColumns':
+        """ Creates columns from packed records as they are stored in files. """
+        codec = struct_type._struct_codec
+        columns = cls(struct_type, len(data) // codec.size)
+        columns._struct_set_values(tuple(chain.from_iterable(codec.iter_unpack(data))))
+
+        return columns
+
+    @classmethod
+    def read(cls, struct_type, f, length: int) -> 'StructColumns':
+        return cls.from_bytes(struct_type, f.read(length * struct_type._struct_codec.size))
+
+    def write(self, f) -> 'StructColumns':
+        f.write(self.to_bytes())
+        return self
+
+    def to_bytes(self) -> bytes:
+        return b''.join(starmap(self.struct_type._struct_codec.pack, self._struct_rows()))
+
+    def _struct_set_values(self, values: Tuple[Any, ...]):
+        """ Fills columns from the flattened values of all records, as unpacked by the struct codec. """
+        width = self.struct_type._struct_n_values
+
+        for i, (attr_name, fmt, n_values, value_size) in enumerate(_column_layout(self.struct_type)):
+            if fmt == 's' or n_values > 1:
+                self.raw_columns[attr_name][:] = b''.join(values[i::width])
+            else:
+                self.columns[attr_name][:] = array(fmt, values[i::width])
+
+    def _struct_columns(self) -> List[Iterable[Any]]:
+        """ Returns one sequence per unpacked value of a record, in pack order. """
+        sequences = []
+
+        for attr_name, fmt, n_values, value_size in _column_layout(self.struct_type):
+            if fmt == 's' or n_values > 1:
+                data = self.raw_columns[attr_name].tobytes()
+                stride = n_values * value_size
+                sequences.append([data[i:i + stride] for i in range(0, len(data), stride)])
+            else:
+                sequences.append(self.columns[attr_name].tolist())
+
+        return sequences
+
+    def _struct_rows(self) -> Iterable[Tuple[Any, ...]]:
+        return zip(*self._struct_columns())
+
+    def _struct_values(self) -> Iterable[Any]:
+        """ Yields the flattened values of all records in pack order. """
+        return chain.from_iterable(self._struct_rows())
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buffer)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getattr__(self, item: str) -> memoryview:
+        try:
+            return self.columns[item]
+        except KeyError:
+            raise AttributeError(f"'{self.struct_type.__name__}' has no field '{item}'") from None
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += self.length
+
+        if not 0 <= index < self.length:
+            raise IndexError("StructColumns index out of range.")
+
+        values = []
+        for attr_name, fmt, n_values, value_size in _column_layout(self.struct_type):
+            if fmt == 's' or n_values > 1:
+                stride = n_values * value_size
+                values.append(self.raw_columns[attr_name][index * stride:(index + 1) * stride].tobytes())
+            else:
+                values.append(self.columns[attr_name][index])
+
+        return self.struct_type._struct_from_values(values, 0)
+
+    def __setitem__(self, index: int, record):
+        if index < 0:
+            index += self.length
+
+        if not 0 <= index < self.length:
+            raise IndexError("StructColumns index out of range.")
+
+        values = record._struct_to_values()
+
+        for i, (attr_name, fmt, n_values, value_size) in enumerate(_column_layout(self.struct_type)):
+            if fmt == 's':
+                self.raw_columns[attr_name][index * value_size:(index + 1) * value_size] = \
+                    values[i].ljust(value_size, b'\0')[:value_size]
+            elif n_values > 1:
+                stride = n_values * value_size
+                self.raw_columns[attr_name][index * stride:(index + 1) * stride] = values[i]
+            else:
+                self.columns[attr_name][index] = values[i]
+
+    def __iter__(self):
+        from_values = self.struct_type._struct_from_values
+        return (from_values(row, 0) for row in self._struct_rows())
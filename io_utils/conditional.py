@@ -1,12 +1,41 @@
 from .struct_protocol import StructIOProtocol
 from .ctypes import GenericType
+from .exceptions import StructError
 
-from typing import Callable, Dict, List
-from collections.abc import Iterable
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 
 class StructContext:
-    pass
+    """ Values conditional fields are evaluated against, e.g. StructContext(wow_version=WoWVersions.WOTLK).
+
+    Contexts are immutable and hashable, layouts resolved for a context are cached by it.
+    """
+    __slots__ = ('_values', '_hash')
+
+    def __init__(self, **values: Any):
+        object.__setattr__(self, '_values', values)
+        object.__setattr__(self, '_hash', hash(tuple(sorted(values.items()))))
+
+    def __getattr__(self, item: str) -> Any:
+        try:
+            return self._values[item]
+        except KeyError:
+            raise AttributeError(f"Struct context has no value '{item}'.") from None
+
+    def __setattr__(self, key: str, value: Any):
+        raise AttributeError("Struct contexts are immutable.")
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, StructContext) and self._values == other._values
+
+    def __repr__(self) -> str:
+        return ', '.join(f"{name}={value!r}" for name, value in self._values.items())
+
+
+ConditionalFields = Dict[str, Any]
 
 
 class LogicExpr:
@@ -14,49 +43,122 @@ class LogicExpr:
 
 
 class If(LogicExpr):
-    __slots__ = ('expr',)
+    __slots__ = ('expr', 'fields')
     expr: Callable[[StructContext], bool]
+    fields: Optional[ConditionalFields]
+
+    def __init__(self, expr: Callable[[StructContext], bool], fields: Optional[ConditionalFields] = None):
+        if not callable(expr):
+            raise TypeError("Conditional expressions must be callables taking a struct context.")
 
-    def __init__(self, expr: Callable[[StructContext], bool]):
         self.expr = expr
+        self.fields = fields
 
 
 class Elif(If):
-    pass
+    __slots__ = ()
 
 
 class Else(LogicExpr):
-    __slots__ = ()
+    __slots__ = ('fields',)
+    fields: Optional[ConditionalFields]
+
+    def __init__(self, fields: Optional[ConditionalFields] = None):
+        self.fields = fields
 
 
 class Endif(LogicExpr):
     __slots__ = ()
 
 
-ConditionalScope = Dict[str, GenericType | StructIOProtocol] | LogicExpr
-
-
 class Conditional:
-    _logic_tree: List[ConditionalScope | List[ConditionalScope]]
+    """ Fields that depend on the struct context, declared as a field of a struct.
+
+    Accepts branches with their fields passed inline, If(expr, {...}), Elif(expr, {...}), Else({...}),
+    or as a token stream, If(expr), {...}, Elif(expr), {...}, Else(), {...}, Endif(). Expressions are called
+    with the struct context only, so the selected branch is a property of the context and the struct layout can be
+    resolved once per context (see StructMeta.in_context). Branch fields may contain further conditionals.
+    """
+    __slots__ = ('_branch_table',)
+    _branch_table: List[Tuple[Optional[Callable[[StructContext], bool]], ConditionalFields]]
 
-    def __init__(self, *args: Iterable[Dict[str, GenericType | StructIOProtocol] | LogicExpr]):
-        self._parse_logic_scope(args)
-        self._logic_tree = []
+    def __init__(self, *args: Union[ConditionalFields, LogicExpr]):
+        self._branch_table = self._parse_logic_scope(args)
 
-    def _parse_logic_scope(self,
-                           args: Iterable[Dict[str, GenericType | StructIOProtocol] | LogicExpr]
-                           ) -> List[ConditionalScope | List[ConditionalScope]]:
+    @staticmethod
+    def _parse_logic_scope(args: Tuple[Union[ConditionalFields, LogicExpr], ...]
+                           ) -> List[Tuple[Optional[Callable[[StructContext], bool]], ConditionalFields]]:
 
         if not len(args):
             raise SyntaxError("Empty conditionals are not allowed.")
 
-        if not isinstance(args[0], If):
+        if not isinstance(args[0], If) or isinstance(args[0], Elif):
             raise SyntaxError("Conditional statements must begin with an If token.")
 
-        
+        branch_table = []
+        has_else = False
+        has_endif = False
+
         for arg in args:
+            if has_endif:
+                raise SyntaxError("No tokens are allowed after Endif.")
+
             if isinstance(arg, If):
+                if branch_table and not isinstance(arg, Elif):
+                    raise SyntaxError("Nested If tokens must be declared in a nested Conditional.")
+
+                if has_else:
+                    raise SyntaxError("Elif token is not allowed after Else.")
+
+                branch_table.append((arg.expr, {}))
+                fields = arg.fields
+
+            elif isinstance(arg, Else):
+                if has_else:
+                    raise SyntaxError("Conditional statements allow only one Else token.")
+
+                has_else = True
+                branch_table.append((None, {}))
+                fields = arg.fields
+
+            elif isinstance(arg, Endif):
+                has_endif = True
+                continue
+
+            elif isinstance(arg, dict):
+                fields = arg
+
+            else:
+                raise SyntaxError(f"Unexpected token '{arg!r}' in conditional statement.")
+
+            if fields is None:
+                continue
+
+            branch_fields = branch_table[-1][1]
+            for attr_name, annotation_type in fields.items():
+                if not isinstance(annotation_type, (GenericType, StructIOProtocol, Conditional)):
+                    raise TypeError(f"Conditional field '{attr_name}' must be a plain type, a struct, an array "
+                                    f"or a nested Conditional.")
+
+                if attr_name in branch_fields:
+                    raise StructError(f"Conditional field '{attr_name}' is declared twice in the same branch.")
+
+                branch_fields[attr_name] = annotation_type
+
+        return branch_table
+
+    def _struct_select(self, ctx: StructContext) -> Tuple[int, ConditionalFields]:
+        """ Returns the index and the fields of the branch taken for the given context. """
+        for i, (expr, fields) in enumerate(self._branch_table):
+            if expr is None:
+                return i, fields
 
-        
+            try:
+                taken = expr(ctx)
+            except AttributeError as e:
+                raise StructError(f"Failed to evaluate conditional expression: {e}") from e
 
+            if taken:
+                return i, fields
 
+        return len(self._branch_table), {}
@@ -1,11 +1,15 @@
 from .ctypes import *
 from .array import StructArray
+from .conditional import Conditional, StructContext
 from .struct_protocol import StructIOProtocol, StructFormatType
 from .var_type_protocol import VarTypeProtocol
 from .exceptions import StructError
 from .class_namespace_hook import NameSpaceHook
+from .struct_codegen import generate_struct_io
+from .struct_cache import _lock, _stats, _templates
 
 from io import IOBase
+from types import MemberDescriptorType
 from typing import Set, Tuple, Type, Dict, Union, Optional
 
 
@@ -34,9 +38,12 @@ class StructMeta(type):
     _struct_is_plain_old_data: bool
     _struct_is_resolved: bool
     _struct_is_specified: bool
+    _struct_is_conditional: bool
     _struct_original: Optional[StructIOProtocol]
 
     _struct_template_definitions: Optional[Dict[Tuple[Tuple[str, Any]], StructIOProtocol]]
+    _struct_context_definitions: Optional[Dict[StructContext, StructIOProtocol]]
+    _struct_layout_definitions: Optional[Dict[Tuple[Any, ...], StructIOProtocol]]
 
     def __new__(mcs, classname, bases, cls_dict, original: Optional[StructIOProtocol] = None):
         # first turning the cls_dict into a normal Python dict, as we no longer need hooked functionality here
@@ -47,11 +54,29 @@ class StructMeta(type):
             raise StructError(f"Struct <'{classname}'>: Empty structs are not supported. "
                               "A struct must contain data-type annotations.")
 
+        # fields are stored in slots, so default values are moved out of the class namespace
+        # and assigned by the generated __init__ instead
+        defaults = dict(cls_dict.get('_struct_defaults', {}))
+
+        for attr_name in annotations:
+            value = cls_dict.pop(attr_name, None)
+
+            if value is not None and not isinstance(value, MemberDescriptorType):
+                defaults[attr_name] = value
+
         is_plain_old_data = True
         is_template = False
         is_resolved = True
+        is_conditional = False
 
         for attr_name, annotation_type in annotations.items():
+            # conditional fields, directly or in nested structs, are resolved per context (see in_context)
+            if isinstance(annotation_type, Conditional) or getattr(annotation_type, '_struct_is_conditional', False):
+                is_conditional = True
+
+                if isinstance(annotation_type, Conditional):
+                    continue
+
             # check if current Struct is a template (has at least one template parameter)
             if isinstance(annotation_type, VarTypeProtocol):
                 is_template = True
@@ -69,33 +94,40 @@ class StructMeta(type):
                         raise StructError(f"Struct <'{classname}'> contains unspecified struct at field '{attr_name}'."
                                           f" Struct signature: {annotation_type._struct_get_template_arg_sig_repr()}")
 
-                if attr_name in cls_dict:
+                if attr_name in defaults:
                     raise StructError(f"Struct <'{classname}'>: Default values are only supported for plain data "
                                       f"types. Field '{attr_name}' must not have a default value.")
 
             elif isinstance(annotation_type, GenericType):
                 # check if provided default value is of correct type
-                default_value = cls_dict.get(attr_name)
+                default_value = defaults.get(attr_name)
                 if default_value is not None and not isinstance(default_value, annotation_type.py_type):
                     raise TypeError(f"Struct <'{classname}'>: Default value provided for field '{attr_name}' is "
                                     f"'{str(type(default_value))}', expected '{str(type(annotation_type.py_type))}'")
 
             else:
-                _is_plain_old_data = False
+                is_plain_old_data = False
+
+        if is_conditional and is_template:
+            raise StructError(f"Struct <'{classname}'>: Conditional fields are not supported in templates.")
 
         format_chunks: Optional[StructFormatType] = None
 
-        if is_resolved:
-            format_chunks = StructMeta._struct_generate_format_specification(annotations, cls_dict)
+        if is_resolved and not is_conditional:
+            format_chunks = StructMeta._struct_generate_format_specification(annotations, defaults)
 
         if is_template and original is None:
             cls_dict['_struct_template_definitions'] = {}
 
+        if is_conditional:
+            cls_dict['_struct_context_definitions'] = {}
+            cls_dict['_struct_layout_definitions'] = {}
+
         # pack format
         format_processed = "".join(recurse_format_chunks(format_chunks)) if format_chunks else None
 
         cls_dict['_struct_format_chunks'] = format_chunks
-        cls_dict['_struct_token_string'] = None if not is_resolved else format_processed
+        cls_dict['_struct_token_string'] = None if not is_resolved or is_conditional else format_processed
         cls_dict['read'] = StructMeta.read
         cls_dict['write'] = StructMeta.write
         cls_dict['_struct_is_template'] = is_template
@@ -107,13 +139,31 @@ class StructMeta(type):
 
             cls_dict['_struct_is_resolved'] = is_resolved
         else:
-            cls_dict['_struct_is_resolved'] = True
+            cls_dict['_struct_is_resolved'] = not is_conditional
             cls_dict['_struct_is_specified'] = True
 
+        cls_dict['_struct_is_conditional'] = is_conditional
         cls_dict['_struct_original'] = original
+        cls_dict['_struct_defaults'] = defaults
+
+        # specializations are created from a copy of the template's namespace, their slots are re-emitted
+        if original is not None:
+            for name in ('__slots__', '__dict__', '__weakref__'):
+                cls_dict.pop(name, None)
+
+        if '__slots__' not in cls_dict:
+            slots = tuple(annotations)
+            cls_dict['__slots__'] = slots if is_plain_old_data else slots + ('__dict__',)
 
         new_type = type.__new__(mcs, classname, bases, cls_dict)
 
+        if is_template and original is None:
+            _templates.add(new_type)
+
+        # resolved structs get specialized read/write functions generated from their layout
+        if is_resolved and not is_conditional and format_processed:
+            generate_struct_io(new_type)
+
         return new_type
 
     @classmethod
@@ -121,7 +171,7 @@ class StructMeta(type):
         return NameSpaceHook()
 
     @staticmethod
-    def _struct_generate_format_specification(annotations: Dict[str, Any], cls_dict: Dict) -> Optional[StructFormatType]:
+    def _struct_generate_format_specification(annotations: Dict[str, Any], defaults: Dict) -> Optional[StructFormatType]:
         # generate struct specification for non-template structs right away
         format_chunks = []
 
@@ -134,7 +184,7 @@ class StructMeta(type):
 
             elif isinstance(annotation_type, GenericType):
                 # handle plain types
-                default_value = cls_dict.get(attr_name)
+                default_value = defaults.get(attr_name)
                 format_chunks.append((attr_name, annotation_type.format, default_value, annotation_type.length()))
 
         return format_chunks
@@ -159,6 +209,10 @@ class StructMeta(type):
         return self
 
     def _struct_format_chunked(cls) -> StructFormatType:
+        if cls._struct_is_conditional:
+            raise StructError(f"Attempted to access struct format for Struct <'{cls.__name__}'> with conditional "
+                              "fields. Use in_context() to resolve its layout first.")
+
         if not cls._struct_is_resolved:
             raise StructError(f"Attempted to access struct format for template Struct <'{cls.__name__}'> "
                               "that does not have all its template parameters specified.")
@@ -183,8 +237,24 @@ class StructMeta(type):
         definition = orig_type._struct_template_definitions.get(params_hashable)
 
         if definition is not None:
+            # not locked, hits counted concurrently with a pre-warming thread may be lost (see template_cache_info)
+            _stats.hits += 1
             return definition
 
+        # specializations may be pre-warmed from another thread (see struct_cache.prewarm_templates)
+        with _lock:
+            definition = orig_type._struct_template_definitions.get(params_hashable)
+
+            if definition is not None:
+                _stats.hits += 1
+                return definition
+
+            _stats.misses += 1
+
+            return cls._struct_specialize(orig_type, params, params_hashable)
+
+    def _struct_specialize(cls, orig_type: StructIOProtocol, params: Dict[str, Any],
+                           params_hashable: Tuple[Tuple[str, Any], ...]) -> StructIOProtocol:
         # create specialization here
         new_dict = cls.__dict__.copy()
         annotations = new_dict['__annotations__']
@@ -242,6 +312,76 @@ class StructMeta(type):
 
         return new_type
 
+    @staticmethod
+    def _struct_resolve_annotations(annotations: Dict[str, Any], ctx: StructContext
+                                    ) -> Tuple[Dict[str, Any], Tuple[Any, ...]]:
+        """ Substitutes conditionals with the fields of their taken branch and nested conditional structs with their
+        layout for the given context. Also returns a key identifying the resulting layout.
+        """
+        new_annotations = {}
+        layout_key = []
+
+        for attr_name, annotation_type in annotations.items():
+            if isinstance(annotation_type, Conditional):
+                branch_index, fields = annotation_type._struct_select(ctx)
+                fields, branch_key = StructMeta._struct_resolve_annotations(fields, ctx)
+                layout_key.append((branch_index, branch_key))
+
+                for field_name, field_type in fields.items():
+                    if field_name in new_annotations or field_name in annotations:
+                        raise StructError(f"Conditional field '{field_name}' conflicts with another field "
+                                          f"of the same name.")
+
+                    new_annotations[field_name] = field_type
+
+            elif getattr(annotation_type, '_struct_is_conditional', False):
+                annotation_type = annotation_type.in_context(ctx)
+                new_annotations[attr_name] = annotation_type
+
+                layout_key.append(annotation_type._struct_array_shape()[0]
+                                  if isinstance(annotation_type, StructArray) else annotation_type)
+
+            else:
+                new_annotations[attr_name] = annotation_type
+
+        return new_annotations, tuple(layout_key)
+
+    def in_context(cls, ctx: StructContext) -> Type[StructIOProtocol]:
+        """ Returns the struct with its conditional fields resolved for the given context.
+
+        Conditions are evaluated once per context, the resulting struct is a regular struct with its own generated
+        read/write functions. Contexts selecting the same branches share the resulting struct.
+        Structs without conditional fields are returned as they are.
+        """
+        if not cls._struct_is_conditional:
+            return cls
+
+        definition = cls._struct_context_definitions.get(ctx)
+        if definition is not None:
+            return definition
+
+        with _lock:
+            definition = cls._struct_context_definitions.get(ctx)
+            if definition is not None:
+                return definition
+
+            annotations, layout_key = StructMeta._struct_resolve_annotations(cls.__annotations__, ctx)
+            definition = cls._struct_layout_definitions.get(layout_key)
+
+            if definition is None:
+                # slots of the conditional struct are re-emitted for the resolved layout
+                new_dict = {name: value for name, value in cls.__dict__.items()
+                            if not isinstance(value, MemberDescriptorType)
+                            and name not in ('_struct_context_definitions', '_struct_layout_definitions')}
+                new_dict['__annotations__'] = annotations
+
+                definition = StructMeta.__new__(StructMeta, f"{cls.__name__}<{ctx!r}>", cls.__bases__, new_dict, cls)
+                cls._struct_layout_definitions[layout_key] = definition
+
+            cls._struct_context_definitions[ctx] = definition
+
+            return definition
+
     def __getitem__(cls, item: Union[str, int, VarTypeProtocol]) -> StructArray:
         """ Defines [] syntax for declaring arrays. """
 
@@ -0,0 +1,111 @@
+from collections import namedtuple
+from marshal import dumps, loads
+from sys import implementation
+from threading import RLock, Thread
+from types import CodeType
+from typing import Any, Dict, Iterable, List, Tuple, Union
+from weakref import WeakSet
+
+
+TemplateCacheInfo = namedtuple('TemplateCacheInfo', ('hits', 'misses', 'currsize'))
+
+
+class _TemplateCacheStats:
+    __slots__ = ('hits', 'misses')
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+
+# guards template specialization and context resolution, both may be triggered from a pre-warming thread
+_lock = RLock()
+_stats = _TemplateCacheStats()
+
+# templates owning a specialization cache, registered by StructMeta
+_templates = WeakSet()
+
+# compiled read/write functions of generated structs, keyed by their source
+_code_cache: Dict[str, CodeType] = {}
+
+
+def template_cache_info() -> TemplateCacheInfo:
+    """ Returns hit and miss counts of template specialization lookups and the number of cached specializations.
+    Hits are counted without locking, they are approximate while specializations are pre-warmed in another thread.
+    """
+    with _lock:
+        currsize = sum(len(template._struct_template_definitions) for template in _templates)
+        return TemplateCacheInfo(_stats.hits, _stats.misses, currsize)
+
+
+def reset_template_cache_stats():
+    with _lock:
+        _stats.hits = 0
+        _stats.misses = 0
+
+
+def _prewarm(specializations: Iterable[Tuple[Any, Any]]) -> List[Any]:
+    return [template % params for template, params in specializations]
+
+
+def prewarm_templates(specializations: Iterable[Tuple[Any, Any]], background: bool = False
+                      ) -> Union[List[Any], Thread]:
+    """ Creates template specializations ahead of their first use.
+
+    Specializations are given as (template, params) pairs, params being anything the % operator accepts.
+    Returns the specialized structs, or the started daemon thread creating them if background is set.
+    """
+    specializations = list(specializations)
+
+    if not background:
+        return _prewarm(specializations)
+
+    thread = Thread(target=_prewarm, args=(specializations,), name='struct-prewarm', daemon=True)
+    thread.start()
+
+    return thread
+
+
+def _compile_struct_source(source: str, filename: str) -> CodeType:
+    """ Compiles generated struct source, reusing code loaded from or compiled for an identical source. """
+    code = _code_cache.get(source)
+
+    if code is None:
+        code = compile(source, filename, 'exec')
+        _code_cache[source] = code
+
+    return code
+
+
+def save_struct_cache(path: str) -> int:
+    """ Saves compiled read/write functions of all structs generated so far, returns the number of entries.
+    The file is only valid for the Python version that wrote it.
+
+    Only the compiled code is saved, not the struct classes: StructMeta still builds every struct and specialization
+    on a cold start, loading the cache spares compiling their functions. Use prewarm_templates() in a background
+    thread to take specializations off the first file load.
+    """
+    with _lock:
+        entries = dict(_code_cache)
+
+    with open(path, 'wb') as f:
+        f.write(dumps((implementation.cache_tag, entries)))
+
+    return len(entries)
+
+
+def load_struct_cache(path: str) -> int:
+    """ Loads compiled functions saved by save_struct_cache, so that structs declared afterwards skip compiling their
+    read/write functions, their classes are still built. Returns the number of loaded entries, caches written by a
+    different Python version are ignored.
+    """
+    with open(path, 'rb') as f:
+        cache_tag, entries = loads(f.read())
+
+    if cache_tag != implementation.cache_tag:
+        return 0
+
+    with _lock:
+        _code_cache.update(entries)
+
+    return len(entries)
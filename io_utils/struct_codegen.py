@@ -0,0 +1,205 @@
+from .ctypes import GenericType
+from .array import StructArray, _array_from_bytes, _array_to_bytes, _flatten, _reshape
+from .columns import StructColumns, _column_layout
+from .struct_cache import _compile_struct_source
+
+from struct import Struct
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+def _struct_values(nested: Iterable[Any], depth: int) -> Iterable[Any]:
+    """ Yields flattened pack values of every struct in nested lists of the given depth. """
+    for struct in _flatten(nested, depth):
+        yield from struct._struct_to_values()
+
+
+class _CodeGen:
+    """ Emits the source of specialized read/write functions for a resolved struct class. """
+
+    def __init__(self, cls):
+        self.cls = cls
+        self.namespace: Dict[str, Any] = {
+            '_cls': cls,
+            '_reshape': _reshape,
+            '_flatten': _flatten,
+            '_struct_values': _struct_values,
+            '_array_from_bytes': _array_from_bytes,
+            '_array_to_bytes': _array_to_bytes,
+            '_StructColumns': StructColumns,
+        }
+        self.n_values = 0
+        self.storage_format = ''
+
+    def _ref(self, obj: Any) -> str:
+        """ Exposes an object to the generated code under a unique name. """
+        name = f"_T{len(self.namespace)}"
+        self.namespace[name] = obj
+        return name
+
+    def _is_layout_field(self, attr_name: str) -> bool:
+        annotation_type = self.cls.__annotations__[attr_name]
+        return isinstance(annotation_type, (GenericType, StructArray)) or hasattr(annotation_type, '_struct_n_values')
+
+    def _fields(self) -> Iterable[Tuple[str, Any]]:
+        for attr_name, annotation_type in self.cls.__annotations__.items():
+            if self._is_layout_field(attr_name):
+                yield attr_name, annotation_type
+
+    def generate(self) -> str:
+        assign_lines = []  # (attr_name, expression template using {} for the value index base)
+        pack_exprs = []
+        init_lines = []
+        formats = []
+        defaults = self.cls._struct_defaults
+
+        k = 0
+        for attr_name, annotation_type in self._fields():
+            if isinstance(annotation_type, GenericType):
+                default = defaults.get(attr_name, annotation_type.py_type())
+                init_lines.append(f"    self.{attr_name} = {self._ref(default)}")
+                assign_lines.append((attr_name, f"v[{{}}{k}]"))
+                pack_exprs.append(f"self.{attr_name}")
+                formats.append(annotation_type.format)
+                k += 1
+
+            elif isinstance(annotation_type, StructArray):
+                elem_type, dims = annotation_type._struct_array_shape()
+                n_elements = annotation_type.length()
+
+                if isinstance(elem_type, GenericType):
+                    # plain arrays are packed into a single bytes value and converted in bulk
+                    n_bytes = n_elements * elem_type.size
+                    fmt = elem_type.format
+                    init_lines.append(f"    self.{attr_name} = "
+                                      + ("b''" if fmt == 's' else f"_array_from_bytes({fmt!r}, bytes({n_bytes}), {dims!r})"))
+
+                    if fmt == 's':
+                        assign_lines.append((attr_name, f"v[{{}}{k}]"))
+                        pack_exprs.append(f"self.{attr_name}")
+                    else:
+                        assign_lines.append((attr_name, f"_array_from_bytes({fmt!r}, v[{{}}{k}], {dims!r})"))
+                        pack_exprs.append(f"_array_to_bytes({fmt!r}, self.{attr_name}, {dims!r})")
+
+                    formats.append(f"{n_bytes}s")
+                    k += 1
+
+                elif annotation_type._struct_array_is_columnar:
+                    # validates that the element struct can be stored in columns
+                    _column_layout(elem_type)
+
+                    elem_ref = self._ref(elem_type)
+                    width = elem_type._struct_n_values
+                    init_lines.append(f"    self.{attr_name} = _StructColumns({elem_ref}, {n_elements})")
+                    assign_lines.append((attr_name, f"_StructColumns({elem_ref}, {n_elements})"))
+                    assign_lines.append((None, f"self.{attr_name}._struct_set_values("
+                                               f"v[{{}}{k}:{{}}{k + n_elements * width}])"))
+                    pack_exprs.append(f"*self.{attr_name}._struct_values()")
+                    formats.append(elem_type._struct_storage_format * n_elements)
+                    k += n_elements * width
+
+                else:
+                    elem_ref = self._ref(elem_type)
+                    width = elem_type._struct_n_values
+                    elements = f"[{elem_ref}._struct_from_values(v, {{}}{k} + j * {width}) for j in range({n_elements})]"
+
+                    if len(dims) == 1:
+                        init_lines.append(f"    self.{attr_name} = [{elem_ref}() for _ in range({n_elements})]")
+                        assign_lines.append((attr_name, elements))
+                    else:
+                        init_lines.append(f"    self.{attr_name} = _reshape([{elem_ref}() for _ in range({n_elements})], "
+                                          f"{dims!r})")
+                        assign_lines.append((attr_name, f"_reshape({elements}, {dims!r})"))
+
+                    pack_exprs.append(f"*_struct_values(self.{attr_name}, {len(dims)})")
+                    formats.append(elem_type._struct_storage_format * n_elements)
+                    k += n_elements * width
+
+            else:
+                # nested struct
+                struct_ref = self._ref(annotation_type)
+                init_lines.append(f"    self.{attr_name} = {struct_ref}()")
+                assign_lines.append((attr_name, f"{struct_ref}._struct_from_values(v, {{}}{k})"))
+                pack_exprs.append(f"*self.{attr_name}._struct_to_values()")
+                formats.append(annotation_type._struct_storage_format)
+                k += annotation_type._struct_n_values
+
+        self.n_values = k
+        self.storage_format = ''.join(formats)
+
+        # non-layout fields only get their default values assigned
+        for attr_name, value in defaults.items():
+            if not self._is_layout_field(attr_name):
+                init_lines.append(f"    self.{attr_name} = {self._ref(value)}")
+
+        def body(base: str) -> List[str]:
+            return [f"    {'' if attr_name is None else f'self.{attr_name} = '}"
+                    f"{expr.format(*[base] * expr.count('{}'))}" for attr_name, expr in assign_lines]
+
+        read_body = body('')
+        from_values_body = body('i + ')
+        pack_args = ", ".join(pack_exprs)
+
+        return "\n".join((
+            "def __init__(self):",
+            *(init_lines or ["    pass"]),
+            "",
+            "def read(self, f):",
+            "    v = _unpack(f.read(_size))",
+            *read_body,
+            "    return self",
+            "",
+            "def write(self, f):",
+            f"    f.write(_pack({pack_args}))",
+            "    return self",
+            "",
+            "def unpack_from(buffer, offset=0):",
+            "    v = _unpack_from(buffer, offset)",
+            "    self = _cls.__new__(_cls)",
+            *read_body,
+            "    return self",
+            "",
+            "def _struct_from_values(v, i):",
+            "    self = _cls.__new__(_cls)",
+            *from_values_body,
+            "    return self",
+            "",
+            "def _struct_to_values(self):",
+            f"    return ({pack_args}{',' if pack_exprs else ''})",
+            "",
+        ))
+
+
+def generate_struct_io(cls) -> None:
+    """ Generates and attaches specialized read/write functions to a resolved struct class.
+
+    All fields, including nested structs and arrays, are decoded with a single Struct.unpack call per record
+    and assigned in declaration order. Arrays of plain types are unpacked as one bytes value each and converted
+    in bulk (see io_utils.array._array_from_bytes).
+    """
+    codegen = _CodeGen(cls)
+    source = codegen.generate()
+
+    codec = Struct('<' + codegen.storage_format)
+    namespace = codegen.namespace
+    namespace.update({
+        '_unpack': codec.unpack,
+        '_unpack_from': codec.unpack_from,
+        '_pack': codec.pack,
+        '_size': codec.size,
+    })
+
+    exec(_compile_struct_source(source, f"<struct {cls.__name__}>"), namespace)
+
+    cls._struct_codec = codec
+    cls._struct_n_values = codegen.n_values
+    cls._struct_storage_format = codegen.storage_format
+    cls._struct_source = source
+    # user-defined constructors take precedence
+    if '__init__' not in cls.__dict__:
+        cls.__init__ = namespace['__init__']
+
+    cls.read = namespace['read']
+    cls.write = namespace['write']
+    cls.unpack_from = staticmethod(namespace['unpack_from'])
+    cls._struct_from_values = staticmethod(namespace['_struct_from_values'])
+    cls._struct_to_values = namespace['_struct_to_values']
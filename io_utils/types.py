@@ -1,4 +1,4 @@
-from struct import pack, unpack
+from struct import Struct, pack
 from functools import partial
 from collections.abc import Iterable
 
@@ -48,44 +48,74 @@ class Template(type):
 
 
 class GenericType:
-    __slots__ = ('format', 'size_', 'default_value')
+    __slots__ = ('format', 'size_', 'default_value', '_struct', '_structs')
 
     def __init__(self, format, size, default_value=0):
         self.format = format
         self.size_ = size
         self.default_value = default_value
 
-    def read(self, f, n=1):
+        # precompiled codecs, keyed by element count
+        self._struct = Struct(format)
+        self._structs = {1: self._struct}
+
+    def _get_struct(self, n):
+        # checked before the lookup, 2.0 or True would otherwise find the codec of 2 or 1 once cached
         if type(n) is not int:
             raise TypeError('Length can only be represented by an integer value.')
 
+        try:
+            return self._structs[n]
+        except KeyError:
+            pass
+
         if n <= 0:
             raise TypeError('Length should be an integer value above 0.')
 
-        if n == 1:
-            ret = unpack(self.format, f.read(self.size_))
+        codec = self._structs[n] = Struct(str(n) + self.format)
+        return codec
+
+    def read(self, f, n=1):
+        if n == 1 and type(n) is int:
+            ret = self._struct.unpack(f.read(self.size_))
         else:
-            ret = unpack(str(n) + self.format, f.read(self.size_ * n))
+            ret = self._get_struct(n).unpack(f.read(self.size_ * n))
         return ret[0] if len(ret) == 1 else ret
 
-    def write(self, f, value, n=1):
-        if type(n) is not int:
-            raise TypeError('Length can only be represented by an integer value.')
+    def read_into(self, f, buffer):
+        """ Fill a writable buffer (bytearray, memoryview, array.array) with raw values straight from file. """
+        view = memoryview(buffer).cast('B')
+        n_bytes = f.readinto(view)
 
-        if n <= 0:
-            raise TypeError('Length should be an integer value above 0.')
+        if n_bytes != view.nbytes:
+            raise EOFError('Expected {} bytes, got {}.'.format(view.nbytes, n_bytes))
+
+        return n_bytes // self.size_
+
+    def unpack_from(self, buffer, offset=0, n=1):
+        ret = self._get_struct(n).unpack_from(buffer, offset)
+        return ret[0] if len(ret) == 1 else ret
 
-        if n == 1:
-            if isinstance(value, Iterable):
-                f.write(pack(self.format, *value))
+    def write(self, f, value, n=1):
+        if n == 1 and type(n) is int:
+            if isinstance(value, (int, float)):
+                f.write(self._struct.pack(value))
+            elif isinstance(value, Iterable):
+                f.write(self._struct.pack(*value))
             else:
                 if len(self.format) > 1: # very bad fix
                     for x in value:
                         f.write(pack(self.format[0], x))
                 else:
-                    f.write(pack(self.format, value))
+                    f.write(self._struct.pack(value))
+        else:
+            f.write(self._get_struct(n).pack(*value))
+
+    def pack_into(self, buffer, offset, value, n=1):
+        if isinstance(value, (int, float)):
+            self._struct.pack_into(buffer, offset, value)
         else:
-            f.write(pack(str(n) + self.format, *value))
+            self._get_struct(n).pack_into(buffer, offset, *value)
 
     def __call__(self, *args, **kwargs):
         return self
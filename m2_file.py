@@ -13,6 +13,8 @@ from .file_formats.skin_format import M2SkinProfile, M2SkinSubmesh, M2SkinTextur
 from .file_formats.skel_format import SkelFile
 from .file_formats.anim_format import AnimFile
 from .file_formats.wow_common_types import M2Versions
+from .io_utils.binary_reader import BinaryReader
+from .io_utils.binary_writer import BinaryWriter
 
 
 class M2Dependencies:
@@ -60,7 +62,7 @@ class M2File:
     def read(self):
         self.skins = []
 
-        with open(self.filepath, 'rb') as f:
+        with BinaryReader.from_file(self.filepath) as f:
             magic = f.read(4).decode('utf-8')
 
             if magic == 'MD20':
@@ -238,7 +240,7 @@ class M2File:
         return self.dependencies
 
     @staticmethod
-    def process_anim_file(raw_data : BytesIO, tracks: List[M2Track], real_seq_index: int):
+    def process_anim_file(raw_data : BinaryReader, tracks: List[M2Track], real_seq_index: int):
         
         for track in tracks:
             if track.global_sequence < 0 and track.timestamps.n_elements > real_seq_index:
@@ -337,18 +339,25 @@ class M2File:
                 raw_path = os.path.splitext(filepath)[0]
                 for i, skin in enumerate(self.skins):
                     with open("{}{}.skin".format(raw_path, str(i).zfill(2)), 'wb') as skin_file:
-                        skin.write(skin_file)
+                        skin_writer = BinaryWriter()
+                        skin.write(skin_writer)
+                        skin_writer.write_to(skin_file)
 
-            self.root.write(f)
+            # the model is built in memory and written at once
+            writer = BinaryWriter()
+            self.root.write(writer)
+            writer.resolve_deferred()
 
-            actual_size = os.path.getsize(filepath)
+            actual_size = len(writer)
 
-            f.seek(actual_size)
+            writer.seek(actual_size)
 
             padding_needed = (16 - (actual_size % 16)) % 16
 
             if padding_needed > 0:
-                f.write(b'\x00' * padding_needed)
+                writer.write(b'\x00' * padding_needed)
+
+            writer.write_to(f)
                 
             # TODO: anim, skel and phys
 
@@ -0,0 +1,111 @@
+import os
+import re
+
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from . import WoWVersionManager
+from .adt_file import ADTFile
+
+
+def _init_worker(client_version: int):
+    # workers do not inherit the client version when they are spawned instead of forked
+    WoWVersionManager().set_client_version(client_version)
+
+
+def _process_tile(transform: Callable, path: str, output_path: Optional[str], lazy: bool, highres: bool):
+    adt = ADTFile(path, highres=highres, lazy=lazy)
+    result = transform(adt)
+
+    if output_path:
+        adt.write(output_path, sequential=True)
+
+    return result
+
+
+class MapProcessor:
+    """ Runs a transform over the ADT tiles of a map in worker processes.
+
+    Tiles are found in the map directory by their name, <map>_<x>_<y>.adt. Each job reads a tile, calls transform
+    with the ADTFile and writes the tile to the output directory if any. Only paths and transform results go through
+    the processes, and at most max_pending tiles are in flight, so memory use does not grow with the map size. The
+    transform, and what it returns, must be picklable: use a module-level function.
+
+        def relight(adt):
+            adt.recalculate_normals()
+            return len(adt.mddf.doodad_instances)
+
+        processor = MapProcessor('World/Maps/Northrend', client_version=WoWVersions.WOTLK)
+        for x, y, n_doodads in processor.run(relight, 'export/World/Maps/Northrend'):
+            ...
+    """
+
+    def __init__(self, map_directory: str, map_name: Optional[str] = None, client_version: Optional[int] = None,
+                 max_workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.map_directory = map_directory
+        self.map_name = map_name or os.path.basename(os.path.normpath(map_directory))
+        self.client_version = WoWVersionManager().client_version if client_version is None else client_version
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.max_workers
+
+    def tiles(self) -> List[Tuple[int, int, str]]:
+        """ (x, y, path) of the tiles of the map, by row then column. Split files such as _obj0.adt are left out. """
+        pattern = re.compile(r'{}_(\d+)_(\d+)\.adt'.format(re.escape(self.map_name)), re.IGNORECASE)
+        tiles = []
+
+        for filename in os.listdir(self.map_directory):
+            match = pattern.fullmatch(filename)
+            if match:
+                tiles.append((int(match.group(1)), int(match.group(2)), os.path.join(self.map_directory, filename)))
+
+        tiles.sort(key=lambda tile: (tile[1], tile[0]))
+        return tiles
+
+    def run(self, transform: Callable, output_directory: Optional[str] = None, lazy: bool = False,
+            highres: bool = True, progress: Optional[Callable[[int, int], None]] = None) \
+            -> Iterator[Tuple[int, int, object]]:
+        """ Processes every tile, yielding (x, y, result of transform) as tiles complete, in no particular order.
+
+        Tiles are written to output_directory under their name, or not written without one. lazy and highres are
+        passed to ADTFile. progress is called with the number of tiles done and the total after each tile. An
+        exception raised for a tile is raised here when its result is reached, the remaining tiles are then
+        cancelled, as they are when the iteration is stopped early.
+        """
+        tiles = self.tiles()
+
+        if output_directory:
+            os.makedirs(output_directory, exist_ok=True)
+
+        with ProcessPoolExecutor(self.max_workers, initializer=_init_worker,
+                                 initargs=(self.client_version,)) as executor:
+            queued = iter(tiles)
+            pending = {}
+            n_done = 0
+
+            def submit():
+                for x, y, path in queued:
+                    output_path = os.path.join(output_directory, os.path.basename(path)) if output_directory else None
+                    future = executor.submit(_process_tile, transform, path, output_path, lazy, highres)
+                    pending[future] = x, y
+                    return
+
+            try:
+                for _ in range(self.max_pending):
+                    submit()
+
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        x, y = pending.pop(future)
+                        result = future.result()
+                        n_done += 1
+                        submit()
+
+                        if progress:
+                            progress(n_done, len(tiles))
+
+                        yield x, y, result
+            finally:
+                for future in pending:
+                    future.cancel()
@@ -2,6 +2,7 @@ from io_utils.ctypes import *
 from io_utils.struct import *
 from io_utils.var_type import *
 from io_utils.metaclass_hook import Structs
+from io_utils.conditional import *
 
 
 # Struct module allows you to create data structs declaratively.
@@ -200,21 +201,24 @@ with Structs:
 
 
 
-"""
-class LogicProposal:
-    a: int32
-    _: Conditional(
-          If(lambda ctx: ctx.globals.wow_version >= WoWVersions.WOTLK,
-          {
-              b: int32
-          }),
-          Elif(lambda ctx: ctx.self.a == 1,
-          {
-              b: float32
-          }),
-          Else
-          ({
-              b: double
-          })
-       )
-"""
\ No newline at end of file
+    # Fields can depend on a context, e.g. the client version. Branches are evaluated once per context,
+    # the resolved struct is a regular struct with its own generated read/write functions.
+    class ConditionalStruct:
+        a: int32
+        _: Conditional(
+              If(lambda ctx: ctx.wow_version >= 3,
+              {
+                  'b': int32
+              }),
+              Elif(lambda ctx: ctx.wow_version == 2,
+              {
+                  'b': float32
+              }),
+              Else
+              ({
+                  'b': double
+              })
+           )
+
+    ConditionalStruct_wotlk = ConditionalStruct.in_context(StructContext(wow_version=3))
+    print(ConditionalStruct_wotlk.__name__, ConditionalStruct_wotlk._struct_token_string)
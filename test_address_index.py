@@ -0,0 +1,78 @@
+"""
+Tests for io_utils.address_index.AddressIndex
+Run from project root: python -m pytest test_address_index.py
+"""
+import random
+
+from .io_utils.address_index import AddressIndex
+
+
+def test_shift_matches_linear_update():
+    rng = random.Random(1)
+    index = AddressIndex()
+    expected = {}
+
+    for _ in range(500):
+        address = rng.randrange(100000)
+        expected[index.register(address)] = address
+
+    for step in range(3000):
+        action = rng.random()
+
+        if action < 0.1:
+            address = rng.randrange(100000)
+            expected[index.register(address)] = address
+        elif action < 0.15:
+            slot = rng.choice(list(expected))
+            index.unregister(slot)
+            del expected[slot]
+        elif action < 0.2:
+            slot = rng.choice(list(expected))
+            expected[slot] = rng.randrange(100000)
+            index.set(slot, expected[slot])
+        else:
+            # removals may drop tracked addresses below unmoved ones
+            distance = rng.randrange(-300, 300)
+            after = rng.randrange(100000)
+            index.shift(distance, after)
+
+            for slot, address in expected.items():
+                if address > after:
+                    expected[slot] = address + distance
+
+        if step % 100 == 0:
+            assert all(index.get(slot) == address for slot, address in expected.items())
+
+    index.rebuild()
+    assert len(index) == len(expected)
+    assert all(index.get(slot) == address for slot, address in expected.items())
+
+
+def test_equal_addresses_and_boundary():
+    index = AddressIndex()
+    a, b, c = index.register(10), index.register(10), index.register(20)
+    index.rebuild()
+
+    index.shift(5, 10)
+    assert (index.get(a), index.get(b), index.get(c)) == (10, 10, 25)
+
+    index.shift(-5, 9)
+    assert (index.get(a), index.get(b), index.get(c)) == (5, 5, 20)
+
+
+def test_freed_slots_are_dropped():
+    index = AddressIndex()
+    kept = [index.register(i * 10) for i in range(100)]
+    freed = [index.register(i * 10 + 5) for i in range(100)]
+    index.rebuild()
+
+    # slots are referenced weakly, owners dropping them is enough
+    del freed
+    freed = [index.register(i * 10 + 5) for i in range(100)]
+    del freed
+    assert len(index) == 100
+
+    index.shift(1, 500)
+    index.rebuild()
+    assert len(index._slots) == 100
+    assert [index.get(slot) for slot in kept] == [i * 10 + (i > 50) for i in range(100)]
@@ -0,0 +1,132 @@
+"""
+Tests for the MCAL alpha map codecs
+"""
+from io import BytesIO
+
+import numpy
+import pytest
+
+from .adt_file import ADTFile
+from .enums.adt_enums import ADTAlphaTypes, ADTChunkLayerFlags
+from .file_formats import adt_chunks
+from .file_formats.adt_chunks import MCALLayer, _decode_rle, _encode_rle
+
+
+pytestmark = pytest.mark.usefixtures('wotlk')
+
+
+def alpha_maps():
+    rng = numpy.random.default_rng(0)
+    blob = numpy.zeros((64, 64), dtype=numpy.uint8)
+    blob[20:40, 10:50] = 200
+
+    return [numpy.zeros((64, 64), dtype=numpy.uint8), blob,
+            rng.integers(0, 256, (64, 64), dtype=numpy.uint8),
+            rng.choice(numpy.array([0, 0, 255], dtype=numpy.uint8), (64, 64))]
+
+
+def test_rle_round_trip():
+    for alpha_map in alpha_maps():
+        data = _encode_rle(alpha_map)
+        values, size = _decode_rle(data + b'\xff\x00')
+
+        assert bytes(values) == alpha_map.tobytes() and size == len(data)
+
+        # commands do not span rows
+        pos = n_values = 0
+        while pos < len(data):
+            count = data[pos] & 0x7F
+            assert n_values // 64 == (n_values + count - 1) // 64
+            n_values += count
+            pos += 2 if data[pos] & 0x80 else count + 1
+
+
+def test_lowres_round_trip():
+    packed = bytes(range(256)) * 8
+
+    layer = MCALLayer()
+    layer.read(BytesIO(packed), ADTAlphaTypes.LOWRES)
+    assert layer.alpha_map[0, :4].tolist() == [0, 0, 17, 0] and layer.alpha_map[63, 63] == 255
+
+    f = BytesIO()
+    layer.write(f)
+    assert f.getvalue() == packed
+
+
+def test_compressed_tile_round_trip(tmp_path):
+    maps = alpha_maps()
+    flags = ADTChunkLayerFlags.use_alpha_map | ADTChunkLayerFlags.alpha_map_compressed
+
+    adt = ADTFile()
+    for i in range(4):
+        adt.add_texture_filename('tileset\\{}.blp'.format(i))
+
+    for row in adt.mcnk:
+        for chunk in row:
+            chunk.add_texture_layer(0, 0, 0)
+            for i in range(1, 4):
+                chunk.add_texture_layer(i, flags, 0)
+                chunk.mcal.layers[i - 1].alpha_map[:] = maps[(i + chunk.mcal.address) % 4]
+
+    adt.write(str(tmp_path / 'compressed.adt'))
+    written = [[layer.alpha_map.tolist() for layer in chunk.mcal.layers] for row in adt.mcnk for chunk in row]
+
+    adt = ADTFile(str(tmp_path / 'compressed.adt'))
+    assert all(layer.type == ADTAlphaTypes.HIGHRES_COMPRESSED for layer in adt.mcnk[7][7].mcal.layers)
+    assert [[layer.alpha_map.tolist() for layer in chunk.mcal.layers] for row in adt.mcnk for chunk in row] == written
+
+
+def copy_only_rle(alpha_map):
+    """ Valid encoding other than _encode_rle's, each row copied as is """
+    return b''.join(b'\x40' + row.tobytes() for row in numpy.asarray(alpha_map, dtype=numpy.uint8))
+
+
+def check_alpha_offsets(path, expected):
+    """ Decodes each alpha map at its MCLY offset in MCAL, as the client does """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    adt = ADTFile(path)
+    for (row, col), maps in expected.items():
+        chunk = adt.mcnk[row][col]
+        mcal_data_start = chunk.address + int(chunk.ofs_mcal) + 8
+
+        for layer, alpha_map in zip(chunk.mcly.layers[1:], maps):
+            values, _ = _decode_rle(data[mcal_data_start + int(layer.offset_in_mcal):])
+            assert bytes(values) == alpha_map.tobytes()
+
+
+def test_reencoded_layers_are_laid_out(tmp_path, monkeypatch):
+    maps = alpha_maps()
+    flags = ADTChunkLayerFlags.use_alpha_map | ADTChunkLayerFlags.alpha_map_compressed
+
+    adt = ADTFile()
+    adt.add_texture_filename('tileset\\ground.blp')
+    for row in adt.mcnk:
+        for chunk in row:
+            chunk.add_texture_layer(0, 0, 0)
+    for k, (row, col) in enumerate(((0, 0), (5, 9), (15, 15))):
+        chunk = adt.mcnk[row][col]
+        for i in range(1, 4):
+            chunk.add_texture_layer(0, flags, 0)
+            chunk.mcal.layers[i - 1].alpha_map[:] = maps[(i + k) % 4]
+    expected = {position: [layer.alpha_map.copy() for layer in adt.mcnk[position[0]][position[1]].mcal.layers]
+                for position in ((0, 0), (5, 9), (15, 15))}
+
+    # as written by other tools
+    with monkeypatch.context() as patch:
+        patch.setattr(adt_chunks, '_encode_rle', copy_only_rle)
+        adt.write(str(tmp_path / 'other.adt'), sequential=True)
+    check_alpha_offsets(str(tmp_path / 'other.adt'), expected)
+
+    adt = ADTFile(str(tmp_path / 'other.adt'))
+    assert adt.mcnk[5][9].mcal._laid_out_sizes == [64 * 65] * 3
+    adt.write(str(tmp_path / 'rewritten.adt'))
+    check_alpha_offsets(str(tmp_path / 'rewritten.adt'), expected)
+
+    # edited maps encode to other sizes
+    adt = ADTFile(str(tmp_path / 'rewritten.adt'))
+    adt.mcnk[0][0].mcal.layers[0].alpha_map[:] = maps[2]
+    expected[0, 0][0] = maps[2]
+    adt.write(str(tmp_path / 'edited.adt'))
+    check_alpha_offsets(str(tmp_path / 'edited.adt'), expected)
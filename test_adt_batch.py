@@ -0,0 +1,79 @@
+"""
+Tests for ADTFile.batch(), ADTFile.update_layout() and ADTFile.write_sequential()
+"""
+import pytest
+
+from .adt_file import ADTFile
+from .enums.adt_enums import ADTChunkLayerFlags
+from .conftest import make_tile, edit, content
+
+
+pytestmark = pytest.mark.usefixtures('wotlk')
+
+
+def test_new_file_round_trip(tmp_path):
+    adt = ADTFile(make_tile(str(tmp_path / 'new.adt')))
+
+    assert adt.mcnk[5][7].index_x == 7 and adt.mcnk[5][7].mcvt.height[0] == 87.0
+    assert adt.mcnk[5][5].mcal.layers[0].alpha_map[5][5] == 255 and not adt.mcnk[5][7].mcal.layers
+    assert adt.mtex.filenames.strings == ['tileset\\ground.blp', 'tileset\\grass.blp']
+
+
+def test_batch_matches_immediate_edits(tmp_path):
+    path = make_tile(str(tmp_path / 'tile.adt'))
+
+    immediate = ADTFile(path)
+    edit(immediate)
+    immediate.write(str(tmp_path / 'immediate.adt'))
+
+    batched = ADTFile(path)
+    with batched.batch():
+        with batched.batch():
+            edit(batched)
+
+        # nothing is relocated until the outermost batch exits
+        assert batched._layout_dirty
+
+    assert not batched._layout_dirty
+    batched.write(str(tmp_path / 'batched.adt'))
+
+    assert content(ADTFile(str(tmp_path / 'immediate.adt'))) == content(ADTFile(str(tmp_path / 'batched.adt')))
+
+
+def test_sequential_write_matches_layout(tmp_path):
+    adt = ADTFile(make_tile(str(tmp_path / 'tile.adt')))
+    edit(adt)
+    adt.update_layout()
+
+    adt.write(str(tmp_path / 'laid_out.adt'))
+    adt.write(str(tmp_path / 'sequential.adt'), sequential=True)
+
+    assert (tmp_path / 'laid_out.adt').read_bytes() == (tmp_path / 'sequential.adt').read_bytes()
+
+
+def test_sequential_write_ignores_layout(tmp_path):
+    adt = ADTFile()
+    adt.add_texture_filename('tileset\\ground.blp')
+    adt.add_texture_filename('tileset\\grass.blp')
+    for row in adt.mcnk:
+        for chunk in row:
+            chunk.add_texture_layer(0, 0, 0)
+    adt.mcnk[3][3].add_texture_layer(1, ADTChunkLayerFlags.use_alpha_map, 0)
+    edit(adt)
+
+    # a new file has no layout, writing sequentially does not compute it
+    adt.write(str(tmp_path / 'sequential.adt'), sequential=True)
+    assert adt._layout_dirty
+
+    adt.write(str(tmp_path / 'laid_out.adt'))
+    assert content(ADTFile(str(tmp_path / 'sequential.adt'))) == content(ADTFile(str(tmp_path / 'laid_out.adt')))
+
+
+def test_chunks_outlive_their_file(tmp_path):
+    path = make_tile(str(tmp_path / 'tile.adt'))
+
+    chunk = ADTFile(path).mcnk[3][3]
+    chunk.remove_texture_layer(1)
+    assert len(chunk.mcly.layers) == 1
+
+    assert ADTFile(path).mcnk[1][1].mcly.chunk.index_x == 1
@@ -0,0 +1,151 @@
+"""
+Tests for the filename tables of ADTFile: StringBlock decoding, lookups and offsets, and ADTFile.optimize()
+"""
+from io import BytesIO
+
+import pytest
+
+from .adt_file import ADTFile
+from .file_formats.wow_common_types import StringBlock, decode_strings
+from .file_formats.wmo_format_root import MOTX
+from .conftest import make_tile, edit, content
+
+
+pytestmark = pytest.mark.usefixtures('wotlk')
+
+
+def check_block(block):
+    offsets = [0]
+    for string in block.strings:
+        offsets.append(offsets[-1] + len(string) + 1)
+
+    assert block.get_offsets() == offsets[:-1] and block.size == offsets[-1]
+    assert all(block.index(string) == block.strings.index(string) for string in block.strings)
+
+
+def test_string_block():
+    block = StringBlock()
+    for string in ('a.blp', 'bb.blp', 'a.blp', 'ccc.blp', 'dd.blp'):
+        block._add(string)
+
+    check_block(block)
+    assert block.index('a.blp') == 0 and 'ccc.blp' in block and 'e.blp' not in block
+
+    block._replace(0, 'eeee.blp')
+    check_block(block)
+    assert block.index('a.blp') == 2
+
+    block._remove(1)
+    check_block(block)
+    assert block._remove_many([0, 2]) == [1, 3]
+    check_block(block)
+    assert block.strings == ['a.blp', 'dd.blp']
+
+    with pytest.raises(ValueError):
+        block.index('bb.blp')
+
+    block.strings = ['a', 'bb']
+    check_block(block)
+    assert 'a' in block and block.index('bb') == 1
+
+    block._add('c')
+    check_block(block)
+
+
+def test_read_string_block():
+    data = b'\x00a.blp\x00\x00bb.blp\x00\xe9t\xe9.m2\x00tail'
+    assert decode_strings(data) == (['a.blp', 'bb.blp', '\xe9t\xe9.m2'], [1, 8, 15])
+
+    block = StringBlock(len(data)).read(BytesIO(data))
+    assert block.strings == ['a.blp', 'bb.blp', '\xe9t\xe9.m2'] and block.index('\xe9t\xe9.m2') == 2
+
+    # padding follows each string, outside of the size
+    f = BytesIO(b'a.blp\x00XXbb.blp\x00XX\x00ccc\x00XXnext')
+    block = StringBlock(18, padding=2).read(f)
+    assert block.strings == ['a.blp', 'bb.blp', 'ccc'] and f.read() == b'next'
+
+    motx = MOTX()
+    motx.string_table = bytearray(data)
+    assert motx.get_all_strings() == ['a.blp', 'bb.blp', '\xe9t\xe9.m2']
+
+
+def test_write_undecoded_block():
+    data = b'a.blp\x00bb.blp\x00'
+    block = StringBlock(len(data)).read(BytesIO(data))
+    f = BytesIO()
+    block.write(f)
+    assert f.getvalue() == data and block._data is not None
+
+    # empty strings are dropped
+    block = StringBlock(len(data) + 1).read(BytesIO(b'\x00' + data))
+    f = BytesIO()
+    block.write(f)
+    assert f.getvalue() == data
+
+
+def test_add_existing_filename(tmp_path):
+    adt = ADTFile(make_tile(str(tmp_path / 'tile.adt')))
+    size = adt.mtex.filenames.size
+
+    assert adt.add_texture_filename('tileset\\grass.blp') == 1 and adt.mtex.filenames.size == size
+    assert adt.add_m2_filename('world\\tree.m2') == 0 and len(adt.mmid.offsets) == 1
+
+
+def test_optimize_filenames(tmp_path):
+    adt = ADTFile(make_tile(str(tmp_path / 'tile.adt')))
+    edit(adt)
+    adt.add_texture_filename('tileset\\sand.blp')
+    adt.add_m2_filename('world\\rock.m2')
+    adt.add_wmo_filename('world\\wmo\\tower.wmo')
+
+    # textures and models go to the front, so that the used ones move
+    for row in adt.mcnk:
+        for chunk in row:
+            for layer in chunk.mcly.layers:
+                layer.texture_id = {0: 2, 1: 3}[layer.texture_id]
+    for doodad in adt.mddf.doodad_instances:
+        doodad.name_id = 2
+    adt.modf.wmo_instances[0].name_id = 1
+
+    expected = content(adt)
+    report = adt.optimize()
+
+    assert report.textures == ['tileset\\ground.blp', 'tileset\\grass.blp']
+    assert report.m2s == ['world\\tree.m2', 'world\\bush.m2'] and report.wmos == ['world\\wmo\\house.wmo']
+    assert report.layers == 0 and report.refs == 0
+
+    assert adt.mtex.filenames.strings == ['tileset\\rock.blp', 'tileset\\sand.blp']
+    assert adt.mmdx.filenames.strings == ['world\\rock.m2'] and adt.mwmo.filenames.strings == ['world\\wmo\\tower.wmo']
+    check_block(adt.mtex.filenames)
+
+    adt.write(str(tmp_path / 'pruned.adt'))
+    pruned = ADTFile(str(tmp_path / 'pruned.adt'))
+
+    # the same texture and model names are referenced
+    textures, models, wmos = expected[0], expected[1], expected[2]
+    assert [[textures[texture_id] for texture_id, *_ in chunk[5]] for chunk in expected[7]] == \
+           [[pruned.mtex.filenames[layer.texture_id] for layer in chunk.mcly.layers] for row in pruned.mcnk for chunk in row]
+    assert {models[doodad[0]] for doodad in expected[5]} == \
+           {pruned.mmdx.filenames[doodad.name_id] for doodad in pruned.mddf.doodad_instances}
+    assert [wmos[wmo[0]] for wmo in expected[6]] == [pruned.mwmo.filenames[wmo.name_id] for wmo in pruned.modf.wmo_instances]
+    assert [int(ofs) for ofs in pruned.mmid.offsets] == [0]
+
+
+def test_optimize_layers_and_refs(tmp_path):
+    adt = ADTFile(make_tile(str(tmp_path / 'tile.adt')))
+    adt.mcnk[5][5].mcal.layers[0].alpha_map[:] = 0
+    adt.mcnk[0][1].mcrf.doodad_refs.append(7)
+    adt.update_layout()
+    adt.write(str(tmp_path / 'before.adt'))
+
+    report = adt.optimize()
+    assert (report.layers, report.refs, report.textures, report.m2s) == (1, 1, [], ['world\\tree.m2'])
+
+    adt.write(str(tmp_path / 'after.adt'))
+    assert report.bytes_saved == (tmp_path / 'before.adt').stat().st_size - (tmp_path / 'after.adt').stat().st_size
+
+    optimized = ADTFile(str(tmp_path / 'after.adt'))
+    assert [layer.texture_id for layer in optimized.mcnk[5][5].mcly.layers] == [0]
+    assert not optimized.mcnk[5][5].mcal.layers and len(optimized.mcnk[4][4].mcal.layers) == 1
+    assert optimized.mcnk[0][1].mcrf.doodad_refs == [] and optimized.mcnk[0][1].n_doodad_refs == 0
+    assert adt.optimize() == (0, [], [], [], 0, 0)
@@ -0,0 +1,72 @@
+"""
+Tests for lazily read ADT files, ADTFile(lazy=True)
+"""
+import pytest
+
+from .adt_file import ADTFile
+from .conftest import make_tile, edit, content
+
+
+pytestmark = pytest.mark.usefixtures('wotlk')
+
+
+def test_sub_chunks_decoded_on_access(tmp_path):
+    path = make_tile(str(tmp_path / 'tile.adt'))
+    eager = ADTFile(path)
+    adt = ADTFile(path, lazy=True)
+    chunk = adt.mcnk[5][5]
+
+    assert chunk.index_x == 5 and chunk.mcvt.height[0] == 85.0
+    assert 'mcal' not in vars(chunk) and 'mcly' not in vars(chunk)
+
+    # sub-chunks are decoded independently, MCAL takes the layer flags from the data read
+    assert chunk.mcal.layers[0].alpha_map[5][5] == 255
+    assert 'mcly' not in vars(chunk) and 'mcrf' not in vars(chunk)
+    assert chunk.mcal.address == eager.mcnk[5][5].mcal.address
+
+    assert content(adt) == content(eager)
+
+
+def test_untouched_chunks_written_as_read(tmp_path):
+    path = make_tile(str(tmp_path / 'tile.adt'))
+
+    adt = ADTFile(path, lazy=True)
+    adt.write(str(tmp_path / 'lazy.adt'))
+    adt.write(str(tmp_path / 'sequential.adt'), sequential=True)
+
+    original = (tmp_path / 'tile.adt').read_bytes()
+    assert (tmp_path / 'lazy.adt').read_bytes() == original
+    assert (tmp_path / 'sequential.adt').read_bytes() == original
+
+    # heights and normals are written from the tile-wide arrays
+    adt.heights[17] += 1.0
+    adt.normals[17] = (0, 0, 127)
+    adt.write(str(tmp_path / 'lazy.adt'))
+
+    eager = ADTFile(path)
+    eager.heights[17] += 1.0
+    eager.normals[17] = (0, 0, 127)
+    eager.write(str(tmp_path / 'eager.adt'))
+
+    assert (tmp_path / 'lazy.adt').read_bytes() == (tmp_path / 'eager.adt').read_bytes()
+
+
+def test_edits_match_eager_read(tmp_path):
+    path = make_tile(str(tmp_path / 'tile.adt'))
+
+    eager = ADTFile(path)
+    edit(eager)
+    eager.write(str(tmp_path / 'eager.adt'))
+
+    adt = ADTFile(path, lazy=True)
+    edit(adt)
+    adt.write(str(tmp_path / 'lazy.adt'))
+
+    assert (tmp_path / 'lazy.adt').read_bytes() == (tmp_path / 'eager.adt').read_bytes()
+
+    batched = ADTFile(path, lazy=True)
+    with batched.batch():
+        edit(batched)
+    batched.write(str(tmp_path / 'batched.adt'), sequential=True)
+
+    assert content(ADTFile(str(tmp_path / 'batched.adt'))) == content(ADTFile(str(tmp_path / 'eager.adt')))
@@ -0,0 +1,180 @@
+"""
+Tests for the ADT placement index: range queries over MDDF/MODF and removal of instances
+"""
+import random
+
+import pytest
+
+from .adt_file import ADTFile
+from .adt_placement_index import PlacementIndex
+from .file_formats.adt_chunks import TILE_SIZE, CHUNK_SIZE
+
+
+pytestmark = pytest.mark.usefixtures('wotlk')
+
+
+def make_placements(n_doodads=300, n_wmos=40):
+    rng = random.Random(0)
+    adt = ADTFile()
+    adt.add_m2_filename('world\\tree.m2')
+    adt.add_wmo_filename('world\\wmo\\house.wmo')
+
+    for i in range(n_doodads):
+        chunks = {(rng.randrange(16), rng.randrange(16)) for _ in range(rng.randint(1, 3))}
+        position = (rng.uniform(0, 533), rng.uniform(-50, 50), rng.uniform(0, 533))
+        adt.add_m2_instance(sorted(chunks), 0, i, position, (0, 0, 0), 1024, 0)
+
+    for i in range(n_wmos):
+        chunks = {(rng.randrange(16), rng.randrange(16)) for _ in range(rng.randint(1, 3))}
+        x, z = rng.uniform(0, 533), rng.uniform(0, 533)
+        # one of them spans the whole tile, as large WMOs do
+        size = 2000.0 if i == 7 else rng.uniform(1, 80)
+        extents = ((x - size, -10.0, z - size), (x + size, rng.uniform(0, 40), z + size))
+        adt.add_wmo_instance(sorted(chunks), 0, 1000 + i, (x, 0, z), (0, 0, 0), extents, 0, 0, 0, 1024)
+
+    return adt
+
+
+def chunk_refs(adt):
+    return [(chunk.mcrf.doodad_refs, chunk.mcrf.object_refs, chunk.n_doodad_refs, chunk.n_map_obj_refs)
+            for row in adt.mcnk for chunk in row]
+
+
+def test_queries_match_brute_force():
+    adt = make_placements()
+    rng = random.Random(1)
+    doodads, wmos = adt.mddf.doodad_instances, adt.modf.wmo_instances
+
+    for _ in range(50):
+        box_min = (rng.uniform(-100, 500), rng.uniform(-60, 40), rng.uniform(-100, 500))
+        box_max = tuple(low + rng.uniform(0, 200) for low in box_min)
+
+        assert adt.get_m2_instances_in_box(box_min, box_max) == \
+               [i for i, doodad in enumerate(doodads)
+                if all(low <= value <= high for value, low, high in zip(doodad.position._get_values(), box_min, box_max))]
+        assert adt.get_wmo_instances_in_box(box_min, box_max) == \
+               [i for i, wmo in enumerate(wmos)
+                if all(wmo.extents.min[k] <= box_max[k] and wmo.extents.max[k] >= box_min[k] for k in range(3))]
+
+        center, radius = box_min, rng.uniform(0, 150)
+        assert adt.get_m2_instances_in_radius(center, radius) == \
+               [i for i, doodad in enumerate(doodads)
+                if sum((a - b) ** 2 for a, b in zip(doodad.position._get_values(), center)) <= radius ** 2]
+        assert adt.get_wmo_instances_in_radius(center, radius) == \
+               [i for i, wmo in enumerate(wmos)
+                if sum(max(low - value, 0, value - high) ** 2
+                       for value, low, high in zip(center, wmo.extents.min, wmo.extents.max)) <= radius ** 2]
+
+    assert 7 in adt.get_wmo_instances_in_box((0, 0, 0), (1, 1, 1))
+
+
+def test_remove_updates_references(tmp_path):
+    adt = make_placements()
+    rng = random.Random(2)
+
+    # expected references, by unique id of the instances
+    doodad_chunks = {doodad.unique_id: adt.get_m2_instance_chunks(i) for i, doodad in enumerate(adt.mddf.doodad_instances)}
+    wmo_chunks = {wmo.unique_id: adt.get_wmo_instance_chunks(i) for i, wmo in enumerate(adt.modf.wmo_instances)}
+
+    for _ in range(100):
+        adt.remove_m2_instance(rng.randrange(len(adt.mddf.doodad_instances)))
+    for _ in range(10):
+        adt.remove_wmo_instance(rng.randrange(len(adt.modf.wmo_instances)))
+    adt.remove_m2_instance(len(adt.mddf.doodad_instances) - 1)
+
+    edited = chunk_refs(adt)
+    adt.update_placement_index()
+
+    for i, doodad in enumerate(adt.mddf.doodad_instances):
+        assert adt.get_m2_instance_chunks(i) == doodad_chunks[doodad.unique_id]
+    for i, wmo in enumerate(adt.modf.wmo_instances):
+        assert adt.get_wmo_instance_chunks(i) == wmo_chunks[wmo.unique_id]
+
+    adt.write(str(tmp_path / 'placements.adt'))
+    assert chunk_refs(ADTFile(str(tmp_path / 'placements.adt'))) == edited
+
+
+def test_remove_moves_last_placement_refs():
+    adt = make_placements()
+
+    for instances, refs_of, remove, get_index in (
+            (adt.mddf.doodad_instances, lambda chunk: chunk.mcrf.doodad_refs, adt.remove_m2_instance,
+             adt._get_doodad_index),
+            (adt.modf.wmo_instances, lambda chunk: chunk.mcrf.object_refs, adt.remove_wmo_instance,
+             adt._get_wmo_index)):
+        last = len(instances) - 1
+        moved_id, moved_chunks = instances[last].unique_id, set(get_index().get_chunks(last))
+        remove(5)
+
+        # the last placement takes the removed index in MDDF/MODF and in every chunk referencing it
+        assert len(instances) == last and instances[5].unique_id == moved_id
+        assert get_index().get_chunks(5) == moved_chunks
+        for i, chunk in enumerate(chunk for row in adt.mcnk for chunk in row):
+            refs = list(refs_of(chunk))
+            assert last not in refs
+            assert (5 in refs) == (i in moved_chunks)
+
+
+def test_index_moves_last_placement():
+    index = PlacementIndex(cell_size=10.0)
+    for i in range(4):
+        index.append((i * 10.0, 0.0, i * 10.0 + 5.0, 5.0), [i])
+
+    index.remove(1)
+    assert len(index) == 3
+    assert index.query(30.0, 0.0, 31.0, 1.0) == {1} and index.get_chunks(1) == {3}
+    assert index.query(10.0, 0.0, 15.0, 5.0) == set()
+
+
+def tile_position(row, col, x=5.0, z=5.0, tile_x=30, tile_y=40):
+    """ Placement coordinates at (x, z) yards within chunk (row, col) of tile (tile_x, tile_y) """
+    return tile_x * TILE_SIZE + col * CHUNK_SIZE + x, 100.0, tile_y * TILE_SIZE + row * CHUNK_SIZE + z
+
+
+def test_covering_chunks():
+    adt = ADTFile()
+    adt.add_m2_filename('world\\tree.m2')
+    adt.add_wmo_filename('world\\wmo\\house.wmo')
+
+    adt.add_m2_instance(None, 0, 0, tile_position(3, 4), (0, 0, 0), 1024, 0)
+    # a radius of 10 yards at scale 1024, 20 at 2048
+    adt.add_m2_instance(None, 0, 1, tile_position(3, 4), (0, 0, 0), 2048, 0, radius=10.0)
+    # clipped to the tile
+    adt.add_m2_instance(None, 0, 2, tile_position(15, 0, x=1.0), (0, 0, 0), 1024, 0, radius=40.0)
+
+    x, y, z = tile_position(7, 7, x=30.0, z=20.0)
+    adt.add_wmo_instance(None, 0, 3, (x, y, z), (0, 0, 0), ((x - 5, 0, z - 30), (x + 5, 200, z + 5)), 0, 0, 0, 1024)
+
+    assert adt.get_m2_instance_chunks(0) == [(3, 4)]
+    assert adt.get_m2_instance_chunks(1) == [(row, col) for row in (2, 3) for col in (3, 4)]
+    assert adt.get_m2_instance_chunks(2) == [(row, col) for row in (13, 14, 15) for col in (0, 1)]
+    assert adt.get_wmo_instance_chunks(0) == [(6, 7), (6, 8), (7, 7), (7, 8)]
+
+    rows_cols = ADTFile.get_covering_chunks([(0.0, 0.0, 40.0, 1.0), (610.0, 610.0, 611.0, 611.0)],
+                                            [(1.0, 0.5), (610.5, 610.5)])
+    assert rows_cols.tolist() == [[0, 0, 0], [0, 0, 1], [1, 2, 2]]
+
+
+def test_batched_placements_are_assigned_and_sorted():
+    rng = random.Random(3)
+    placements = [(tile_position(rng.randrange(16), rng.randrange(16), rng.uniform(0, 33), rng.uniform(0, 33)),
+                   rng.choice((512, 1024, 2048)), rng.uniform(0, 20)) for _ in range(500)]
+
+    immediate = ADTFile()
+    for i, (position, scale, radius) in enumerate(placements):
+        immediate.add_m2_instance(None, 0, i, position, (0, 0, 0), scale, 0, radius=radius)
+
+    batched = ADTFile()
+    with batched.batch():
+        for i, (position, scale, radius) in enumerate(placements):
+            batched.add_m2_instance(None, 0, i, position, (0, 0, 0), scale, 0, radius=radius)
+
+        assert not any(chunk.mcrf.doodad_refs for row in batched.mcnk for chunk in row)
+
+    assert chunk_refs(batched) == chunk_refs(immediate)
+
+    doodads = batched.mddf.doodad_instances
+    for row in batched.mcnk:
+        for chunk in row:
+            scales = [doodads[ref].scale for ref in chunk.mcrf.doodad_refs]
+            assert scales == sorted(scales, reverse=True)
@@ -0,0 +1,46 @@
+"""
+Tests for ADTFile.scan()
+"""
+import pytest
+
+from .adt_file import ADTFile
+from .conftest import make_tile, edit
+
+
+pytestmark = pytest.mark.usefixtures('wotlk')
+
+
+def test_scan_matches_read(tmp_path):
+    adt = ADTFile(make_tile(str(tmp_path / 'tile.adt')))
+    edit(adt)
+    adt.mcnk[4][2].area_id = 42
+    adt.write(str(tmp_path / 'edited.adt'))
+
+    adt = ADTFile(str(tmp_path / 'edited.adt'))
+    scan = ADTFile.scan(str(tmp_path / 'edited.adt'), ADTFile.scan_chunk_names)
+
+    assert scan['MHDR']['mddf'] == int(adt.mhdr.ofs_mddf) and scan['MHDR']['flags'] == adt.mhdr.flags
+    assert scan['MCIN'][17][:2] == (int(adt.mcin.entries[17].offset), adt.mcin.entries[17].size)
+    assert scan['MTEX'] == adt.mtex.filenames.strings
+    assert scan['MMDX'] == adt.mmdx.filenames.strings and scan['MWMO'] == adt.mwmo.filenames.strings
+    assert scan['MMID'] == [int(ofs) for ofs in adt.mmid.offsets]
+    assert scan['MWID'] == [int(ofs) for ofs in adt.mwid.offsets]
+    assert [doodad._get_values() for doodad in scan['MDDF']] == \
+           [doodad._get_values() for doodad in adt.mddf.doodad_instances]
+    assert [wmo._get_values() for wmo in scan['MODF']] == [wmo._get_values() for wmo in adt.modf.wmo_instances]
+
+    headers = scan['MCNK']
+    assert headers[4 * 16 + 2]['area_id'] == 42
+    assert [(header['index_x'], header['n_layers'], header['n_doodad_refs']) for header in headers] == \
+           [(chunk.index_x, chunk.n_layers, chunk.n_doodad_refs) for row in adt.mcnk for chunk in row]
+
+
+def test_scan_only_requested_chunks(tmp_path):
+    path = make_tile(str(tmp_path / 'tile.adt'))
+
+    assert ADTFile.scan(path) == {'MTEX': ['tileset\\ground.blp', 'tileset\\grass.blp'],
+                                  'MMDX': ['world\\tree.m2'], 'MWMO': []}
+    assert list(ADTFile.scan(path, {'MDDF'})) == ['MDDF']
+
+    with pytest.raises(ValueError):
+        ADTFile.scan(path, {'MTEX', 'MCLY'})
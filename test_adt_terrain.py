@@ -0,0 +1,91 @@
+"""
+Tests for the tile-wide ADT terrain arrays, ADTFile.heights and ADTFile.normals, and ADTFile.recalculate_normals()
+"""
+import numpy
+import pytest
+
+from .adt_file import ADTFile, _OUTER_VERTICES, _INNER_VERTICES, _UNIT_SIZE
+
+
+pytestmark = pytest.mark.usefixtures('wotlk')
+
+
+def make_terrain(height, tile_row=0, tile_col=0):
+    """ Tile with absolute heights given by height(row, column), both in yards from the map corner """
+    rows, cols = numpy.empty(145), numpy.empty(145)
+    rows[_OUTER_VERTICES], cols[_OUTER_VERTICES] = numpy.divmod(numpy.arange(81), 9)
+    rows[_INNER_VERTICES], cols[_INNER_VERTICES] = numpy.divmod(numpy.arange(64), 8)
+    rows[_INNER_VERTICES] += 0.5
+    cols[_INNER_VERTICES] += 0.5
+
+    adt = ADTFile()
+    for row in range(16):
+        for col in range(16):
+            # heights are relative to the chunk position
+            adt.mcnk[row][col].position.z = 10.0 * row - col
+            adt.heights[row * 16 + col] = height((tile_row * 128 + row * 8 + rows) * _UNIT_SIZE,
+                                                 (tile_col * 128 + col * 8 + cols) * _UNIT_SIZE) - (10.0 * row - col)
+
+    return adt
+
+
+def outer_normals(adt):
+    """ Normals of the outer vertices as a (16, 16, 9, 9, 3) array """
+    return adt.normals.reshape(16, 16, 145, 3)[:, :, _OUTER_VERTICES].reshape(16, 16, 9, 9, 3)
+
+
+def test_chunks_share_tile_arrays():
+    adt = ADTFile()
+    chunk = adt.mcnk[2][5]
+
+    adt.heights[2 * 16 + 5] += 10.0
+    assert chunk.mcvt.height[0] == 10.0
+
+    chunk.mcvt.height = [float(i) for i in range(145)]
+    chunk.mcnr.normals = [(1, 2, 127)] * 145
+    assert adt.heights[37, 144] == 144.0
+    assert adt.normals[37].tolist() == [[1, 2, 127]] * 145
+
+    with pytest.raises(ValueError):
+        chunk.mcvt.height = [0.0] * 144
+
+
+def test_tile_arrays_round_trip(tmp_path):
+    rng = numpy.random.default_rng(0)
+    heights = rng.uniform(-500, 500, (256, 145)).astype('<f4')
+    normals = rng.integers(-127, 128, (256, 145, 3)).astype('i1')
+
+    adt = ADTFile()
+    adt.heights[:] = heights
+    adt.normals[:] = normals
+    adt.write(str(tmp_path / 'terrain.adt'))
+
+    adt = ADTFile(str(tmp_path / 'terrain.adt'))
+    assert numpy.array_equal(adt.heights, heights)
+    assert numpy.array_equal(adt.normals, normals)
+    assert numpy.array_equal(adt.mcnk[15][15].mcvt.height, heights[255])
+
+
+def test_plane_normals():
+    adt = make_terrain(lambda row, col: 0.3 * row - 0.2 * col)
+    adt.recalculate_normals()
+
+    # rising along rows and falling along columns, towards -X and +Y, the normal leans towards +X and -Y
+    normal = numpy.array([0.3, -0.2, 1.0]) / numpy.linalg.norm([0.3, -0.2, 1.0]) * 127
+    assert numpy.array_equal(adt.normals, numpy.broadcast_to(numpy.rint(normal), (256, 145, 3)))
+
+
+def test_normals_match_across_borders():
+    def height(row, col):
+        return 20 * numpy.sin(row / 30) * numpy.cos(col / 45)
+
+    west, east = make_terrain(height), make_terrain(height, tile_col=1)
+    west.recalculate_normals()
+
+    normals = outer_normals(west)
+    assert numpy.array_equal(normals[:, 4, :, 8], normals[:, 5, :, 0])
+    assert numpy.array_equal(normals[7, :, 8], normals[8, :, 0])
+
+    west.recalculate_normals({(0, 1): east})
+    east.recalculate_normals({(0, -1): west})
+    assert numpy.array_equal(outer_normals(west)[:, 15, :, 8], outer_normals(east)[:, 0, :, 0])
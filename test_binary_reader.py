@@ -0,0 +1,65 @@
+"""
+Tests for io_utils.binary_reader.BinaryReader
+Run from project root: python -m pytest test_binary_reader.py
+"""
+from io import SEEK_END
+from struct import Struct, pack
+
+from .io_utils.binary_reader import BinaryReader
+from .io_utils.types import uint16, uint32, float32
+from .file_formats.wow_common_types import C3Vector, M2RawChunk
+
+
+def test_file_interface():
+    f = BinaryReader(pack('<IHf', 7, 3, 0.5))
+
+    assert uint32.read(f) == 7
+    assert f.tell() == 4
+    assert uint16.read(f) == 3 and float32.read(f) == 0.5
+    assert f.read(4) == b''
+
+    f.seek(-4, SEEK_END)
+    assert float32.read(f) == 0.5
+
+    f.seek(0)
+    assert f.unpack(Struct('<I')) == (7,) and f.tell() == 4
+    assert f.unpack_from(Struct('<H'), 4) == (3,) and f.tell() == 4
+
+
+def test_sub_reader_shares_memory():
+    data = bytearray(pack('<4I', 1, 2, 3, 4))
+    f = BinaryReader(data)
+    f.seek(4)
+
+    sub = BinaryReader.from_stream(f, 8)
+    assert f.tell() == 12
+    assert uint32.read(sub) == 2
+
+    data[8] = 9
+    assert uint32.read(sub) == 9
+
+
+def test_read_into_and_structs():
+    f = BinaryReader(pack('<6f', *range(6)))
+    vectors = C3Vector.read_array(f, 2)
+    assert vectors[1].z == 5.0
+
+    f.seek(0)
+    buffer = bytearray(8)
+    assert f.readinto(buffer) == 8 and buffer == pack('<2f', 0, 1)
+
+
+def test_mapped_file(tmp_path):
+    path = tmp_path / 'chunk.bin'
+    path.write_bytes(pack('<I', 4) + b'data')
+
+    with BinaryReader.from_file(str(path)) as f:
+        chunk = M2RawChunk().read(f)
+
+    # the raw chunk data outlives the mapping's reader
+    assert chunk.size == 4 and chunk.raw_data.read() == b'data'
+
+    empty = tmp_path / 'empty.bin'
+    empty.write_bytes(b'')
+    with BinaryReader.from_file(str(empty)) as f:
+        assert f.read() == b''
@@ -0,0 +1,66 @@
+"""
+Tests for io_utils.binary_writer.BinaryWriter
+Run from project root: python -m pytest test_binary_writer.py
+"""
+from io import BytesIO
+from struct import pack, unpack_from
+
+from .io_utils.binary_reader import BinaryReader
+from .io_utils.binary_writer import BinaryWriter
+from .io_utils.types import uint32
+from .file_formats.wow_common_types import M2Array, C3Vector
+from .file_formats.m2_format import M2String
+
+
+def test_file_interface():
+    f = BinaryWriter()
+    uint32.write(f, 1)
+    f.seek(12)
+    uint32.write(f, 2)
+    f.seek(4)
+    uint32.write(f, 3)
+
+    assert f.tell() == 8
+    assert f.getvalue() == pack('<4I', 1, 3, 0, 2)
+
+    out = BytesIO()
+    assert f.write_to(out) == 16 and out.getvalue() == f.getvalue()
+
+
+def test_deferred_offsets_are_patched():
+    f = BinaryWriter()
+    uint32.write(f, 7)
+    f.write_deferred(b'abc')
+    f.write_deferred(lambda w: w.write_deferred(b'nested'))
+
+    data = f.getvalue()
+    ofs_a, ofs_b = unpack_from('<2I', data, 4)
+    assert ofs_a == 16 and data[ofs_a:ofs_a + 3] == b'abc'
+    assert ofs_b == 32
+
+    ofs_nested = unpack_from('<I', data, ofs_b)[0]
+    assert ofs_nested == 48 and data[ofs_nested:] == b'nested'
+
+
+def test_m2_arrays_roundtrip():
+    names = M2Array(M2String)
+    for value in ('first', 'second'):
+        names.new().value = value
+
+    vectors = M2Array(C3Vector)
+    vectors.extend([C3Vector((1.0, 2.0, 3.0)), C3Vector((4.0, 5.0, 6.0))])
+
+    empty = M2Array(uint32)
+
+    f = BinaryWriter()
+    names.write(f)
+    vectors.write(f)
+    empty.write(f)
+
+    data = f.getvalue()
+    assert unpack_from('<2I', data, 16) == (0, 0)
+
+    f = BinaryReader(data)
+    assert [name.value for name in M2Array(M2String).read(f)] == ['first', 'second']
+    assert M2Array(C3Vector).read(f)[1].y == 5.0
+    assert M2Array(uint32).read(f).values == []
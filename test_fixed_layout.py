@@ -0,0 +1,81 @@
+"""
+Tests for batch decoding of fixed-layout records
+Run from project root: python -m pytest test_fixed_layout.py
+"""
+from io import BytesIO
+from struct import pack
+
+from .file_formats.wow_common_types import C3Vector, CAaBox, C4Plane
+from .file_formats.adt_chunks import ADTDoodadDefinition, ADTWMODefinition, SMLiquidInstance, MCLQVertex
+from .file_formats.wmo_format_root import MODD, DoodadDefinition
+
+
+def test_single_record_roundtrip():
+    data = pack('<3f', 1.0, 2.0, 3.0)
+    vector = C3Vector().read(BytesIO(data))
+    assert (vector.x, vector.y, vector.z) == (1.0, 2.0, 3.0)
+
+    f = BytesIO()
+    vector.write(f)
+    assert f.getvalue() == data
+
+    box = CAaBox().read(BytesIO(pack('<6f', 1, 2, 3, 4, 5, 6)))
+    assert box.min == (1.0, 2.0, 3.0) and box.max == (4.0, 5.0, 6.0)
+
+    plane = C4Plane().read(BytesIO(pack('<4f', 0, 0, 1, 5)))
+    assert plane.normal == (0.0, 0.0, 1.0) and plane.distance == 5.0
+
+
+def test_doodad_definition_array():
+    records = [pack('<2I6f2H', i, 1000 + i, i, i + 1, i + 2, 0, 90, 0, 1024, 0) for i in range(100)]
+    data = b''.join(records)
+
+    doodads = ADTDoodadDefinition.read_array(BytesIO(data), 100)
+    assert len(doodads) == 100
+    assert doodads[42].name_id == 42 and doodads[42].unique_id == 1042
+    assert doodads[42].position.z == 44.0 and doodads[42].scale == 1024
+
+    f = BytesIO()
+    ADTDoodadDefinition.write_array(f, doodads)
+    assert f.getvalue() == data
+
+    # records created through the constructor encode the same way
+    f = BytesIO()
+    ADTDoodadDefinition(1, 1001, C3Vector((1, 2, 3)), C3Vector((0, 90, 0)), 1024, 0).write(f)
+    assert f.getvalue() == records[1]
+
+
+def test_wmo_definition_array():
+    data = pack('<2I12f4H', 3, 7, *range(12), 1, 2, 3, 1024) * 3
+    wmos = ADTWMODefinition.read_array(BytesIO(data), 3)
+    assert wmos[2].extents.min == (6.0, 7.0, 8.0) and wmos[2].scale == 1024
+
+    f = BytesIO()
+    ADTWMODefinition.write_array(f, wmos)
+    assert f.getvalue() == data
+
+
+def test_liquid_records():
+    data = pack('<2H2f4B2I', 2, 0, 1.0, 5.0, 0, 0, 8, 8, 0, 0)
+    instance, = SMLiquidInstance.read_array(BytesIO(data), 1)
+    assert instance.liquid_type == 2 and instance.max_height_level == 5.0 and instance.width == 8
+
+    vertices = MCLQVertex.read_array(BytesIO(pack('<162f', *range(162))), 81)
+    assert vertices[80].liquid_height == 160.0 and vertices[80].liquid_height_2 == 161.0
+
+    assert SMLiquidInstance.read_array(BytesIO(), 0) == []
+
+
+def test_array_chunk_uses_batch_decoding():
+    data = pack('<I3f4ff4B', (1 << 24) | 12, 1, 2, 3, 0, 0, 0, 1, 1.5, 255, 128, 0, 255) * 4
+
+    chunk = MODD()
+    chunk.size = len(data)
+    chunk._read_content(BytesIO(data))
+    assert len(chunk.definitions) == 4
+    assert chunk.definitions[3].name_ofs == 12 and chunk.definitions[3].flags == 1
+    assert chunk.definitions[3].color == (255, 128, 0, 255)
+
+    f = BytesIO()
+    chunk.write(f)
+    assert f.getvalue()[8:] == data
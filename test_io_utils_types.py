@@ -0,0 +1,74 @@
+"""
+Tests for the precompiled codecs of io_utils.types.GenericType
+Run from project root: python -m pytest test_io_utils_types.py
+"""
+from array import array
+from io import BytesIO
+from struct import pack
+
+import pytest
+
+from .io_utils.types import uint8, uint16, uint32, float32, vec3D
+
+
+def test_read_write_roundtrip():
+    f = BytesIO()
+    uint32.write(f, 0xDEADBEEF)
+    float32.write(f, 1.5)
+    uint16.write(f, (1, 2, 3), 3)
+    vec3D.write(f, (1.0, 2.0, 3.0))
+
+    f.seek(0)
+    assert uint32.read(f) == 0xDEADBEEF
+    assert float32.read(f) == 1.5
+    assert uint16.read(f, 3) == (1, 2, 3)
+    assert vec3D.read(f) == (1.0, 2.0, 3.0)
+
+
+def test_codecs_are_cached():
+    f = BytesIO(pack('4I', 1, 2, 3, 4) * 2)
+    uint32.read(f, 4)
+    codec = uint32._structs[4]
+    uint32.read(f, 4)
+    assert uint32._structs[4] is codec
+
+
+def test_invalid_length():
+    f = BytesIO(b'\0' * 16)
+
+    with pytest.raises(TypeError):
+        uint32.read(f, 0)
+
+    with pytest.raises(TypeError):
+        uint32.read(f, '2')
+
+    # whether or not the codec of the matching int is cached
+    uint32.read(BytesIO(b'\0' * 8), 2)
+    for n in (2.0, True, 1.0):
+        with pytest.raises(TypeError):
+            uint32.read(f, n)
+        with pytest.raises(TypeError):
+            uint32.unpack_from(bytes(16), 0, n)
+
+
+def test_buffer_variants():
+    data = bytearray(pack('I4f', 7, 1.0, 2.0, 3.0, 4.0))
+    view = memoryview(data)
+
+    assert uint32.unpack_from(view) == 7
+    assert float32.unpack_from(view, 4, 4) == (1.0, 2.0, 3.0, 4.0)
+
+    float32.pack_into(data, 4, 9.0)
+    uint8.pack_into(data, 0, (1, 2), 2)
+    assert float32.unpack_from(data, 4) == 9.0
+    assert uint8.unpack_from(data, 0, 2) == (1, 2)
+
+
+def test_read_into():
+    f = BytesIO(pack('4f', 1.0, 2.0, 3.0, 4.0))
+    out = array('f', bytes(16))
+    assert float32.read_into(f, out) == 4
+    assert out.tolist() == [1.0, 2.0, 3.0, 4.0]
+
+    with pytest.raises(EOFError):
+        float32.read_into(f, out)
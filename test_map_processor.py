@@ -0,0 +1,64 @@
+"""
+Tests for MapProcessor
+"""
+import shutil
+
+import pytest
+
+from . import WoWVersionManager, WoWVersions
+from .adt_file import ADTFile
+from .map_processor import MapProcessor
+from .conftest import make_tile
+
+
+pytestmark = pytest.mark.usefixtures('wotlk')
+
+
+def set_area(adt):
+    # the workers have the client version of the processor
+    assert WoWVersionManager().client_version == WoWVersions.WOTLK
+
+    for row in adt.mcnk:
+        for chunk in row:
+            chunk.area_id = 7
+
+    return adt.mtex.filenames.strings
+
+
+def make_map(tmp_path):
+    directory = tmp_path / 'Azeroth'
+    directory.mkdir()
+    tile = make_tile(str(tmp_path / 'tile.adt'))
+
+    for name in ('Azeroth_32_48.adt', 'Azeroth_33_48.adt', 'azeroth_32_49.adt', 'Azeroth_32_48_obj0.adt',
+                 'Kalimdor_32_48.adt'):
+        shutil.copy(tile, str(directory / name))
+
+    return str(directory)
+
+
+def test_tiles(tmp_path):
+    processor = MapProcessor(make_map(tmp_path))
+
+    assert processor.map_name == 'Azeroth'
+    assert [tile[:2] for tile in processor.tiles()] == [(32, 48), (33, 48), (32, 49)]
+
+
+def test_run(tmp_path):
+    processor = MapProcessor(make_map(tmp_path), client_version=WoWVersions.WOTLK, max_workers=2, max_pending=2)
+    progress = []
+
+    # the version of the processor is used, not that of the caller
+    WoWVersionManager().set_client_version(WoWVersions.CLASSIC)
+    results = list(processor.run(set_area, str(tmp_path / 'out'), lazy=True,
+                                 progress=lambda done, total: progress.append((done, total))))
+    WoWVersionManager().set_client_version(WoWVersions.WOTLK)
+
+    assert sorted((x, y) for x, y, _ in results) == [(32, 48), (32, 49), (33, 48)]
+    assert all(result == ['tileset\\ground.blp', 'tileset\\grass.blp'] for _, _, result in results)
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+
+    assert sorted(path.name for path in (tmp_path / 'out').iterdir()) == \
+           ['Azeroth_32_48.adt', 'Azeroth_33_48.adt', 'azeroth_32_49.adt']
+    assert ADTFile(str(tmp_path / 'out' / 'azeroth_32_49.adt')).mcnk[9][4].area_id == 7
+    assert ADTFile(str(tmp_path / 'Azeroth' / 'azeroth_32_49.adt')).mcnk[9][4].area_id != 7
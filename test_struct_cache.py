@@ -0,0 +1,71 @@
+"""
+Tests for template specialization cache statistics, pre-warming and the compiled struct cache
+Run from project root: python -m pytest test_struct_cache.py
+"""
+from io import BytesIO
+from struct import pack
+
+from .io_utils.ctypes import *
+from .io_utils.struct import *
+from .io_utils.var_type import VarType
+from .io_utils.metaclass_hook import Structs
+from .io_utils import struct_cache
+from .io_utils.struct_cache import template_cache_info, reset_template_cache_stats, prewarm_templates, \
+    save_struct_cache, load_struct_cache
+
+
+T = VarType('T')
+Tx = VarType('Tx')
+
+with Structs:
+    class Block:
+        kind: T
+        values: uint16[Tx]
+
+
+def test_hit_miss_counters():
+    reset_template_cache_stats()
+    before = template_cache_info()
+
+    Block % {'T': uint32, 'Tx': 3}
+    Block % {'T': uint32, 'Tx': 3}
+
+    info = template_cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+    assert info.currsize == before.currsize + 1
+
+
+def test_prewarm():
+    specializations = [(Block, {'T': uint8, 'Tx': n}) for n in range(1, 5)]
+    structs = prewarm_templates(specializations)
+
+    assert structs[1] is Block % {'T': uint8, 'Tx': 2}
+
+    thread = prewarm_templates([(Block, {'T': int8, 'Tx': 2})], background=True)
+    thread.join()
+
+    reset_template_cache_stats()
+    Block % {'T': int8, 'Tx': 2}
+    assert template_cache_info().misses == 0
+
+
+def test_save_and_load_compiled_structs(tmp_path):
+    Block % {'T': float32, 'Tx': 4}
+    path = str(tmp_path / 'structs.cache')
+    n_saved = save_struct_cache(path)
+
+    struct_cache._code_cache.clear()
+    assert load_struct_cache(path) == n_saved
+
+    # loaded code is used for structs generated afterwards
+    n_cached = len(struct_cache._code_cache)
+    block = (Block % {'T': float32, 'Tx': 5})().read(BytesIO(pack('<f5H', 1.0, *range(5))))
+    assert block.values.tolist() == [0, 1, 2, 3, 4]
+    assert len(struct_cache._code_cache) == n_cached + 1
+
+    with Structs:
+        class SameLayout:
+            kind: float32
+            values: uint16[4]
+
+    assert len(struct_cache._code_cache) == n_cached + 1
@@ -0,0 +1,197 @@
+"""
+Tests for the generated read/write functions and instance storage of io_utils.struct.StructMeta
+Run from project root: python -m pytest test_struct_codegen.py
+"""
+from io import BytesIO
+from struct import pack
+
+import pytest
+
+from .io_utils.ctypes import *
+from .io_utils.struct import *
+from .io_utils.var_type import VarType
+from .io_utils.metaclass_hook import Structs
+from .io_utils.columns import StructColumns
+
+
+T = VarType('T')
+Tx = VarType('Tx')
+
+with Structs:
+    class Vector:
+        x: float32
+        y: float32
+        z: float32
+
+    class Record:
+        id: uint32
+        name: char[4]
+        position: Vector
+        indices: uint16[3]
+        grid: uint8[2][3]
+        points: Vector[2]
+
+    class TemplatedRecord:
+        value: T
+        weights: float32[Tx]
+
+    VectorRecord = TemplatedRecord % {'T': Vector, 'Tx': 2}
+
+    class DefaultsRecord:
+        flags: uint32 = 5
+        scale: float32 = 1.0
+        position: Vector
+
+    class Vertex:
+        position: float32[3]
+        bone_weights: uint8[4]
+        tex_coords: float32[2][2]
+
+    class Mesh:
+        n_vertices: uint32
+        vertices: Vertex[3].columnar()
+
+
+def record_bytes():
+    return pack('<I4s3f3H6B6f', 7, b'abcd', 1.0, 2.0, 3.0, 4, 5, 6, *range(6), *range(6))
+
+
+def test_read_assigns_fields_in_order():
+    record = Record().read(BytesIO(record_bytes()))
+
+    assert record.id == 7
+    assert record.name == b'abcd'
+    assert (record.position.x, record.position.y, record.position.z) == (1.0, 2.0, 3.0)
+    assert record.indices.tolist() == [4, 5, 6]
+    assert record.grid.shape == (3, 2) and record.grid.tolist() == [[0, 1], [2, 3], [4, 5]]
+    assert [point.y for point in record.points] == [1.0, 4.0]
+
+
+def test_write_roundtrip():
+    data = record_bytes()
+    record = Record().read(BytesIO(data))
+
+    f = BytesIO()
+    record.write(f)
+    assert f.getvalue() == data
+
+
+def test_nested_array_element_access():
+    data = record_bytes()
+    record = Record().read(BytesIO(data))
+
+    assert record.grid[1][0] == 2 and record.grid[1, 1] == 3 and list(record.grid[2]) == [4, 5]
+
+    record.grid[2][1] = 9
+    f = BytesIO()
+    record.write(f)
+    assert f.getvalue() == data[:31] + b'\x09' + data[32:]
+
+
+def test_unpack_from_buffer():
+    data = b'\0' * 4 + record_bytes()
+    record = Record.unpack_from(memoryview(data), 4)
+    assert record.id == 7 and record.points[1].z == 5.0
+
+
+def test_template_specialization():
+    assert VectorRecord._struct_token_string == 'fff2f'
+
+    record = VectorRecord().read(BytesIO(pack('<5f', 1, 2, 3, 4, 5)))
+    assert record.value.z == 3.0 and record.weights.tolist() == [4.0, 5.0]
+
+    f = BytesIO()
+    record.write(f)
+    assert f.getvalue() == pack('<5f', 1, 2, 3, 4, 5)
+
+
+def test_template_is_not_generated():
+    assert TemplatedRecord._struct_token_string is None
+    assert not hasattr(TemplatedRecord, '_struct_codec')
+
+
+def test_instances_use_slots():
+    record = Record()
+    assert not hasattr(record, '__dict__')
+    assert set(Record.__slots__) == set(Record.__annotations__)
+
+    with pytest.raises(AttributeError):
+        record.unknown_field = 1
+
+    # specializations re-emit their slots
+    assert not hasattr(VectorRecord(), '__dict__')
+
+
+def test_generated_init_defaults():
+    record = DefaultsRecord()
+    assert record.flags == 5 and record.scale == 1.0 and record.position.x == 0.0
+
+    record = Record()
+    assert record.indices.tolist() == [0, 0, 0] and record.grid.tolist() == [[0, 0], [0, 0], [0, 0]]
+    assert record.name == b''
+
+    f = BytesIO()
+    DefaultsRecord().write(f)
+    assert f.getvalue() == pack('<If3f', 5, 1.0, 0, 0, 0)
+
+
+def test_columnar_array():
+    vertices = [pack('<3f4B4f', i, i + 1, i + 2, 255, 0, 0, 0, 0.5, 0.5, 1, 1) for i in range(3)]
+    data = pack('<I', 3) + b''.join(vertices)
+
+    mesh = Mesh().read(BytesIO(data))
+    assert isinstance(mesh.vertices, StructColumns)
+    assert mesh.vertices.position.tolist() == [0, 1, 2, 1, 2, 3, 2, 3, 4]
+    assert mesh.vertices.bone_weights[4] == 255
+    assert mesh.vertices[2].tex_coords.tolist() == [[0.5, 0.5], [1.0, 1.0]]
+
+    vertex = Vertex()
+    vertex.position = [7.0, 8.0, 9.0]
+    mesh.vertices[1] = vertex
+    assert mesh.vertices[1].position.tolist() == [7.0, 8.0, 9.0]
+
+    mesh.vertices[1] = Vertex().read(BytesIO(vertices[1]))
+    f = BytesIO()
+    mesh.write(f)
+    assert f.getvalue() == data
+
+
+def test_columnar_requires_plain_struct():
+    with pytest.raises(StructError):
+        with Structs:
+            class NestedMesh:
+                records: Record[2].columnar()
+
+
+def test_plain_array_read_write():
+    data = pack('<6H', *range(6))
+
+    grid = uint16[3][2].read(BytesIO(data))
+    assert grid.shape == (2, 3) and grid[1, 0] == 3
+
+    grid[1, 0] = 9
+    f = BytesIO()
+    uint16[3][2].write(f, grid)
+    assert f.getvalue() == pack('<6H', 0, 1, 2, 9, 4, 5)
+
+    f = BytesIO()
+    uint16[3][2].write(f, [[0, 1, 2], [3, 4, 5]])
+    assert f.getvalue() == data
+
+    with pytest.raises(StructError):
+        uint16[3][2].write(BytesIO(), [0, 1, 2])
+
+    with pytest.raises(StructError):
+        Vector[2].read(BytesIO(data))
+
+
+def test_plain_array_read_numpy():
+    numpy = pytest.importorskip('numpy')
+
+    heights = float32[3][2].read(BytesIO(pack('<6f', *range(6))), use_numpy=True)
+    assert heights.shape == (2, 3) and heights[1, 2] == 5.0
+
+    heights[0, 0] = 7.0
+    f = BytesIO()
+    float32[3][2].write(f, heights)
+    assert f.getvalue() == pack('<6f', 7, 1, 2, 3, 4, 5)
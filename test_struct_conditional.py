@@ -0,0 +1,104 @@
+"""
+Tests for context dependent struct layouts, io_utils.conditional
+Run from project root: python -m pytest test_struct_conditional.py
+"""
+from io import BytesIO
+from struct import pack
+
+import pytest
+
+from .io_utils.ctypes import *
+from .io_utils.struct import *
+from .io_utils.conditional import Conditional, StructContext, If, Elif, Else, Endif
+from .io_utils.metaclass_hook import Structs
+
+
+WOTLK = 3
+CATA = 4
+MOP = 5
+
+with Structs:
+    class MCNKHeader:
+        flags: uint32
+        _: Conditional(
+            If(lambda ctx: ctx.wow_version >= MOP, {
+                'holes_high_res': uint8[8]
+            }),
+            Else({
+                'ofs_height': uint32,
+                'ofs_normal': uint32
+            })
+        )
+        area_id: uint32
+
+    class Track:
+        interpolation_type: uint16
+        global_sequence: int16
+        _: Conditional(
+            If(lambda ctx: ctx.wow_version < WOTLK),
+            {
+                'interpolation_ranges': uint32[2]
+            },
+            Endif()
+        )
+        timestamps: uint32[2]
+
+    class Bone:
+        key_bone_id: int32
+        translation: Track
+        rotation: Track[2]
+
+
+def test_branch_selection():
+    mop = MCNKHeader.in_context(StructContext(wow_version=MOP))
+    wotlk = MCNKHeader.in_context(StructContext(wow_version=WOTLK))
+
+    assert mop._struct_token_string == 'I8BI'
+    assert wotlk._struct_token_string == 'IIII'
+
+    header = mop().read(BytesIO(pack('<I8BI', 1, *range(8), 7)))
+    assert header.holes_high_res.tolist() == list(range(8)) and header.area_id == 7
+
+    header = wotlk().read(BytesIO(pack('<4I', 1, 2, 3, 7)))
+    assert header.ofs_normal == 3 and header.area_id == 7
+
+
+def test_layouts_are_cached():
+    ctx = StructContext(wow_version=CATA)
+    assert MCNKHeader.in_context(ctx) is MCNKHeader.in_context(StructContext(wow_version=CATA))
+
+    # contexts taking the same branches share the layout
+    assert MCNKHeader.in_context(ctx) is MCNKHeader.in_context(StructContext(wow_version=WOTLK))
+    assert MCNKHeader.in_context(ctx) is not MCNKHeader.in_context(StructContext(wow_version=MOP))
+
+
+def test_nested_conditional_structs():
+    assert Bone._struct_is_conditional and Track[2]._struct_is_conditional
+
+    classic = Bone.in_context(StructContext(wow_version=1))
+    wotlk = Bone.in_context(StructContext(wow_version=WOTLK))
+
+    assert classic._struct_codec.size == 4 + 3 * 20
+    assert wotlk._struct_codec.size == 4 + 3 * 12
+
+    bone = wotlk().read(BytesIO(pack('<i' + 'Hh2I' * 3, -1, *[0, -1, 5, 6] * 3)))
+    assert bone.rotation[1].timestamps.tolist() == [5, 6]
+
+
+def test_unresolved_conditional_struct():
+    with pytest.raises(StructError):
+        MCNKHeader._struct_format_chunked()
+
+    with pytest.raises(StructError):
+        MCNKHeader.in_context(StructContext(version=MOP))
+
+
+def test_syntax_errors():
+    with pytest.raises(SyntaxError):
+        Conditional(Else({'a': uint32}))
+
+    with pytest.raises(SyntaxError):
+        Conditional(If(lambda ctx: True), Else(), Elif(lambda ctx: True))
+
+    with pytest.raises(SyntaxError):
+        Conditional(If(lambda ctx: True), Endif(), {'a': uint32})
@@ -32,7 +32,7 @@ class DBCString:
         str_pos = f.tell()
         f.write((string + '\0').encode('utf-8'))
         f.seek(pos)
-        uint32.write(str_pos - str_block_ofs)
+        uint32.write(f, str_pos - str_block_ofs)
 
 
 class DBCLangString:
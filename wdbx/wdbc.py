@@ -1,8 +1,8 @@
 from collections import namedtuple
-from io import BytesIO
 
 from .dbd_wrapper import DBDefinition, DBCString, DBCLangString
 from ..io_utils.types import *
+from ..io_utils.binary_reader import BinaryReader
 
 
 class DBCHeader:
@@ -25,7 +25,6 @@ class DBCHeader:
 
     def write(self, f):
         f.write(self.magic.encode('utf-8'))
-        string.write(f, self.magic)
         uint32.write(f, self.record_count)
         uint32.write(f, self.field_count)
         uint32.write(f, self.record_size)
@@ -35,8 +34,10 @@ class DBCHeader:
 
 
 class DBCFile:
-    def __init__(self, name):
-        definition = DBDefinition(name, '3.3.5.12340')
+    def __init__(self, name, definition=None):
+        # field names mapped to types, e.g. from wdbx.definitions, looked up in the DBD definitions if not given
+        if definition is None:
+            definition = DBDefinition(name, '3.3.5.12340')
 
         self.header = DBCHeader()
         self.name = name
@@ -83,15 +84,19 @@ class DBCFile:
         return
 
     def write(self, f):
-        f.seek(20)
         self.header.record_count = len(self.records)
         str_block_ofs = 20 + self.header.record_count * self.header.record_size
 
+        # strings are appended past the records, the string block starts with the empty string
+        f.seek(str_block_ofs)
+        f.write(b'\0')
+        f.seek(20)
+
         for record in self.records:
             for i, field in enumerate(record):
                 type_ = self.field_types[i]
                 if type_ in (DBCString, DBCLangString):
-                    field.write(f, field, str_block_ofs)
+                    type_.write(f, field, str_block_ofs)
                 else:
                     type_.write(f, field)
 
@@ -102,7 +107,7 @@ class DBCFile:
 
     def read_from_gamedata(self, game_data):
         # f = BytesIO(game_data.read_file('DBFilesClient\\{}.dbc'.format(self.name)))
-        f = BytesIO(game_data.read_file('DBFilesClient\\{}.dbc'.format(self.name))[0])
+        f = BinaryReader(game_data.read_file('DBFilesClient\\{}.dbc'.format(self.name))[0])
         self.read(f)
 
     def get_record(self, uid):
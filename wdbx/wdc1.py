@@ -82,7 +82,6 @@ class WDC1Header:
 
 class FieldStructure:
     size = int16.size() + uint16.size()
-    __slots__ = ('size', 'offset')
 
     def __init__(self):
         self.size = 0
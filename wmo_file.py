@@ -5,6 +5,7 @@ from .file_formats import wmo_format_root
 from .file_formats.wmo_format_root import *
 from .file_formats import wmo_format_group
 from .file_formats.wmo_format_group import *
+from .io_utils.binary_reader import BinaryReader
 
 
 class WMOFile:
@@ -56,7 +57,7 @@ class WMOFile:
                 self.groups.append(group)
 
     def read_chunks(self):
-        with open(self.filepath, 'rb') as f:
+        with BinaryReader.from_file(self.filepath) as f:
 
             is_root = False
 
@@ -357,7 +358,7 @@ class WMOGroupFile:
         self.mocv2 = None
 
     def read(self):
-        with open(self.filepath, 'rb') as f:
+        with BinaryReader.from_file(self.filepath) as f:
 
             is_mocv_processed = False
             is_motv_processed = False